@@ -1,5 +1,8 @@
 import os
+import re
 import json
+import hashlib
+from functools import lru_cache
 from pathlib import Path
 
 from IPython.display import display, Javascript
@@ -7,9 +10,155 @@ from IPython.display import display, Javascript
 pkg_root_dir = os.path.dirname(__file__)
 pjoin = lambda *p: os.path.join(pkg_root_dir, *p)
 js_filename = pjoin('js', 'index.js')
-with open(js_filename) as js_file:
-    js_source = js_file.read()
-    display(Javascript(js_source))
+
+# Set this environment variable to 0 (or false, no, off) to never inject the JS bundle (e.g. in scripts,
+# workers, or notebooks where the bundle is already loaded some other way).
+JS_INJECTION_ENV_VAR = 'OUI_INJECT_JS'
+# Where the hash of the bundle last injected is recorded: on the IPython shell, so that it lasts as long
+# as the kernel does (and survives re-imports and reloads of oui).
+_INJECTED_JS_HASH_ATTR = '_oui_injected_js_hash'
+_js_injection_enabled = None  # None means "decided by the environment variable"
+
+
+@lru_cache(maxsize=1)
+def js_bundle_source():
+    """The source of the JS bundle (``oui/js/index.js``), read on first use."""
+    with open(js_filename) as js_file:
+        return js_file.read()
+
+
+@lru_cache(maxsize=1)
+def js_bundle_hash():
+    return hashlib.sha1(js_bundle_source().encode()).hexdigest()
+
+
+# The features of the current TS sources that bundles built from older sources don't have. A bundle lists
+# its features (see ``index.ts``), and what needs a feature the bundle doesn't have is refused (see
+# ``require_bundle_feature``), rather than shipped to a bundle that would fail to render it.
+BUNDLE_FEATURES = (
+    'typed_arrays',  # base64 encoded (typed) arrays, and tables of shared arrays (see ``oui.transport``)
+    'peak_pyramids',  # peaks charts drawn from the peak pyramids computed in python
+    'spectrogram_images',  # spectrograms drawn from the images computed in python
+    'audio_urls',  # audio channels played from the urls of a local server
+    'live_channels',  # time channels that new values can be appended to
+    'tsne_init',  # t-SNEs starting from a given (initial) solution
+    'tsne_frames',  # (animated) t-SNE solutions computed in python
+    'sparse_affinities',  # t-SNEs of the (k nearest neighbors) affinities computed in python
+    'density',  # splatters drawn as the density of their pts
+)
+_BUNDLE_FEATURE_PATTERN = re.compile(r'oui-bundle-feature:(\w+)')
+_bundle_features = None  # None means "those the bundle lists"
+
+
+@lru_cache(maxsize=1)
+def _listed_bundle_features():
+    return frozenset(_BUNDLE_FEATURE_PATTERN.findall(js_bundle_source()))
+
+
+def set_bundle_features(features=None):
+    """Say which of the ``BUNDLE_FEATURES`` the JS bundle has (e.g. when the bundle is loaded some other way
+    than by oui), overriding those ``oui/js/index.js`` lists. Use ``features=None`` to go back to those."""
+    global _bundle_features
+    _bundle_features = None if features is None else frozenset(features)
+
+
+def bundle_has_feature(feature):
+    """Whether the JS bundle has the feature (one of ``BUNDLE_FEATURES``, see ``set_bundle_features``)
+
+    >>> bundle_has_feature('no_such_feature')
+    False
+    """
+    if _bundle_features is not None:
+        return feature in _bundle_features
+    return feature in _listed_bundle_features()
+
+
+def require_bundle_feature(feature, what):
+    """Raise a ``RuntimeError`` saying that what needs the feature, if the JS bundle doesn't have it"""
+    if not bundle_has_feature(feature):
+        raise RuntimeError(
+            f"{what} needs a JS bundle with the {feature!r} feature, which oui/js/index.js doesn't have: "
+            f"it was built from older TS sources. Rebuild it (npm run build), or, if the bundle is loaded "
+            f"some other way, see oui.set_bundle_features."
+        )
+
+
+def set_js_injection(enabled=True):
+    """Turn the injection of the JS bundle on or off (overriding the ``OUI_INJECT_JS`` env var).
+    Use ``enabled=None`` to go back to what the environment variable says."""
+    global _js_injection_enabled
+    _js_injection_enabled = enabled
+
+
+def js_injection_is_enabled():
+    if _js_injection_enabled is not None:
+        return _js_injection_enabled
+    return os.environ.get(JS_INJECTION_ENV_VAR, '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def _notebook_shell():
+    """The IPython shell, if we're running in a kernel that has a (notebook) frontend, None if not."""
+    try:
+        shell = get_ipython()  # defined (as a builtin) when running in IPython
+    except NameError:
+        return None
+    return shell if getattr(shell, 'kernel', None) is not None else None
+
+
+def ensure_js_injected(force=False, shell=None):
+    """Display the JS bundle that renders oui's visualizations, unless this kernel already got it.
+
+    Called when a visualization (a ``BundledJavascript``) is displayed, so the bundle is only sent when it's
+    first needed, and at most once per kernel (unless the bundle changes, or ``force=True``).
+
+    What's tracked is the kernel, not the page: if the page is reloaded (or the notebook reopened) while the
+    kernel keeps running, the page loses the bundle, but the kernel doesn't know it. Visualizations displayed
+    then say so (instead of rendering): call ``ensure_js_injected(force=True)`` to send the bundle again.
+
+    Nothing is done outside of a notebook kernel, or if injection is disabled (see ``set_js_injection``).
+
+    :param force: Inject the bundle even if it was already injected
+    :param shell: The IPython shell to track the injection on (defaults to the current notebook's one)
+    :return: True if the bundle was injected, False if not
+
+    >>> ensure_js_injected()  # not in a notebook
+    False
+    """
+    shell = shell or _notebook_shell()
+    if shell is None or not js_injection_is_enabled():
+        return False
+    bundle_hash = js_bundle_hash()
+    if not force and getattr(shell, _INJECTED_JS_HASH_ATTR, None) == bundle_hash:
+        return False
+    display(Javascript(js_bundle_source()))
+    setattr(shell, _INJECTED_JS_HASH_ATTR, bundle_hash)
+    return True
+
+
+# What a BundledJavascript runs when a function of the bundle is missing (typically, after a page reload)
+_MISSING_BUNDLE_JS = """try {{
+{source}
+}} catch (error) {{
+    if (!(error instanceof ReferenceError)) {{ throw error; }}
+    element.text('oui: ' + error.message + '. If the page was reloaded, the JS bundle must be sent again: '
+                 + 'run oui.ensure_js_injected(force=True), then display this again.');
+}}"""
+
+
+class BundledJavascript(Javascript):
+    """A ``Javascript`` object calling functions of the JS bundle (a visualization), that injects the bundle
+    (if needed, see ``ensure_js_injected``) when it's displayed, rather than when it's made: It may be made
+    in a script or a worker, and be displayed later, or never.
+
+    >>> jsobj = BundledJavascript('renderTimeChannel(element.get(0), {})')
+    >>> jsobj.data  # (what it's made of is what it's given)
+    'renderTimeChannel(element.get(0), {})'
+    """
+
+    def _repr_javascript_(self):
+        ensure_js_injected()
+        return _MISSING_BUNDLE_JS.format(source=super()._repr_javascript_())
+
 
 data_dirpath = pjoin('data')
 djoin = lambda *p: os.path.join(data_dirpath, *p)
@@ -21,4 +170,3 @@ def get_pkg_data(filename):
         return json.load(open(path, 'r'))
     else:
         raise ValueError(f"Unrecognized extension in {path}")
-
@@ -0,0 +1,398 @@
+"""Benchmarks of the python render paths (splatter, audio, time_vis, color conversions, serialization).
+
+All data is synthetic (and seeded), so benchmarks run offline, and results of different commits
+(saved as json) can be compared. Every case reports its wall time, peak (python-traced) memory,
+and the size of the payload it emits (the source of the Javascript object).
+Cases of render paths that the JS bundle can't draw (see ``oui.BUNDLE_FEATURES``) are skipped.
+
+From the command line:
+
+    python -m oui.benchmarks run --cases 'splatter*' --save-to before.json
+    python -m oui.benchmarks run --save-to after.json
+    python -m oui.benchmarks compare before.json after.json
+
+>>> result = bench(lambda: 'x' * 1000)
+>>> result['payload_bytes'], sorted(result)
+(1000, ['payload_bytes', 'peak_memory', 'wall_time'])
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from fnmatch import fnmatch
+from functools import partial
+
+import numpy as np
+
+from oui.instrumentation import payload_bytes
+
+DFLT_N_REPEATS = 3
+DFLT_SEED = 42
+DFLT_SR = 44100
+AUDIO_DURATIONS = (1, 60, 600, 3600)  # seconds
+BATCH_SIZE, BATCH_CLIP_DURATION = 32, 10  # number of clips, and their duration (in seconds)
+SPLATTER_SIZES = ((10_000, 32), (200_000, 128))  # (n_pts, n_features)
+SPLATTER_PYTHON_SIZE = (2000, 32)  # (n_pts, n_features) of the python t-SNE engine cases
+SPLATTER_WIDE_SIZE = (2000, 1024)  # (n_pts, n_features) of the (dimension) reduction cases
+SPLATTER_REDUCE_DIM = 50
+DENSITY_N_PTS = 1_000_000  # the number of pts of the embedding aggregated by the density case
+DENSITY_FIGSIZE = 400
+N_TAGS = 10
+TIME_VIS_N_CHANNELS = 200
+TIME_VIS_CHANNEL_SIZE = 1000
+LONG_CHANNELS_SIZE = 1_000_000  # points per channel of the decimation cases
+TIME_VIS_RESOLUTION = 2000
+N_COLORS = 1_000_000
+SERIALIZATION_SIZE = 10_000_000
+METRICS = ('wall_time', 'peak_memory', 'payload_bytes')
+
+
+# Synthetic data ###########################################################################################
+
+
+def synthetic_wf(duration, sr=DFLT_SR, seed=DFLT_SEED):
+    """A (int16) waveform of a few tones and noise. A one second pattern is repeated, so that making
+    hours of waveform is cheap."""
+    rng = np.random.RandomState(seed)
+    t = np.arange(sr) / sr
+    second = sum(np.sin(2 * np.pi * f * t) for f in (220, 440, 1000)) / 3 + 0.1 * rng.randn(sr)
+    second = (10000 * second).astype('int16')
+    return np.tile(second, int(np.ceil(duration)))[:int(duration * sr)]
+
+
+def synthetic_pts(n_pts, n_features, n_tags=N_TAGS, seed=DFLT_SEED):
+    """An (X, y) pair of n_pts float32 fvs drawn around n_tags centers, and their (str) tags"""
+    rng = np.random.RandomState(seed)
+    centers = 3 * rng.randn(n_tags, n_features)
+    y = rng.randint(0, n_tags, n_pts)
+    X = (centers[y] + rng.randn(n_pts, n_features)).astype('float32')
+    return X, np.array([f'tag_{i}' for i in range(n_tags)])[y]
+
+
+def synthetic_channels(
+    n_channels=TIME_VIS_N_CHANNELS, size=TIME_VIS_CHANNEL_SIZE, seed=DFLT_SEED, as_arrays=False
+):
+    """Data channels of random walks (whose data are lists, or arrays if as_arrays=True)"""
+    rng = np.random.RandomState(seed)
+    return [
+        {'data': walk if as_arrays else walk.tolist(), 'title': f'channel {i}'}
+        for i, walk in enumerate(np.cumsum(rng.randn(size)) for _ in range(n_channels))
+    ]
+
+
+# Measuring ################################################################################################
+
+
+def payload_size(obj):
+    """The number of bytes obj would ship to the browser (the utf8 size of a Javascript object's source, see
+    ``oui.instrumentation.payload_bytes``), or the number of bytes of an array.
+
+    >>> from IPython.display import Javascript
+    >>> payload_size(Javascript('alert(1)')), payload_size(b'abc'), payload_size(42)
+    (8, 3, None)
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    elif isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    return payload_bytes(obj)
+
+
+def bench(func, n_repeats=DFLT_N_REPEATS):
+    """Run func (with no arguments) and measure it.
+
+    :return: A dict with the (best of n_repeats) wall time in seconds, the peak memory (in bytes, as
+        traced by tracemalloc, so python and numpy allocations) and the payload size of func's output.
+    """
+    wall_times = []
+    for _ in range(n_repeats):
+        tic = time.perf_counter()
+        result = func()
+        wall_times.append(time.perf_counter() - tic)
+        del result
+    # memory is measured on a separate run, since tracing slows things down
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'wall_time': min(wall_times),
+        'peak_memory': peak_memory,
+        'payload_bytes': payload_size(result),
+    }
+
+
+# The cases ################################################################################################
+
+
+def splatter_cases(sizes=SPLATTER_SIZES):
+    from oui import bundle_has_feature
+    from oui.splatter import (
+        splatter,
+        columnar_pts,
+        process_viz_args,
+        _splatter,
+        splatter_dflts,
+    )
+    from oui.multi_time_vis.render_cache import MemoryStore
+    from oui.splatter.density import density_payload
+
+    for n_pts, n_features in sizes:
+        pts = synthetic_pts(n_pts, n_features)
+        cpts = columnar_pts(pts)
+        suffix = f'{n_pts}x{n_features}'
+        yield f'splatter.process_pts.{suffix}', partial(columnar_pts, pts)
+        yield f'splatter.process_viz_args.{suffix}', partial(
+            process_viz_args, cpts, 0.02, (200, 200), None, '#444'
+        )
+        yield f'splatter._splatter.{suffix}', partial(
+            _splatter, cpts, {'fillColors': splatter_dflts['fillColors'][:N_TAGS]}
+        )
+        yield f'splatter.splatter.{suffix}', partial(splatter, pts)
+    # the python engine, and a restyle of the same pts (whose embedding is then cached: best of n_repeats)
+    pts = synthetic_pts(*SPLATTER_PYTHON_SIZE)
+    suffix = 'x'.join(map(str, SPLATTER_PYTHON_SIZE))
+    if bundle_has_feature('tsne_frames'):
+        yield f'splatter.python.{suffix}', partial(splatter, pts, engine='python', cache=False)
+        yield f'splatter.python.restyle.{suffix}', partial(
+            splatter, pts, engine='python', cache=MemoryStore()
+        )
+    # the browser engine, given the (sparse) knn affinities instead of the fvs
+    if bundle_has_feature('sparse_affinities'):
+        yield f'splatter.knn_affinities.{suffix}', partial(splatter, pts, affinities='knn')
+    # wide fvs, shipped as is, or reduced first
+    pts = synthetic_pts(*SPLATTER_WIDE_SIZE)
+    suffix = 'x'.join(map(str, SPLATTER_WIDE_SIZE))
+    yield f'splatter.splatter.{suffix}', partial(splatter, pts, cache=False)
+    for reduction in ('pca', 'random_projection'):
+        yield f'splatter.{reduction}.{SPLATTER_REDUCE_DIM}.{suffix}', partial(
+            splatter, pts, cache=False, reduce_dim=SPLATTER_REDUCE_DIM, reduction=reduction
+        )
+    # aggregation of a (final) embedding in a (per tag) density grid, for the 'density' rendering
+    rng = np.random.RandomState(DFLT_SEED)
+    embedding, tag_codes = rng.randn(DENSITY_N_PTS, 2), rng.randint(-1, N_TAGS, DENSITY_N_PTS)
+    yield f'splatter.density_payload.{DENSITY_N_PTS}', partial(
+        density_payload, embedding, tag_codes, N_TAGS, DENSITY_FIGSIZE, DENSITY_FIGSIZE
+    )
+
+
+def audio_cases(durations=AUDIO_DURATIONS, sr=DFLT_SR):
+    from oui.multi_time_vis import jsobj_of_audio
+    from oui.multi_time_vis.audio import jsobjs_of_audio
+
+    for duration in durations:
+        wf = synthetic_wf(duration, sr)
+        yield f'audio.jsobj_of_audio.{duration}s', partial(jsobj_of_audio, (wf, sr))
+        yield f'audio.jsobj_of_audio.peaks.{duration}s', partial(
+            jsobj_of_audio, (wf, sr), chart_type='peaks'
+        )
+
+    clips = [(synthetic_wf(BATCH_CLIP_DURATION, sr, seed=i), sr) for i in range(BATCH_SIZE)]
+    suffix = f'{BATCH_SIZE}x{BATCH_CLIP_DURATION}s'
+    for n_workers in (0, None):  # in this process, and in a pool of (as many as cores) workers
+        yield f'audio.jsobjs_of_audio.workers_{"all" if n_workers is None else n_workers}.{suffix}', partial(
+            _list_of, jsobjs_of_audio, clips, n_workers=n_workers, chart_type='peaks'
+        )
+
+
+def _list_of(make_iterator, *args, **kwargs):
+    return list(make_iterator(*args, **kwargs))
+
+
+def time_vis_cases(n_channels=TIME_VIS_N_CHANNELS, size=TIME_VIS_CHANNEL_SIZE):
+    from oui.multi_time_vis import time_vis
+    from oui.multi_time_vis.audio import wfsr_to_src_spec
+
+    channels = synthetic_channels(n_channels, size)
+    yield f'time_vis.{n_channels}x{size}', partial(time_vis, channels)
+    array_channels = synthetic_channels(n_channels, size, as_arrays=True)
+    yield f'time_vis.ndarray.{n_channels}x{size}', partial(time_vis, array_channels)
+    # views of one recording (its waveform is shipped once)
+    wf = synthetic_wf(60)
+    views = [wfsr_to_src_spec(wf, DFLT_SR, chart_type=chart_type) for chart_type in ('peaks', 'spectrogram')]
+    yield 'time_vis.views_of_one_wf.60s', partial(time_vis, views)
+    long_channels = synthetic_channels(10, LONG_CHANNELS_SIZE, as_arrays=True)
+    yield f'time_vis.ndarray.10x{LONG_CHANNELS_SIZE}', partial(time_vis, long_channels)
+    for decimation in ('minmax', 'lttb'):
+        yield f'time_vis.{decimation}.10x{LONG_CHANNELS_SIZE}', partial(
+            time_vis, long_channels, resolution=TIME_VIS_RESOLUTION, decimation=decimation
+        )
+    # filtered before shipping (rather than by the browser, at every render)
+    filtered_channels = [dict(channel, filters=['range', 'power'], filterParams={'_low': 0.1, '_pow': 2})
+                         for channel in long_channels]
+    yield f'time_vis.filtered.10x{LONG_CHANNELS_SIZE}', partial(
+        time_vis, filtered_channels, resolution=TIME_VIS_RESOLUTION
+    )
+
+
+def color_cases(n_colors=N_COLORS, seed=DFLT_SEED):
+    from oui.color_util import colors_to_rgba, rgba_to_hex, scores_to_rgba, pack_rgba
+
+    rng = np.random.RandomState(seed)
+    scores = rng.rand(n_colors)
+    rgba = rng.randint(0, 256, (n_colors, 4)).astype('uint8')
+    names = rng.choice(['red', 'b', 'light_blue', '#123', '#00ff1080'], n_colors)
+    yield f'color.scores_to_rgba.{n_colors}', partial(scores_to_rgba, scores, ['blue', 'white', 'red'])
+    yield f'color.rgba_to_hex.{n_colors}', partial(rgba_to_hex, rgba)
+    yield f'color.pack_rgba.{n_colors}', partial(pack_rgba, rgba)
+    yield f'color.colors_to_rgba.names.{n_colors}', partial(colors_to_rgba, names)
+
+
+def legacy_render_call_source(func_name, *args):
+    """How payloads were written before ``oui.serialization``: python reprs, patched to look like JS"""
+    args = ', '.join(map(str, args))
+    return f'{func_name}(element.get(0), {args})'.replace('True', 'true').replace('None', 'null')
+
+
+def serialization_cases(size=SERIALIZATION_SIZE, seed=DFLT_SEED):
+    from oui.serialization import render_call_source
+
+    rng = np.random.RandomState(seed)
+    data = np.cumsum(rng.randn(size))
+    channel = {'data': data.tolist(), 'type': 'data', 'title': 'a channel'}
+    array_channel = dict(channel, data=data)
+    props = {'enable_playback': True, 'params': None}
+    yield f'serialize.legacy.list.{size}', partial(
+        legacy_render_call_source, 'renderTimeChannel', channel, props
+    )
+    yield f'serialize.json.list.{size}', partial(render_call_source, 'renderTimeChannel', channel, props)
+    yield f'serialize.json.ndarray.{size}', partial(
+        render_call_source, 'renderTimeChannel', array_channel, props
+    )
+    int_channel = dict(channel, data=(1000 * data).astype(int).tolist())
+    int_array_channel = dict(channel, data=(1000 * data).astype(int))
+    yield f'serialize.legacy.int_list.{size}', partial(
+        legacy_render_call_source, 'renderTimeChannel', int_channel, props
+    )
+    yield f'serialize.json.int_list.{size}', partial(
+        render_call_source, 'renderTimeChannel', int_channel, props
+    )
+    yield f'serialize.json.int_ndarray.{size}', partial(
+        render_call_source, 'renderTimeChannel', int_array_channel, props
+    )
+
+
+case_makers = {
+    'splatter': splatter_cases,
+    'audio': audio_cases,
+    'time_vis': time_vis_cases,
+    'color': color_cases,
+    'serialize': serialization_cases,
+}
+
+
+def benchmark_cases(pattern='*'):
+    """Yield the (name, func) pairs of the cases whose name matches the (fnmatch) pattern.
+    The (synthetic) data of a group of cases is only made if one of its cases could match."""
+    for group, make_cases in case_makers.items():
+        if fnmatch(group, pattern.split('.')[0]):
+            for name, func in make_cases():
+                if fnmatch(name, pattern):
+                    yield name, func
+
+
+# Running, saving and comparing ############################################################################
+
+
+def environment_info():
+    """What's needed to know what the results were measured on"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(__file__),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_benchmarks(cases='*', n_repeats=DFLT_N_REPEATS, save_to=None, verbose=True):
+    """Run the benchmark cases (those matching the cases pattern), and return (and optionally save)
+    the results: ``{'environment': {...}, 'results': {case_name: {metric: value, ...}, ...}}``.
+
+    :param cases: An fnmatch pattern of the names of the cases to run (e.g. 'splatter.*', '*.60s')
+    :param n_repeats: The number of times a case is timed (the best time is kept)
+    :param save_to: The json filepath to save the results to
+    :param verbose: Whether to print the results as they come
+    """
+    results = {}
+    for name, func in benchmark_cases(cases):
+        results[name] = bench(func, n_repeats)
+        if verbose:
+            print(_format_row(name, results[name]), flush=True)
+    report = {'environment': environment_info(), 'results': results}
+    if save_to:
+        with open(save_to, 'w') as fp:
+            json.dump(report, fp, indent=2)
+    return report
+
+
+def compare_results(old, new, metrics=METRICS):
+    """The ``new / old`` ratios of the metrics of the cases both results have.
+
+    :param old: A report (as returned by ``run_benchmarks``) or the json filepath it was saved to
+    :param new: Same, for the new results
+    :return: A ``{case_name: {metric: ratio, ...}, ...}`` dict
+
+    >>> old = {'results': {'a': {'wall_time': 2.0, 'payload_bytes': 100}}}
+    >>> new = {'results': {'a': {'wall_time': 1.0, 'payload_bytes': 100}}}
+    >>> compare_results(old, new)
+    {'a': {'wall_time': 0.5, 'payload_bytes': 1.0}}
+    """
+    old, new = _load_report(old)['results'], _load_report(new)['results']
+    comparison = {}
+    for name in old.keys() & new.keys():
+        comparison[name] = {
+            metric: new[name][metric] / old[name][metric]
+            for metric in metrics
+            if old[name].get(metric) and new[name].get(metric) is not None
+        }
+    return dict(sorted(comparison.items()))
+
+
+def _load_report(report):
+    if isinstance(report, str):
+        with open(report) as fp:
+            return json.load(fp)
+    return report
+
+
+def _format_row(name, metrics):
+    payload = metrics['payload_bytes']
+    return (
+        f"{name:<45} {metrics['wall_time'] * 1000:>10.1f} ms {metrics['peak_memory'] / 2 ** 20:>10.1f} MiB"
+        f" {'-' if payload is None else f'{payload / 2 ** 20:.2f} MiB':>12} payload"
+    )
+
+
+# Command line interface ###################################################################################
+
+
+def run(cases='*', n_repeats=DFLT_N_REPEATS, save_to=None):
+    """Run the benchmark cases matching the cases pattern (printing results as they come)"""
+    run_benchmarks(cases, n_repeats, save_to, verbose=True)
+
+
+def compare(old_filepath, new_filepath):
+    """Print the new/old ratios of the metrics of two saved results"""
+    for name, ratios in compare_results(old_filepath, new_filepath).items():
+        print(f"{name:<45} " + '  '.join(f'{metric}: {ratio:.2f}x' for metric, ratio in ratios.items()))
+
+
+if __name__ == '__main__':
+    import argh
+
+    argh.dispatch_commands([run, compare])
@@ -1,6 +1,8 @@
 from oui import get_pkg_data
 from typing import Iterable
 
+import numpy as np
+
 alpha_less_rgb_hex_length = len('#aabbcc')
 
 
@@ -108,3 +110,139 @@ class _HexColor:
 
 
 hex_color = _HexColor()
+
+
+# Batch (vectorized) color conversions ###################################################################
+# The functions above convert one color at a time. The ones below convert arrays of colors in one go
+# (e.g. to color every point of a big plot).
+
+color_names = np.array([x['color'] for x in color_names_and_codes])
+# The (n_colors, 4) uint8 RGBA lookup table of color_names
+color_names_rgba = np.array([list(x['dec']) + [255] for x in color_names_and_codes], dtype='uint8')
+_rgba_idx_for_color = {name: i for i, name in enumerate(color_names)}
+DFLT_COLORMAP_LEVELS = 1024  # scores are quantized to that many levels by scores_to_rgba
+# The (256, 2) (UCS4) code points of the two hex digits ('%02x' % v) of every byte value v
+_HEX_DIGIT_PAIRS = np.array([list(map(ord, '%02x' % v)) for v in range(256)], dtype='uint32')
+
+
+def _rgba_of_color_spec(color_spec):
+    """The (r, g, b, a) of a single color name, hex code, or sequence of 3 or 4 ints"""
+    if isinstance(color_spec, str) and color_spec in _rgba_idx_for_color:
+        return tuple(color_names_rgba[_rgba_idx_for_color[color_spec]].tolist())
+    color_hex = color_hex_from(color_spec)
+    rgba = tuple(int(color_hex[i:i + 2], 16) for i in range(1, len(color_hex), 2))
+    return rgba if len(rgba) == 4 else rgba + (255,)
+
+
+def colors_to_rgba(colors, alpha=None):
+    """Get the (n, 4) uint8 RGBA array of a batch of colors.
+
+    :param colors: An (n, 3) or (n, 4) array of ints between 0 and 255 or of floats between 0 and 1,
+        or an array (or list) of color names and/or hex codes.
+    :param alpha: If given, the alpha (int in 0-255 or float in 0-1) given to all the colors
+    :return: An (n, 4) uint8 array
+
+    >>> colors_to_rgba(['red', '#3af', 'red', '#00ff1080']).tolist()
+    [[255, 0, 0, 255], [51, 170, 255, 255], [255, 0, 0, 255], [0, 255, 16, 128]]
+    >>> colors_to_rgba([[0, 0.5, 1]], alpha=0.5).tolist()
+    [[0, 128, 255, 128]]
+    """
+    arr = np.asarray(colors)
+    if arr.size == 0:
+        return np.empty((0, 4), dtype='uint8')
+    if arr.dtype.kind in 'USO':  # strings (names or hex codes): convert each unique one only once
+        uniks, inverse = np.unique(arr.ravel(), return_inverse=True)
+        rgba = np.array([_rgba_of_color_spec(str(c)) for c in uniks], dtype='uint8').reshape(-1, 4)
+        rgba = rgba[inverse]
+    else:
+        if arr.ndim != 2 or arr.shape[1] not in (3, 4):
+            raise ValueError(f"Numerical colors should be an (n, 3) or (n, 4) array. Shape was {arr.shape}")
+        if arr.dtype.kind == 'f':
+            if arr.size and (arr.min() < 0 or arr.max() > 1):
+                raise ValueError("Float colors should be between 0 and 1")
+            arr = np.round(arr * 255)
+        elif arr.size and (arr.min() < 0 or arr.max() > 255):
+            raise ValueError("Int colors should be between 0 and 255")
+        rgba = np.full((len(arr), 4), 255, dtype='uint8')
+        rgba[:, :arr.shape[1]] = arr
+    if alpha is not None:
+        rgba[:, 3] = round(alpha * 255) if isinstance(alpha, float) else alpha
+    return rgba
+
+
+def rgba_to_hex(rgba, include_alpha=True):
+    """Get the hex codes of an (n, 4) (or (n, 3)) uint8 RGBA array, as a numpy array of strings.
+
+    >>> rgba_to_hex(np.array([[255, 0, 0, 255], [0, 255, 16, 128]], dtype='uint8')).tolist()
+    ['#ff0000ff', '#00ff1080']
+    >>> rgba_to_hex([[10, 64, 200, 255]], include_alpha=False).tolist()
+    ['#0a40c8']
+    """
+    rgba = np.asarray(rgba, dtype='uint8')
+    if rgba.size == 0:
+        rgba = rgba.reshape(0, 4)
+    n_channels = 4 if include_alpha and rgba.shape[1] == 4 else 3
+    # build the unicode strings' code points directly (in the native byte order of both uint32 and 'U')
+    chars = np.empty((len(rgba), 1 + 2 * n_channels), dtype='uint32')
+    chars[:, 0] = ord('#')
+    chars[:, 1:] = _HEX_DIGIT_PAIRS[rgba[:, :n_channels]].reshape(len(rgba), 2 * n_channels)
+    return chars.view(f'U{chars.shape[1]}').reshape(len(rgba))
+
+
+def pack_rgba(rgba):
+    """Pack an (n, 4) uint8 RGBA array into n uint32 (0xRRGGBBAA) ints.
+
+    >>> [hex(x) for x in pack_rgba([[255, 0, 16, 128]])]
+    ['0xff001080']
+    """
+    rgba = np.ascontiguousarray(rgba, dtype='uint8')
+    return rgba.view('>u4').ravel().astype('uint32')
+
+
+def colors_to_hex(colors, alpha=None, include_alpha=True):
+    """``rgba_to_hex(colors_to_rgba(colors, alpha), include_alpha)``
+
+    >>> colors_to_hex(['b', 'light_blue'], include_alpha=False).tolist()
+    ['#0000ff', '#add8e6']
+    """
+    return rgba_to_hex(colors_to_rgba(colors, alpha), include_alpha)
+
+
+def scores_to_rgba(scores, colors=('blue', 'red'), vmin=None, vmax=None):
+    """Color (continuous) scores by linearly interpolating between colors (through a ``colormap_lut``).
+
+    :param scores: An array of n numbers
+    :param colors: The colors (of any form ``colors_to_rgba`` accepts) that vmin, ..., vmax are mapped to,
+        evenly spaced
+    :param vmin: The score mapped to the first color (default: the min of the scores). Lower scores are clipped.
+    :param vmax: The score mapped to the last color (default: the max of the scores). Higher scores are clipped.
+    :return: An (n, 4) uint8 RGBA array, where NaN scores are transparent (``[0, 0, 0, 0]``)
+
+    >>> scores_to_rgba([0, 5, 10, float('nan')], colors=['black', 'white']).tolist()
+    [[0, 0, 0, 255], [128, 128, 128, 255], [255, 255, 255, 255], [0, 0, 0, 0]]
+    """
+    scores = np.asarray(scores, dtype=float)
+    rgba = np.zeros(scores.shape + (4,), dtype='uint8')
+    is_score = ~np.isnan(scores)
+    if not is_score.any():  # (empty, or all NaN: the min and max are undefined)
+        return rgba
+    lut = colormap_lut(colors)
+    scores = scores[is_score]
+    vmin = scores.min() if vmin is None else vmin
+    vmax = scores.max() if vmax is None else vmax
+    t = np.clip((scores - vmin) * ((len(lut) - 1) / ((vmax - vmin) or 1)), 0, len(lut) - 1)
+    rgba[is_score] = lut[np.rint(t).astype(np.intp)]
+    return rgba
+
+
+def colormap_lut(colors=('blue', 'red'), n_levels=DFLT_COLORMAP_LEVELS):
+    """An (n_levels, 4) uint8 RGBA lookup table interpolating linearly between colors (evenly spaced)
+
+    >>> colormap_lut(['black', 'white'], n_levels=3).tolist()
+    [[0, 0, 0, 255], [128, 128, 128, 255], [255, 255, 255, 255]]
+    """
+    stops = colors_to_rgba(colors).astype(float)
+    positions = np.linspace(0, 1, len(stops))
+    levels = np.linspace(0, 1, n_levels)
+    channels = [np.interp(levels, positions, stops[:, c]) for c in range(4)]
+    return np.round(np.stack(channels, axis=1)).astype('uint8')
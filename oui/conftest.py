@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture
+def rebuilt_bundle():
+    """Have oui ship what a JS bundle built from the current TS sources renders (see ``oui.BUNDLE_FEATURES``)"""
+    from oui import set_bundle_features, BUNDLE_FEATURES
+
+    set_bundle_features(BUNDLE_FEATURES)
+    yield
+    set_bundle_features(None)
@@ -1,9 +1,25 @@
 import { splatter } from './splatter';
 export { Splatter, splatter } from './splatter';
 export { default as SoundUtility } from './sound_utils';
+export * from './transport';
 export * from './multi_time_vis';
-import { renderTimeChannel, renderMultiTimeVis } from './multi_time_vis';
+import { renderLiveTimeChannel, renderTimeChannel, renderMultiTimeVis } from './multi_time_vis';
 
 window['splatter'] = splatter;
 window['renderTimeChannel'] = renderTimeChannel;
 window['renderMultiTimeVis'] = renderMultiTimeVis;
+window['renderLiveTimeChannel'] = renderLiveTimeChannel;
+
+// The features of this bundle, that the python side looks for (see BUNDLE_FEATURES in oui/__init__.py),
+// so that it doesn't ship what a bundle built from older sources can't render
+window['ouiBundleFeatures'] = [
+    'oui-bundle-feature:typed_arrays',
+    'oui-bundle-feature:peak_pyramids',
+    'oui-bundle-feature:spectrogram_images',
+    'oui-bundle-feature:audio_urls',
+    'oui-bundle-feature:live_channels',
+    'oui-bundle-feature:tsne_init',
+    'oui-bundle-feature:tsne_frames',
+    'oui-bundle-feature:sparse_affinities',
+    'oui-bundle-feature:density',
+];
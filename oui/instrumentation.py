@@ -0,0 +1,205 @@
+"""Instrumentation of the renders: where the time goes, and how much is shipped to the browser.
+
+Disabled by default (in which case it costs next to nothing). When enabled, every render
+(``single_time_vis``, ``time_vis``, ``splatter``, ...) records the time spent in each of its stages
+(preprocess, cast, serialize...), the size of the payload it emits, and the element counts of its
+channels (or pts). These metrics are attached to the Javascript object (as ``jsobj._trace['metrics']``)
+and given to the registered hooks, so they can be forwarded to any logging system.
+
+>>> enable_instrumentation()
+>>> log = []
+>>> _ = add_metrics_hook(log.append)
+>>> from IPython.display import Javascript
+>>> with instrumented_render('my_render') as render:
+...     with stage('serialize'):
+...         jsobj = Javascript('alert(1)')
+...     render.set_result(jsobj, counts={'n_alerts': 1})
+>>> metrics = jsobj._trace['metrics']
+>>> metrics['render'], metrics['payload_bytes'], metrics['counts'], list(metrics['stages'])
+('my_render', 8, {'n_alerts': 1}, ['serialize'])
+>>> log == [metrics]
+True
+>>> remove_metrics_hook(log.append); enable_instrumentation(False)
+"""
+import os
+import time
+import warnings
+from contextvars import ContextVar
+
+# Set this environment variable to 1 (or true, yes, on) to have the instrumentation enabled from the start
+INSTRUMENTATION_ENV_VAR = 'OUI_INSTRUMENTATION'
+PAYLOAD_BYTES_CHUNK_SIZE = 2 ** 20  # the number of characters of a (non ASCII) source encoded at a time
+
+_enabled = os.environ.get(INSTRUMENTATION_ENV_VAR, '').lower() in ('1', 'true', 'yes', 'on')
+_metrics_hooks = []
+_current_render = ContextVar('oui_current_render', default=None)
+
+
+def enable_instrumentation(enabled=True):
+    """Turn the instrumentation on (or off, with ``enabled=False``)"""
+    global _enabled
+    _enabled = enabled
+
+
+def instrumentation_is_enabled():
+    return _enabled
+
+
+def add_metrics_hook(hook):
+    """Register a function to be called with the metrics dict of every (instrumented) render.
+    Returns the hook, so can be used as a decorator."""
+    _metrics_hooks.append(hook)
+    return hook
+
+
+def remove_metrics_hook(hook):
+    _metrics_hooks.remove(hook)
+
+
+class _NoInstrumentation:
+    """What renders and stages are when the instrumentation is disabled: Contexts that do nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_result(self, jsobj, counts=None):
+        pass
+
+    def add_counts(self, **counts):
+        pass
+
+
+_no_instrumentation = _NoInstrumentation()
+
+
+class RenderMetrics:
+    """The metrics of a render, collected while it runs (see ``instrumented_render``)"""
+
+    def __init__(self, render):
+        self.render = render
+        self.stages = {}
+        self.counts = {}
+        self.jsobj = None
+        self._tic = None
+        self._token = None
+
+    def __enter__(self):
+        self._tic = time.perf_counter()
+        self._token = _current_render.set(self)
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        _current_render.reset(self._token)
+        if exc_type is None:
+            self._finish(time.perf_counter() - self._tic)
+        return False
+
+    def add_stage_time(self, stage_name, seconds):
+        self.stages[stage_name] = self.stages.get(stage_name, 0) + seconds
+
+    def add_counts(self, **counts):
+        self.counts.update(counts)
+
+    def set_result(self, jsobj, counts=None):
+        """Tell what the render made (the Javascript object the metrics will be attached to)"""
+        self.jsobj = jsobj
+        self.add_counts(**(counts or {}))
+
+    def to_dict(self, total_time=None):
+        return {
+            'render': self.render,
+            'total_time': total_time,
+            'stages': dict(self.stages),
+            'payload_bytes': payload_bytes(self.jsobj),
+            'counts': dict(self.counts),
+        }
+
+    def _finish(self, total_time):
+        metrics = self.to_dict(total_time)
+        if self.jsobj is not None:
+            trace = getattr(self.jsobj, '_trace', None)
+            if trace is None:
+                trace = self.jsobj._trace = {}
+            trace['metrics'] = metrics
+        for hook in list(_metrics_hooks):
+            try:
+                hook(metrics)
+            except Exception as err:  # a (logging) hook should never break a render
+                warnings.warn(f"The metrics hook {hook} raised an error: {err!r}")
+
+
+class _Stage:
+    def __init__(self, render_metrics, stage_name):
+        self.render_metrics = render_metrics
+        self.stage_name = stage_name
+
+    def __enter__(self):
+        self._tic = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.render_metrics.add_stage_time(self.stage_name, time.perf_counter() - self._tic)
+        return False
+
+
+def instrumented_render(render):
+    """A context in which a render happens, collecting its metrics.
+
+    Renders happening within another one (e.g. ``single_time_vis`` called by ``wfsr_to_jsobj``)
+    contribute to the (outermost) one, so there's one set of metrics per object made.
+    If the instrumentation is disabled, a context that does nothing is returned.
+
+    :param render: The name of the render (usually, the name of the function making the object)
+    """
+    if not _enabled:
+        return _no_instrumentation
+    current = _current_render.get()
+    if current is not None:
+        return _Nested(current)
+    return RenderMetrics(render)
+
+
+class _Nested(_NoInstrumentation):
+    """A render happening within another: its counts and result go to the outer render's metrics"""
+
+    def __init__(self, outer):
+        self.outer = outer
+
+    def set_result(self, jsobj, counts=None):
+        self.outer.set_result(jsobj, counts)
+
+    def add_counts(self, **counts):
+        self.outer.add_counts(**counts)
+
+
+def stage(stage_name):
+    """A context timing a stage of the current render (doing nothing if there's none)"""
+    if not _enabled:
+        return _no_instrumentation
+    current = _current_render.get()
+    if current is None:
+        return _no_instrumentation
+    return _Stage(current, stage_name)
+
+
+def payload_bytes(jsobj):
+    """The (utf8) size of the source of a Javascript object, or of a source (None if there's no such source).
+
+    The source isn't encoded as a whole (which would copy it, and sources can be hundreds of MB): An ASCII
+    source (JSON, base64...: most of them) is as many bytes as characters (and ``str.isascii`` is O(1)).
+    Others are encoded ``PAYLOAD_BYTES_CHUNK_SIZE`` characters at a time.
+
+    >>> from IPython.display import Javascript
+    >>> payload_bytes(Javascript('alert("hi")')), payload_bytes(Javascript('alert("hé")'))
+    (11, 12)
+    """
+    data = jsobj if isinstance(jsobj, str) else getattr(jsobj, 'data', None)
+    if not isinstance(data, str):
+        return None
+    if data.isascii():
+        return len(data)
+    chunk_size = PAYLOAD_BYTES_CHUNK_SIZE
+    return sum(len(data[i:i + chunk_size].encode()) for i in range(0, len(data), chunk_size))
@@ -8,14 +8,20 @@ import {
     createHeatmap,
     createWinnersChart,
     drawSpectrogram,
+    drawSpectrogramFromImage,
     drawWaveform,
+    drawWaveformFromPeakPyramid,
     DFLT_CHK_SIZE_MCS,
     DEFAULT_WINDOW_SIZE,
     getNFactor,
+    PeakPyramid,
+    PEAKS_COLUMNS,
+    SpectrogramImage,
 } from './processing';
 import { SelectedRange, Timerange } from './MultiTimeVis';
 
 const PROGRESS_INTERVAL: number = 100;
+const PLAYBACK_WINDOW_MCS: number = 60000000;  // how much audio is fetched (from a windowUrl) to be played
 
 export interface DataPoint {
     bt?: number;
@@ -40,12 +46,16 @@ export interface AudioChannel {
     image?: string;
     onClose?: () => void;
     normalize?: boolean;
+    peaks?: PeakPyramid;
+    spectrogram?: SpectrogramImage;
     subtitle?: string;
     title?: string;
     tt?: number;
     type: 'audio';
     url?: string;
     windowSize?: number;
+    // a url to which ?bt=...&tt=... (microseconds) can be added, to get a WAV of just that window
+    windowUrl?: string;
     [fieldName: string]: any;
 }
 
@@ -196,6 +206,11 @@ export default class TimeChannel extends React.Component<IProps, Partial<IState>
     }
 
     componentWillReceiveProps(newProps: IProps): void {
+        const zoomChanged: boolean = newProps.leftX !== this.props.leftX || newProps.rightX !== this.props.rightX;
+        if (zoomChanged && newProps.channel === this.props.channel &&
+            newProps.channel && (newProps.channel as AudioChannel).peaks) {
+            this.drawPeaks(newProps);
+        }
         if (newProps.channel !== this.props.channel) {
             if (newProps.channel &&
                 newProps.channel.type === 'audio' &&
@@ -250,7 +265,14 @@ export default class TimeChannel extends React.Component<IProps, Partial<IState>
             this.soundUtils = new SoundUtility();
         }
         const channel: AudioChannel = props.channel as AudioChannel;
-        if (channel.chartType === 'spectrogram') {
+        if (channel.chartType === 'spectrogram' && channel.spectrogram) {
+            const image: string = drawSpectrogramFromImage(channel.spectrogram);
+            channel.image = image;
+            this.setState({ image });
+            if (channel.buffer && props.enablePlayback) {
+                this.soundUtils.getAudioBuffer(channel.buffer, true);
+            }
+        } else if (channel.chartType === 'spectrogram') {
             let promise: Promise<[any[], AudioBuffer]>;
             if (channel.buffer) {
                 promise = this.soundUtils.getSpectrogramTransformAndAudioBuffer(channel.buffer, true);
@@ -265,6 +287,11 @@ export default class TimeChannel extends React.Component<IProps, Partial<IState>
                 channel.image = image;
                 this.setState({ image });
             })
+        } else if (channel.peaks) {
+            this.drawPeaks(props);
+            if (channel.buffer && props.enablePlayback) {
+                this.soundUtils.getAudioBuffer(channel.buffer, true);
+            }
         } else {
             let promise: Promise<AudioBuffer>;
             if (channel.buffer) {
@@ -282,6 +309,15 @@ export default class TimeChannel extends React.Component<IProps, Partial<IState>
         }
     }
 
+    drawPeaks: (props: IProps) => void = (props: IProps) => {
+        const channel: AudioChannel = props.channel as AudioChannel;
+        const viewRatio: number = (props.rightX || 1) - (props.leftX || 0);
+        const image: string = drawWaveformFromPeakPyramid(channel.peaks, PEAKS_COLUMNS / viewRatio,
+            { normalize: channel.normalize });
+        channel.image = image;
+        this.setState({ image });
+    }
+
     createImage: (props: IProps) => void = (props: IProps) => {
         const chunkSize: number = this.props.channel.chunkSize ||
             this.props.params ? this.props.params.chunkSize :
@@ -373,6 +409,11 @@ export default class TimeChannel extends React.Component<IProps, Partial<IState>
     }
 
     startPlaybackFromIndicator: VoidFunction = () => {
+        const windowUrl: string = (this.props.channel as AudioChannel).windowUrl;
+        if (windowUrl) {
+            this.playWindowFromIndicator(windowUrl);
+            return;
+        }
         if (!this.soundUtils || !this.soundUtils.currentBuffer) {
             return;
         }
@@ -383,6 +424,25 @@ export default class TimeChannel extends React.Component<IProps, Partial<IState>
         this.scrollIndicator();
     }
 
+    playWindowFromIndicator: (windowUrl: string) => void = (windowUrl: string) => {
+        if (!this.soundUtils) {
+            this.soundUtils = new SoundUtility();
+        }
+        const bt: number = Math.floor(this.props.bt + this.indicatorX * (this.props.tt - this.props.bt));
+        const tt: number = Math.min(this.props.tt, bt + PLAYBACK_WINDOW_MCS);
+        const separator: string = windowUrl.indexOf('?') === -1 ? '?' : '&';
+        this._playing = true;
+        this.soundUtils.getAudioBufferFromUrl(`${windowUrl}${separator}bt=${bt}&tt=${tt}`, true)
+            .then(() => {
+                if (!this._playing) {  // stopped while fetching
+                    return;
+                }
+                this.soundUtils.onEnded = this.stopIndicator;
+                this.soundUtils.play(0);
+                this.scrollIndicator();
+            });
+    }
+
     togglePlaybackOnKeydown: (event: KeyboardEvent) => void = (event: KeyboardEvent) => {
         const keycode: number = event.which || event.keyCode;
         if (keycode === 32) { // Spacebar
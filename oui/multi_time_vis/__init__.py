@@ -6,7 +6,12 @@ from oui.multi_time_vis.base import (
 
 from oui.multi_time_vis.audio import (
     jsobj_of_audio,
+    jsobjs_of_audio,
     wfsr_to_jsobj,
     file_to_jsobj,
     render_wav_file,  # deprecated alias
-)
\ No newline at end of file
+)
+
+from oui.multi_time_vis.filters import apply_filters, FILTERS
+
+from oui.multi_time_vis.spectrogram import wf_to_spectrogram
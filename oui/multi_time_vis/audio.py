@@ -1,8 +1,25 @@
 import io
 import os
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import PurePath
 from typing import Iterable
+
+import numpy as np
+
 from oui.multi_time_vis.base import single_time_vis
+from oui.multi_time_vis.spectrogram import (
+    wf_to_spectrogram,
+    spectrogram_of_blocks,
+    spectrogram_spec,
+    DFLT_WINDOW_SIZE,
+)
+from oui.multi_time_vis.render_cache import artifact, source_artifacts
+from oui import require_bundle_feature
+from oui.instrumentation import instrumented_render, stage
+from oui.transport import array_for_transport, validate_transport
 
 CHANNEL_TYPES = ['audio', 'data']
 
@@ -12,6 +29,25 @@ MAX_WF_LEN_FOR_SPECTROGRAMS = 44100 * 3600 / 2  # would be half an hour at 44100
 DFLT_ENABLE_PLAYBACK = True
 DFLT_HEIGHT = 100
 DFLT_PARAMS = None
+# How waveforms are shipped: 'list' (of ints), which the shipped bundle (oui/js/index.js) reads, or 'base64'
+# (raw int16 bytes, about 3 times smaller), which needs a bundle built from the current TS sources
+# (with transport.ts). The default should become 'base64' when that bundle is shipped.
+DFLT_WF_TRANSPORT = 'list'
+DFLT_PEAKS_WINDOW = 256  # number of samples summarized by each (min, max) peak of the finest pyramid level
+DFLT_PEAKS_MIN_LEVEL_SIZE = 1000  # stop halving the pyramid once a level has no more peaks than this
+DFLT_MAX_PEAKS = 2 ** 20  # max size of the finest pyramid level (the window is doubled until it's respected)
+DFLT_STREAM_BLOCK_SIZE = 2 ** 20  # number of samples read at a time when streaming a file
+DFLT_BATCH_CHUNK_SIZE = 1  # number of sources rendered by a worker task (more amortizes the IPC of small clips)
+ON_ERRORS = ('yield', 'skip', 'raise')
+DFLT_SPECTROGRAM_ENGINE = 'browser'  # or 'python', to compute spectrograms here (no length limit)
+SPECTROGRAM_ENGINES = ('browser', 'python')
+# Where peaks charts are computed: 'browser' (from the shipped waveform), which the shipped bundle does, or
+# 'python' (a compact peak pyramid, see ``wf_to_peak_pyramid``), which needs a bundle built from the current
+# TS sources. The default should become 'python' when that bundle is shipped.
+DFLT_PEAKS_ENGINE = 'browser'
+PEAKS_ENGINES = ('browser', 'python')
+# The JS bundle features (see ``oui.BUNDLE_FEATURES``) needed to draw the charts computed in python
+_PYTHON_CHART_FEATURES = {'peaks': 'peak_pyramids', 'spectrogram': 'spectrogram_images'}
 
 
 # The convenience function
@@ -46,16 +82,256 @@ def jsobj_of_audio(src,
         raise TypeError(f"Unrecognized src type: {type(src)}")
 
 
-def wfsr_to_src_spec(wf, sr=44100):
+def wfsr_to_src_spec(wf,
+                     sr=44100,
+                     wf_transport=DFLT_WF_TRANSPORT,
+                     chart_type=None,
+                     include_wf=True,
+                     spectrogram_engine=DFLT_SPECTROGRAM_ENGINE,
+                     window_size=DFLT_WINDOW_SIZE,
+                     artifacts=None,
+                     peaks_engine=DFLT_PEAKS_ENGINE):
+    """Make the (audio) channel spec of a waveform.
+
+    :param wf: Waveform. An iterable of ints
+    :param sr: Sample rate
+    :param wf_transport: How to ship arrays to JS, 'base64' or 'list' (see ``oui.transport``)
+    :param chart_type: If 'peaks' and ``peaks_engine='python'``, a peak pyramid (see ``wf_to_peak_pyramid``)
+        is included in the spec. If 'spectrogram' and ``spectrogram_engine='python'``, a spectrogram image is.
+    :param include_wf: Whether to include the waveform itself (needed for playback, or for the browser
+        to compute the chart itself)
+    :param spectrogram_engine: Where to compute spectrograms: 'browser' or 'python'
+        (see ``oui.multi_time_vis.spectrogram``)
+    :param window_size: The FFT window size of the python spectrogram engine
+    :param artifacts: The (cached) artifacts of the waveform's file, if any
+        (see ``oui.multi_time_vis.render_cache``), from which the peaks or spectrogram are taken
+    :param peaks_engine: Where to compute peaks charts: 'browser' or 'python' (see ``DFLT_PEAKS_ENGINE``)
+    """
     duration_s = len(wf) / sr
 
-    return {
+    src_spec = {
         'type': 'audio',
-        'wf': _cast_wf(wf),
         'sr': sr,
         'bt': 0,
         'tt': int(duration_s * 1000000)
     }
+    if include_wf:
+        with stage('cast'):
+            src_spec['wf'] = _wf_for_transport(wf, wf_transport)
+    if chart_type == 'peaks' and peaks_engine == 'python':
+        window = peaks_window_for(len(wf))
+        with stage('preprocess'):
+            levels = artifact(artifacts, 'peaks', lambda: wf_to_peak_pyramid(wf, window), window=window)
+        with stage('cast'):
+            src_spec['peaks'] = peak_pyramid_spec(levels, window, transport=wf_transport)
+    elif chart_type == 'spectrogram' and spectrogram_engine == 'python':
+        with stage('preprocess'):
+            image = artifact(
+                artifacts,
+                'spectrogram',
+                lambda: wf_to_spectrogram(wf, window_size=window_size),
+                window_size=window_size,
+            )
+        with stage('cast'):
+            src_spec['spectrogram'] = spectrogram_spec(image, window_size, transport=wf_transport)
+    return src_spec
+
+
+def _chart_is_computed_in_python(chart_type, spectrogram_engine=DFLT_SPECTROGRAM_ENGINE,
+                                 peaks_engine=DFLT_PEAKS_ENGINE):
+    return (chart_type == 'peaks' and peaks_engine == 'python') or (
+        chart_type == 'spectrogram' and spectrogram_engine == 'python'
+    )
+
+
+def _require_python_chart(chart_type):
+    """Raise a ``RuntimeError`` if the JS bundle can't draw the chart_type chart computed in python"""
+    if chart_type in _PYTHON_CHART_FEATURES:
+        require_bundle_feature(_PYTHON_CHART_FEATURES[chart_type], f"A {chart_type} chart computed in python")
+
+
+def wf_to_peak_pyramid(wf, window=DFLT_PEAKS_WINDOW, min_level_size=DFLT_PEAKS_MIN_LEVEL_SIZE):
+    """Compute the (min, max) envelope of wf at several resolutions.
+
+    The first level has a (min, max) pair for every ``window`` samples, and every following level halves
+    the resolution of the previous one, until a level has no more than ``min_level_size`` peaks.
+
+    >>> levels = wf_to_peak_pyramid([0, 3, -1, 2, -5, 1, 4, 0, 2], window=2, min_level_size=1)
+    >>> [level.tolist() for level in levels]  # doctest: +NORMALIZE_WHITESPACE
+    [[[0, 3], [-1, 2], [-5, 1], [0, 4], [2, 2]],
+     [[-1, 3], [-5, 4], [2, 2]],
+     [[-5, 4], [2, 2]],
+     [[-5, 4]]]
+
+    :param wf: Waveform. An iterable of ints
+    :param window: The number of samples per peak of the finest level
+    :param min_level_size: The maximum number of peaks of the coarsest level
+    :return: A list of (n_peaks, 2) arrays of (min, max) pairs, from finest to coarsest
+    """
+    return peak_pyramid_of_blocks([wf], window, min_level_size)
+
+
+def peak_pyramid_of_blocks(blocks, window=DFLT_PEAKS_WINDOW, min_level_size=DFLT_PEAKS_MIN_LEVEL_SIZE):
+    """Same as ``wf_to_peak_pyramid``, but for a waveform given as consecutive blocks of samples.
+
+    Only one block (and the peaks) is held in memory at a time.
+
+    >>> blocks = [[0, 3, -1], [2, -5, 1, 4, 0], [2]]
+    >>> [level.tolist() for level in peak_pyramid_of_blocks(blocks, window=2, min_level_size=2)]
+    [[[0, 3], [-1, 2], [-5, 1], [0, 4], [2, 2]], [[-1, 3], [-5, 4], [2, 2]], [[-5, 4], [2, 2]]]
+    """
+    finest_parts = []
+    rest = np.zeros(0, dtype='int16')
+    for block in blocks:
+        buffer = np.concatenate([rest, np.asarray(block)])
+        n_full = (len(buffer) // window) * window
+        finest_parts.append(_window_peaks(buffer[:n_full], window))
+        rest = buffer[n_full:]
+    if len(rest):
+        finest_parts.append(_window_peaks(rest, window))
+    levels = [np.concatenate(finest_parts)]
+    while len(levels[-1]) > max(min_level_size, 1):
+        levels.append(_halve_peaks(levels[-1]))
+    return levels
+
+
+def peaks_window_for(n_samples, window=DFLT_PEAKS_WINDOW, max_peaks=DFLT_MAX_PEAKS):
+    """The window to use for the finest pyramid level, so that it has no more than max_peaks peaks
+
+    >>> peaks_window_for(44100 * 60), peaks_window_for(44100 * 3600 * 10)
+    (256, 2048)
+    """
+    while n_samples > window * max_peaks:
+        window *= 2
+    return window
+
+
+def peak_pyramid_spec(levels, window=DFLT_PEAKS_WINDOW, transport=DFLT_WF_TRANSPORT):
+    """The jsonizable form of a peak pyramid, as expected by the JS peaks renderer"""
+    return {
+        'window': window,
+        'levels': [array_for_transport(level, transport, dtype='int16') for level in levels],
+    }
+
+
+def _window_peaks(wf, window):
+    """(min, max) of every consecutive window of wf (the last window may be shorter)"""
+    n_full = (len(wf) // window) * window
+    full_windows = wf[:n_full].reshape(-1, window)
+    peaks = np.stack([full_windows.min(axis=1), full_windows.max(axis=1)], axis=1)
+    if n_full < len(wf):
+        tail = wf[n_full:]
+        peaks = np.concatenate([peaks, [[tail.min(), tail.max()]]]).astype(peaks.dtype)
+    return peaks
+
+
+def _halve_peaks(peaks):
+    """Merge (min, max) pairs two by two"""
+    if len(peaks) % 2:
+        peaks = np.concatenate([peaks, peaks[-1:]])
+    pairs = peaks.reshape(-1, 2, 2)
+    return np.stack([pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)], axis=1)
+
+
+class RenderFailure:
+    """What ``jsobjs_of_audio`` yields, instead of a jsobj, for a source that couldn't be rendered"""
+
+    def __init__(self, index, src, error, traceback_str=''):
+        self.index = index
+        self.src = src
+        self.error = error
+        self.traceback = traceback_str
+
+    def __repr__(self):
+        return f'RenderFailure(index={self.index}, error={self.error!r})'
+
+
+def jsobjs_of_audio(srcs,
+                    n_workers=None,
+                    chunk_size=DFLT_BATCH_CHUNK_SIZE,
+                    on_error='yield',
+                    **kwargs):
+    """Render many audio sources (with ``jsobj_of_audio``) in a pool of processes.
+
+    The sources are decoded and their charts computed by the workers, and the jsobjs are yielded lazily, in
+    the order of the sources, with only a few chunks of sources in flight at a time (so srcs can be a long,
+    or infinite, iterable).
+
+    >>> import numpy as np
+    >>> wf = np.zeros(44100, dtype='int16')
+    >>> results = list(jsobjs_of_audio([wf, 'no_such_file.wav', (wf, 8000)], n_workers=0, chart_type='peaks'))
+    >>> [type(result).__name__ for result in results]
+    ['BundledJavascript', 'RenderFailure', 'BundledJavascript']
+    >>> results[1].index, results[1].src
+    (1, 'no_such_file.wav')
+
+    :param srcs: An iterable of sources (anything ``jsobj_of_audio`` takes, that can be pickled: filepaths,
+        bytes, (wf, sr) pairs...)
+    :param n_workers: The number of worker processes (default: the number of cores).
+        With 0, sources are rendered in this process (which is useful to debug).
+    :param chunk_size: The number of sources given to a worker at a time
+    :param on_error: What to do with a source that couldn't be rendered: 'yield' a ``RenderFailure``
+        in its place (the default), 'skip' it, or 'raise' its error (ending the batch)
+    :param kwargs: The arguments given to ``jsobj_of_audio`` for all sources (chart_type, cache...)
+    """
+    if on_error not in ON_ERRORS:
+        raise ValueError(f"on_error should be one of {ON_ERRORS}. Was {on_error}")
+    chunks = _enumerated_chunks(srcs, chunk_size)
+    if n_workers == 0:
+        rendered_chunks = (_render_chunk(chunk, kwargs) for chunk in chunks)
+        yield from _handle_failures(rendered_chunks, on_error)
+        return
+    n_workers = n_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(n_workers) as executor:
+        yield from _handle_failures(_ordered_results(executor, chunks, kwargs, 2 * n_workers), on_error)
+
+
+def _enumerated_chunks(srcs, chunk_size):
+    enumerated = enumerate(srcs)
+    while True:
+        chunk = list(islice(enumerated, max(chunk_size, 1)))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _ordered_results(executor, chunks, kwargs, max_pending):
+    """The rendered chunks, in order, with at most max_pending chunks submitted (and not yet yielded)"""
+    pending = deque()
+    for chunk in chunks:
+        pending.append((chunk, executor.submit(_render_chunk, chunk, kwargs)))
+        if len(pending) >= max_pending:
+            yield _chunk_result(*pending.popleft())
+    while pending:
+        yield _chunk_result(*pending.popleft())
+
+
+def _chunk_result(chunk, future):
+    try:
+        return future.result()
+    except Exception as error:  # the chunk couldn't be sent or received (e.g. unpicklable source)
+        return [RenderFailure(i, src, error, traceback.format_exc()) for i, src in chunk]
+
+
+def _render_chunk(chunk, kwargs):
+    results = []
+    for i, src in chunk:
+        try:
+            results.append(jsobj_of_audio(src, **kwargs))
+        except Exception as error:
+            results.append(RenderFailure(i, src, error, traceback.format_exc()))
+    return results
+
+
+def _handle_failures(rendered_chunks, on_error):
+    for results in rendered_chunks:
+        for result in results:
+            if isinstance(result, RenderFailure):
+                if on_error == 'raise':
+                    raise result.error
+                elif on_error == 'skip':
+                    continue
+            yield result
 
 
 # The base function
@@ -67,18 +343,34 @@ def wfsr_to_jsobj(
         params=DFLT_PARAMS,
         title=None,
         subtitle='',
+        wf_transport=DFLT_WF_TRANSPORT,
+        spectrogram_engine=DFLT_SPECTROGRAM_ENGINE,
+        window_size=DFLT_WINDOW_SIZE,
+        artifacts=None,
+        peaks_engine=DFLT_PEAKS_ENGINE,
         **kwargs):
     """Make a (jupyter displayable) jsobj from a (waveform, sample rate)  or just waveform source
 
     :param src
     :param wf: Waveform. An iterable of ints
     :param sr: Sample rate. An int.
-    :param chart_type: The chart type to render, either 'peaks' (default) or 'spectrogram'
-    :param enable_playback: Whether to enable playback on double click (default True)
+    :param chart_type: The chart type to render, either 'peaks' (default) or 'spectrogram'.
+    :param enable_playback: Whether to enable playback on double click (default True).
+        For charts computed in python (see ``peaks_engine`` and ``spectrogram_engine``), the waveform samples
+        are only shipped if playback is enabled.
     :param height: The height of the chart in pixels (default 50)
     :param params: Extra rendering parameters, currently unused
     :param title: The title to display, defaults to the filename
     :param subtitle: An optional subtitle to display under the title
+    :param wf_transport: How to ship the waveform to JS: 'list' (a list of ints, the default)
+        or 'base64' (raw int16 bytes, much more compact, but needs a rebuilt JS bundle: see ``DFLT_WF_TRANSPORT``)
+    :param spectrogram_engine: Where to compute spectrograms: 'browser' (the default) or 'python'.
+        The python engine ships a compact (uint8) image, so isn't limited to MAX_WF_LEN_FOR_SPECTROGRAMS.
+    :param window_size: The FFT window size of the python spectrogram engine
+    :param artifacts: The (cached) artifacts of the waveform's file, if any (see ``file_to_jsobj``)
+    :param peaks_engine: Where to compute peaks charts: 'browser' (the default) or 'python', which ships a
+        (compact) peak pyramid instead of the waveform, but needs a rebuilt JS bundle (see ``DFLT_PEAKS_ENGINE``).
+        The python spectrogram engine needs a rebuilt JS bundle too.
     :param kwargs: extra kwargs to be passed on to Javascript object constructor
     :return:
     """
@@ -87,23 +379,38 @@ def wfsr_to_jsobj(
     else:
         wf = src
         sr = DFLT_SR
+    if spectrogram_engine not in SPECTROGRAM_ENGINES:
+        raise ValueError(f"spectrogram_engine should be one of {SPECTROGRAM_ENGINES}. Was {spectrogram_engine}")
+    if peaks_engine not in PEAKS_ENGINES:
+        raise ValueError(f"peaks_engine should be one of {PEAKS_ENGINES}. Was {peaks_engine}")
+    validate_transport(wf_transport, 'wf_transport')
     if chart_type is None:
-        if len(wf) > MAX_WF_LEN_FOR_SPECTROGRAMS:
+        if len(wf) > MAX_WF_LEN_FOR_SPECTROGRAMS and spectrogram_engine == 'browser':
             chart_type = 'peaks'
         else:
             chart_type = 'spectrogram'
-    src_spec = wfsr_to_src_spec(wf, sr)
-    title = title or ''
-    return single_time_vis(src_spec,
-                           bt=src_spec['bt'],
-                           tt=src_spec['tt'],
-                           chart_type=chart_type,
-                           enable_playback=enable_playback,
-                           height=height,
-                           params=params,
-                           title=title,
-                           subtitle=subtitle,
-                           **kwargs)
+    computed_in_python = _chart_is_computed_in_python(chart_type, spectrogram_engine, peaks_engine)
+    if computed_in_python:
+        _require_python_chart(chart_type)
+    # the waveform is only needed in the browser for playback, or if the browser is to compute the chart
+    include_wf = enable_playback or not computed_in_python
+    with instrumented_render('wfsr_to_jsobj') as render:
+        src_spec = wfsr_to_src_spec(wf, sr, wf_transport, chart_type=chart_type, include_wf=include_wf,
+                                    spectrogram_engine=spectrogram_engine, window_size=window_size,
+                                    artifacts=artifacts, peaks_engine=peaks_engine)
+        title = title or ''
+        jsobj = single_time_vis(src_spec,
+                                bt=src_spec['bt'],
+                                tt=src_spec['tt'],
+                                chart_type=chart_type,
+                                enable_playback=enable_playback,
+                                height=height,
+                                params=params,
+                                title=title,
+                                subtitle=subtitle,
+                                **kwargs)
+        render.add_counts(n_samples=len(wf))
+    return jsobj
 
 
 # A function for file-like sources
@@ -114,6 +421,10 @@ def file_to_jsobj(src,
                   params=DFLT_PARAMS,
                   title=None,
                   subtitle='',
+                  stream=False,
+                  block_size=DFLT_STREAM_BLOCK_SIZE,
+                  cache=None,
+                  serve=False,
                   **kwargs
                   ):
     """Renders a time visualization of a WAV file from its file.
@@ -125,27 +436,160 @@ def file_to_jsobj(src,
     :param params: Extra rendering parameters, currently unused
     :param title: The title to display, defaults to the filename
     :param subtitle: An optional subtitle to display under the title
+    :param stream: If True, the file is read block by block, and only the chart (a peak pyramid, or a
+        spectrogram image) is computed and shipped, with a memory footprint that doesn't depend on the file's
+        length. Since the samples themselves are not shipped, playback is disabled.
+        Charts computed in python need a rebuilt JS bundle (see ``DFLT_PEAKS_ENGINE``).
+    :param block_size: The number of samples to read at a time, when streaming
+    :param cache: Where to cache the decoded waveform and the computed charts, so that rendering the same
+        file again doesn't recompute them: a ``RenderCache`` (see ``oui.multi_time_vis.render_cache``),
+        or True, for the default one. Default (None) is not to cache.
+    :param serve: If True (src must then be a filepath), the file is served by a local server (see
+        ``oui.multi_time_vis.audio_server``) and, as when streaming, only the chart is computed and inlined.
+        The channel gets the urls of the file and of its windows, so playback fetches only what it plays.
+        This needs a rebuilt JS bundle too.
     :param kwargs: extra kwargs to be passed on to Javascript object constructor
     """
-    import soundfile
 
-    wfsr = soundfile.read(src, dtype='int16')
     if title is None and isinstance(src, str):
         title = os.path.basename(src)
-    return wfsr_to_jsobj(wfsr,
+    artifacts = source_artifacts(src, cache)
+    if serve:
+        if not isinstance(src, (str, PurePath)):
+            raise TypeError(f"Only files (given by their path) can be served. Was {type(src)}")
+        return _streamed_file_to_jsobj(src, chart_type, height, params, title, subtitle, block_size,
+                                       artifacts=artifacts, serve=True, enable_playback=enable_playback,
+                                       **kwargs)
+    if stream:
+        return _streamed_file_to_jsobj(src, chart_type, height, params, title, subtitle, block_size,
+                                       artifacts=artifacts, **kwargs)
+    wf, sr = artifact(artifacts, 'wfsr', lambda: _read_wfsr(src))
+    return wfsr_to_jsobj((wf, int(sr)),
                          chart_type=chart_type,
                          enable_playback=enable_playback,
                          height=height,
                          params=params,
                          title=title,
                          subtitle=subtitle,
+                         artifacts=artifacts,
                          **kwargs
                          )
 
 
+def _read_wfsr(src):
+    import soundfile
+
+    wf, sr = soundfile.read(src, dtype='int16')
+    return [wf, np.array(sr)]
+
+
 render_wav_file = file_to_jsobj  # back-compatibility alias
 
 
+def _streamed_file_to_jsobj(src,
+                            chart_type=DFLT_CHART_TYPE,
+                            height=DFLT_HEIGHT,
+                            params=DFLT_PARAMS,
+                            title=None,
+                            subtitle='',
+                            block_size=DFLT_STREAM_BLOCK_SIZE,
+                            wf_transport=DFLT_WF_TRANSPORT,
+                            window_size=DFLT_WINDOW_SIZE,
+                            spectrogram_engine='python',
+                            artifacts=None,
+                            serve=False,
+                            enable_playback=False,
+                            peaks_engine='python',
+                            **kwargs):
+    """file_to_jsobj, computing the chart from blocks of the file instead of the whole waveform.
+    If serve, the file is also served locally, and its urls given to the channel, for playback."""
+    if spectrogram_engine != 'python' or peaks_engine != 'python':
+        raise ValueError("When streaming, charts can only be computed with the 'python' engines")
+    validate_transport(wf_transport, 'wf_transport')
+    _require_python_chart(chart_type or 'spectrogram')
+    if serve:
+        require_bundle_feature('audio_urls', 'serve=True')
+    with instrumented_render('file_to_jsobj'):
+        with stage('preprocess'):
+            src_spec = file_to_src_spec(src, chart_type, block_size, wf_transport, window_size, artifacts)
+        if serve:
+            from oui.multi_time_vis.audio_server import audio_server
+
+            server = audio_server()
+            src_spec.update(url=server.file_url(src), windowUrl=server.window_url(src))
+        jsobj = single_time_vis(src_spec,
+                                bt=src_spec['bt'],
+                                tt=src_spec['tt'],
+                                chart_type=chart_type or 'spectrogram',
+                                enable_playback=serve and enable_playback,
+                                height=height,
+                                params=params,
+                                title=title or '',
+                                subtitle=subtitle,
+                                **kwargs)
+    return jsobj
+
+
+def file_to_src_spec(src,
+                     chart_type=DFLT_CHART_TYPE,
+                     block_size=DFLT_STREAM_BLOCK_SIZE,
+                     wf_transport=DFLT_WF_TRANSPORT,
+                     window_size=DFLT_WINDOW_SIZE,
+                     artifacts=None):
+    """Make the (audio) channel spec of an audio file, reading it block by block.
+
+    Only the chart (a peak pyramid, or a spectrogram image) is computed and included, not the samples.
+    Multi-channel files are represented by their first channel.
+
+    :param src: The filepath str (or posix path) or file-like object
+    :param chart_type: 'peaks' or 'spectrogram' (the default)
+    :param block_size: The number of samples to read at a time
+    :param wf_transport: How to ship arrays to JS, 'base64' or 'list' (see ``oui.transport``)
+    :param window_size: The FFT window size of the spectrogram
+    :param artifacts: The (cached) artifacts of the file, if any (see ``oui.multi_time_vis.render_cache``)
+    """
+    import soundfile
+
+    chart_type = chart_type or 'spectrogram'
+    with soundfile.SoundFile(src) as sound_file:
+        sr, n_samples = sound_file.samplerate, sound_file.frames
+        blocks = (_first_channel(block) for block in sound_file.blocks(block_size, dtype='int16'))
+        src_spec = {
+            'type': 'audio',
+            'sr': sr,
+            'bt': 0,
+            'tt': int(n_samples / sr * 1000000),
+        }
+        if chart_type == 'peaks':
+            window = peaks_window_for(n_samples)
+            levels = artifact(artifacts, 'peaks', lambda: peak_pyramid_of_blocks(blocks, window), window=window)
+            src_spec['peaks'] = peak_pyramid_spec(levels, window, transport=wf_transport)
+        elif chart_type == 'spectrogram':
+            image = artifact(
+                artifacts,
+                'streamed_spectrogram',
+                lambda: spectrogram_of_blocks(blocks, n_samples, window_size=window_size),
+                window_size=window_size,
+            )
+            src_spec['spectrogram'] = spectrogram_spec(image, window_size, transport=wf_transport)
+        else:
+            raise ValueError(f"Can only stream 'peaks' or 'spectrogram' charts. Was {chart_type}")
+    return src_spec
+
+
+def _first_channel(block):
+    return block if block.ndim == 1 else block[:, 0]
+
+
+def _wf_for_transport(wf, wf_transport=DFLT_WF_TRANSPORT):
+    """Get wf in the form it should be shipped to JS (see ``oui.transport``)"""
+    if wf_transport == 'list':
+        return _cast_wf(wf)
+    wf = np.asarray(wf)
+    assert len(wf) == 0 or wf.dtype.kind in 'iu', f"wf should be made of ints, but was of dtype {wf.dtype}"
+    return array_for_transport(wf, wf_transport, dtype='int16')
+
+
 def _cast_wf(wf):
     """Cast wf to a list of ints"""
     if not isinstance(wf, list):
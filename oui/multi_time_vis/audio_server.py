@@ -0,0 +1,295 @@
+"""A local (localhost only) HTTP server of audio files, for the 'url' mode of audio channels.
+
+Instead of inlining the samples of a (huge) recording in the notebook's output, register its file here,
+and give the channel the url of the file (served with HTTP Range support, so players can seek) and the
+url of its windows: ``<window_url>?bt=<microseconds>&tt=<microseconds>`` is a (small, int16) WAV of just
+that window, decoded from the file on request. The TimeChannel component fetches the window it plays.
+Other (derived) artifacts can be registered and served as well.
+
+The server runs in a background (daemon) thread of the kernel, started on first use, or standalone:
+
+    python -m oui.multi_time_vis.audio_server path/to/recording.flac --port 8765
+
+>>> server = AudioServer().start()
+>>> url = server.register_artifact(b'0123456789', 'application/octet-stream')
+>>> from urllib.request import urlopen, Request
+>>> response = urlopen(Request(url, headers={'Range': 'bytes=2-5'}))
+>>> response.status, response.headers['Content-Range'], response.read()
+(206, 'bytes 2-5/10', b'2345')
+>>> server.stop()
+"""
+import io
+import os
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DFLT_HOST = '127.0.0.1'
+DFLT_PORT = 0  # any free port
+MAX_WINDOW_SECONDS = 600  # the longest window served at once
+DFLT_MAX_ARTIFACT_BYTES = 2 ** 28  # beyond this total size, the oldest artifacts are forgotten
+_COPY_BLOCK_SIZE = 2 ** 16
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CONTENT_TYPES = {
+    '.wav': 'audio/wav',
+    '.flac': 'audio/flac',
+    '.ogg': 'audio/ogg',
+    '.mp3': 'audio/mpeg',
+}
+
+
+class AudioServer:
+    """Serves registered files (with Range support), windows of them (as WAV), and registered artifacts.
+
+    :param host: The host to bind to. Keep it a loopback address: files are served to anyone who can connect.
+    :param port: The port to listen to (default: any free one)
+    :param max_artifact_bytes: The maximum total size of the registered artifacts. Registering more forgets
+        the oldest ones (their urls then get 404s), so a long-running kernel doesn't keep them all in memory.
+    """
+
+    def __init__(self, host=DFLT_HOST, port=DFLT_PORT, max_artifact_bytes=DFLT_MAX_ARTIFACT_BYTES):
+        self.host = host
+        self.port = port
+        self.max_artifact_bytes = max_artifact_bytes
+        self.files = {}  # token -> filepath
+        self.artifacts = OrderedDict()  # token -> (content bytes, content type), oldest first
+        self._artifact_bytes = 0
+        self._artifacts_lock = threading.Lock()
+        self._tokens_of_files = {}
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def bind(self):
+        """Bind the server to its address (so that, if the port was 0, the actual port is known)"""
+        if self._httpd is None:
+            self._httpd = ThreadingHTTPServer((self.host, self.port), _AudioRequestHandler)
+            self._httpd.daemon_threads = True
+            self._httpd.audio_server = self
+            self.port = self._httpd.server_address[1]
+        return self
+
+    def start(self):
+        """Start serving, in a background thread. Returns the server itself."""
+        if self._thread is None:
+            self.bind()
+            self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in this thread (until interrupted)"""
+        self.bind()
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+            self._httpd = None
+
+    def stop(self):
+        """Stop the background thread started by ``start``"""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = self._thread = None
+
+    def register(self, filepath):
+        """Serve the file, returning its token (the same if it was already registered)"""
+        filepath = os.path.realpath(filepath)
+        if not os.path.isfile(filepath):
+            raise FileNotFoundError(filepath)
+        token = self._tokens_of_files.get(filepath)
+        if token is None:
+            token = self._tokens_of_files[filepath] = secrets.token_urlsafe(16)
+            self.files[token] = filepath
+        return token
+
+    def file_url(self, filepath):
+        """The url of the (registered) file"""
+        return f'{self.base_url}/files/{self.register(filepath)}'
+
+    def window_url(self, filepath):
+        """The url of the windows of the (registered) file: add ``?bt=...&tt=...`` (in microseconds)"""
+        return f'{self.file_url(filepath)}/window.wav'
+
+    def register_artifact(self, content, content_type='application/octet-stream'):
+        """Serve some bytes, returning their url (see ``max_artifact_bytes``)"""
+        content = bytes(content)
+        if len(content) > self.max_artifact_bytes:
+            raise ValueError(
+                f"The artifact ({len(content)} bytes) is bigger than max_artifact_bytes ({self.max_artifact_bytes})"
+            )
+        token = secrets.token_urlsafe(16)
+        with self._artifacts_lock:
+            while self.artifacts and self._artifact_bytes + len(content) > self.max_artifact_bytes:
+                oldest_content, _ = self.artifacts.popitem(last=False)[1]
+                self._artifact_bytes -= len(oldest_content)
+            self.artifacts[token] = (content, content_type)
+            self._artifact_bytes += len(content)
+        return f'{self.base_url}/artifacts/{token}'
+
+
+class _AudioRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_OPTIONS(self):  # CORS preflight (the notebook isn't served from the same origin)
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self._send_cors_headers()
+        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Range')
+        self.end_headers()
+
+    def log_message(self, format, *args):  # (no logs in the notebook's output)
+        pass
+
+    def _respond(self, send_body):
+        audio_server = self.server.audio_server
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        try:
+            if len(parts) == 2 and parts[0] == 'files' and parts[1] in audio_server.files:
+                filepath = audio_server.files[parts[1]]
+                content_type = _CONTENT_TYPES.get(os.path.splitext(filepath)[1].lower(), 'application/octet-stream')
+                with open(filepath, 'rb') as fp:
+                    self._send_ranged(fp, os.path.getsize(filepath), content_type, send_body)
+            elif len(parts) == 3 and parts[0] == 'files' and parts[2] == 'window.wav' and parts[1] in audio_server.files:
+                query = parse_qs(url.query)
+                bt, tt = int(query.get('bt', ['0'])[0]), query.get('tt', [None])[0]
+                wav = wav_window(audio_server.files[parts[1]], bt, None if tt is None else int(tt))
+                self._send_ranged(io.BytesIO(wav), len(wav), 'audio/wav', send_body)
+            elif len(parts) == 2 and parts[0] == 'artifacts' and parts[1] in audio_server.artifacts:
+                # (got with a default: it may have been forgotten since, by another thread registering one)
+                content, content_type = audio_server.artifacts.get(parts[1], (None, None))
+                if content is None:
+                    self.send_error(HTTPStatus.NOT_FOUND)
+                else:
+                    self._send_ranged(io.BytesIO(content), len(content), content_type, send_body)
+            else:
+                self.send_error(HTTPStatus.NOT_FOUND)
+        except ValueError as err:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(err))
+        except (BrokenPipeError, ConnectionResetError):  # the client went away (e.g. a seek)
+            pass
+
+    def _send_ranged(self, fp, size, content_type, send_body):
+        """Send the content of fp (or the part of it that the Range header asks for)"""
+        start, stop = 0, size
+        range_header = self.headers.get('Range')
+        if range_header:
+            byte_range = parse_range(range_header, size)
+            if byte_range is None:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self._send_cors_headers()
+                self.end_headers()
+                return
+            start, stop = byte_range
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header('Content-Range', f'bytes {start}-{stop - 1}/{size}')
+        else:
+            self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(stop - start))
+        self.send_header('Accept-Ranges', 'bytes')
+        self._send_cors_headers()
+        self.end_headers()
+        if send_body:
+            fp.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                block = fp.read(min(_COPY_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                self.wfile.write(block)
+                remaining -= len(block)
+
+    def _send_cors_headers(self):
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'Content-Range, Accept-Ranges, Content-Length')
+
+
+def parse_range(range_header, size):
+    """The (start, stop) byte indices a (single range) Range header asks for, or None if it can't be satisfied.
+
+    >>> parse_range('bytes=0-99', 1000), parse_range('bytes=900-', 1000), parse_range('bytes=-100', 1000)
+    ((0, 100), (900, 1000), (900, 1000))
+    >>> parse_range('bytes=990-2000', 1000), parse_range('bytes=1000-', 1000)
+    ((990, 1000), None)
+    """
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if match is None:
+        raise ValueError(f"Unsupported Range header: {range_header}")
+    first, last = match.groups()
+    if not first:  # the last bytes
+        if not last:
+            raise ValueError(f"Unsupported Range header: {range_header}")
+        start, stop = max(size - int(last), 0), size
+    else:
+        start, stop = int(first), size if not last else min(int(last) + 1, size)
+    return (start, stop) if start < stop else None
+
+
+def wav_window(filepath, bt=0, tt=None, max_seconds=MAX_WINDOW_SECONDS):
+    """The (int16) WAV bytes of the [bt, tt) (microseconds) window of an audio file.
+    Only that window is read (and decoded) from the file.
+
+    >>> wav_window('any.wav', bt=10, tt=10)
+    Traceback (most recent call last):
+      ...
+    ValueError: The window should be such that 0 <= bt < tt (bt=10, tt=10)
+    """
+    import soundfile
+
+    if bt < 0 or (tt is not None and tt <= bt):
+        raise ValueError(f"The window should be such that 0 <= bt < tt (bt={bt}, tt={tt})")
+    with soundfile.SoundFile(filepath) as sound_file:
+        sr = sound_file.samplerate
+        start = min(bt * sr // 1000000, sound_file.frames)
+        stop = sound_file.frames if tt is None else min(-(-tt * sr // 1000000), sound_file.frames)
+        stop = min(stop, start + max_seconds * sr)
+        sound_file.seek(start)
+        samples = sound_file.read(stop - start, dtype='int16')
+    wav = io.BytesIO()
+    soundfile.write(wav, samples, sr, format='WAV', subtype='PCM_16')
+    return wav.getvalue()
+
+
+_audio_server = None
+_audio_server_lock = threading.Lock()
+
+
+def audio_server():
+    """The (started) server of this process, made on first use"""
+    global _audio_server
+    with _audio_server_lock:
+        if _audio_server is None:
+            _audio_server = AudioServer().start()
+    return _audio_server
+
+
+def serve(*filepaths, host=DFLT_HOST, port=DFLT_PORT):
+    """Serve audio files (printing their urls) until interrupted"""
+    server = AudioServer(host, port).bind()
+    for filepath in filepaths:
+        print(f'{filepath}: {server.file_url(filepath)} (windows: {server.window_url(filepath)}?bt=...&tt=...)')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    import argh
+
+    argh.dispatch_command(serve)
@@ -2,7 +2,23 @@ from IPython.display import Javascript
 from copy import copy
 from typing import Optional
 
+import numpy as np
+
+from oui import BundledJavascript, require_bundle_feature
+from oui.multi_time_vis.live import LiveTimeChannel
+from oui.multi_time_vis.decimation import decimated_channel_data, DFLT_CHK_SIZE_MCS, DFLT_DECIMATION
+from oui.multi_time_vis.filters import apply_filters
+from oui.instrumentation import instrumented_render, stage
+from oui.serialization import render_call_source
+from oui.transport import (
+    is_encoded_array, encode_array, share_encoded_arrays, validate_transport, TRANSPORT_DTYPES, TRANSPORTS
+)
+
 CHANNEL_TYPES = ['audio', 'data']
+# How numpy arrays of data are shipped: 'list' (of numbers, or of data point dicts), which the shipped bundle
+# (oui/js/index.js) reads, or 'base64' (typed arrays, see ``oui.transport``), which needs a bundle built from
+# the current TS sources. The default should become 'base64' when that bundle is shipped.
+DFLT_DATA_TRANSPORT = 'list'
 
 
 def single_time_vis(channel: dict,
@@ -14,6 +30,11 @@ def single_time_vis(channel: dict,
                     params=None,
                     title: str = '',
                     subtitle='',
+                    resolution: Optional[int] = None,
+                    decimation: str = DFLT_DECIMATION,
+                    live: bool = False,
+                    max_points: Optional[int] = None,
+                    data_transport: str = DFLT_DATA_TRANSPORT,
                     **kwargs
                     ) -> Javascript:
     """
@@ -29,6 +50,17 @@ def single_time_vis(channel: dict,
     :param params: An empty dict or a dict with "chunk_size" as an integer in milliseconds
     :param title: A title to display above the chart
     :param subtitle: A subtitle to display under the title
+    :param resolution: The maximum number of points of a (numerical) data channel to ship to the browser
+        (typically, the width of the display, in pixels). More points are decimated (see ``decimation``).
+        Default (None) is to ship them all.
+    :param decimation: How points are decimated: 'minmax' (the min and max of each bucket of points) or
+        'lttb' (Largest-Triangle-Three-Buckets). See ``oui.multi_time_vis.decimation``.
+    :param live: If True, a ``LiveTimeChannel`` is returned, whose ``append(chunk)`` method pushes new values
+        to the displayed channel (see ``oui.multi_time_vis.live``). Live channels aren't decimated, and need
+        a JS bundle built from the current TS sources (see ``oui.BUNDLE_FEATURES``).
+    :param max_points: The number of (most recent) values a live channel retains (default: all of them)
+    :param data_transport: How (numpy arrays of) data are shipped: 'list' (the default) or 'base64'
+        (typed arrays: much more compact, but needs a rebuilt JS bundle, see ``DFLT_DATA_TRANSPORT``)
 
     Channel keys:
 
@@ -36,59 +68,270 @@ def single_time_vis(channel: dict,
     Should include either "url" or both "wf" and "sr"
 
     :param url: A URL to access WAV-format audio over HTTP
-    :param wf: A list of 16-bit integers
+    :param wf: A list of 16-bit integers, or an int16 array spec (see ``oui.transport.encode_array``)
     :param sr: The sample rate of the recording
+    :param peaks: Optionally, a precomputed peak pyramid (see ``oui.multi_time_vis.audio.wf_to_peak_pyramid``),
+        with which 'peaks' charts are drawn without the browser having to go through the whole waveform
+    :param spectrogram: Optionally, a precomputed spectrogram image (see ``oui.multi_time_vis.spectrogram``)
 
     Data channel:
 
-    Can be a list of numbers (for bargraphs or heatmaps) or strings (for winners).
+    Can be a list (or array) of numbers (for bargraphs or heatmaps) or strings (for winners).
     Otherwise, a channel dict with the following keys:
 
-    :param data: A list of data points, with the keys "value" and either ("bt" and "tt") or "time"
+    :param data: A list of data points, with the keys "value" and either ("bt" and "tt") or "time",
+        or a numpy array: of numbers or strings, or a structured array with those same fields.
+        Numerical arrays are shipped to the browser as lists, or as typed arrays (see ``data_transport``).
     :param bargraphMax: The numeric value for the top of the chart, default 1
     :param bargraphMin: The numeric value for the top of the chart, default -2
     :param categories: For a winners channel, the list of categories to display
         (matching the "winners" values of the data points)
+    :param stats: The min, max (or categories) of the data values (see ``data_stats``). Computed if not given,
+        and kept in the (preprocessed) channel, so that rendering it again doesn't go through the data again.
+    :param filters: Filters (functions, or names of ``oui.multi_time_vis.filters.FILTERS``) to apply to the
+        data values, in order. They're applied (vectorized) before shipping: the browser gets filtered data.
+    :param filterParams: The params of the filters (e.g. ``{'_pow': 2}`` for the 'power' filter)
     """
-    channel = _preprocess_channel(channel)
-    props = dict(kwargs, bt=bt, tt=tt, chart_type=chart_type, enable_playback=enable_playback, height=height,
-                 params=params, title=title, subtitle=subtitle)
-    return _single_time_vis(channel, props)
+    validate_transport(data_transport, 'data_transport')
+    with instrumented_render('single_time_vis') as render:
+        if live:
+            require_bundle_feature('live_channels', 'live=True')
+            if resolution:
+                raise ValueError("Live channels can't be decimated (no resolution should be given)")
+        with stage('preprocess'):
+            channel = _preprocess_channel(channel, resolution, decimation, data_transport)
+        props = dict(kwargs, bt=bt, tt=tt, chart_type=chart_type, enable_playback=enable_playback,
+                     height=height, params=params, title=title, subtitle=subtitle)
+        if live:
+            jsobj = LiveTimeChannel(channel, props, max_points)
+        else:
+            jsobj = _single_time_vis(channel, props)
+        render.set_result(jsobj, counts={'channels': [channel_element_counts(channel)]})
+    return jsobj
 
 
-def time_vis(channels, props=None) -> Javascript:
+def time_vis(
+        channels, props=None, resolution=None, decimation=DFLT_DECIMATION, data_transport=DFLT_DATA_TRANSPORT
+) -> Javascript:
     """
     Render multiple channels.
 
+    The base64 arrays of the channels (see ``oui.transport``) are shared: equal ones are shipped once
+    (see ``share_encoded_arrays``). List payloads aren't, so with the default 'list' transports (of
+    ``data_transport``, and of the ``wf_transport`` of audio channels) nothing is deduplicated: sharing needs
+    a JS bundle built from the current TS sources, and 'base64' transports.
+
     :param channels: The channels to render, a list of dicts.
+    :param props: The props of the MultiTimeVis component
+    :param resolution: The maximum number of points of each data channel (see ``single_time_vis``)
+    :param decimation: How points are decimated, 'minmax' or 'lttb' (see ``single_time_vis``)
+    :param data_transport: How data arrays are shipped, 'list' or 'base64' (see ``single_time_vis``)
     :return:
     """
     if not props:
         props = {}
-    channels = [_preprocess_channel(channel) for channel in channels]
-    js_source = f'renderMultiTimeVis(element.get(0), {channels}, {props})'.replace('True', 'true').replace('None',
-                                                                                                           'null')
-    jsobj = Javascript(js_source)
-    jsobj._trace = {'channels': channels, 'props': props}
+    validate_transport(data_transport, 'data_transport')
+    with instrumented_render('time_vis') as render:
+        with stage('preprocess'):
+            channels = [
+                _preprocess_channel(channel, resolution, decimation, data_transport) for channel in channels
+            ]
+        counts = {'channels': list(map(channel_element_counts, channels))}
+        with stage('share_sources'):
+            # the arrays (waveforms, data...) go to a table, so several views of one source ship it once
+            shared_channels, sources = share_encoded_arrays(channels)
+        with stage('serialize'):
+            # (no table, no argument: so the call is the same as before tables, when there are no arrays)
+            args = (shared_channels, props, sources) if sources else (shared_channels, props)
+            js_source = render_call_source('renderMultiTimeVis', *args)
+        jsobj = BundledJavascript(js_source)
+        jsobj._trace = {'channels': channels, 'props': props}
+        render.set_result(jsobj, counts=dict(counts, n_sources=len(sources)))
     return jsobj
 
 
-def _preprocess_channel(channel):
+def channel_element_counts(channel):
+    """The number of elements of each of the (array) fields of a (preprocessed) channel.
+
+    >>> channel_element_counts({'data': [1, 2, 3], 'type': 'data'})
+    {'data': 3}
+    >>> channel_element_counts({'wf': {'dtype': 'int16', 'shape': [44100], 'b64': '...'}, 'sr': 44100})
+    {'wf': 44100}
+    """
+    counts = {}
+    for field in ('data', 'wf', 'peaks', 'spectrogram'):
+        if field in channel:
+            value = channel[field]
+            if field == 'peaks':
+                counts[field] = sum(map(_n_elements, value['levels']))
+            elif field == 'spectrogram':
+                counts[field] = _n_elements(value['image'])
+            else:
+                counts[field] = _n_elements(value)
+    return counts
+
+
+def _n_elements(x):
+    if is_encoded_array(x):
+        n = 1
+        for dim in x['shape']:
+            n *= dim
+        return n
+    elif isinstance(x, dict):  # columns (of a structured array)
+        return max(map(_n_elements, x.values()), default=0)
+    return len(x)
+
+
+def data_stats(data):
+    """The statistics of the values of a data channel's data: ``min`` and ``max`` for numbers,
+    ``categories`` (sorted) for strings. Arrays are handled by vectorized numpy reductions.
+    Null values (None, or NaN), and infinite ones, are ignored.
+
+    >>> data_stats([3, 1, 2])
+    {'min': 1, 'max': 3}
+    >>> data_stats([1.0, None, 3.0])
+    {'min': 1.0, 'max': 3.0}
+    >>> data_stats(np.array([0.5, np.nan, -1.5]))
+    {'min': -1.5, 'max': 0.5}
+    >>> data_stats(['b', None, 'a', 'b'])
+    {'categories': ['a', 'b']}
+    >>> data_stats(np.array([(0, 10, 4.0), (10, 20, 8.0)], dtype=[('bt', int), ('tt', int), ('value', float)]))
+    {'min': 4.0, 'max': 8.0}
+    >>> data_stats([0.5, -np.inf, 2.0])
+    {'min': 0.5, 'max': 2.0}
+    >>> data_stats([]), data_stats([None, None])
+    ({}, {})
+    """
+    values = _data_values(data)
+    if not isinstance(values, np.ndarray) or values.dtype.kind == 'O':
+        values = [v for v in values if v is not None]
+        if len(values) == 0:
+            return {}
+        if isinstance(values[0], str):
+            return {'categories': sorted(set(values))}
+        values = np.asarray(values)
+    if len(values) == 0:
+        return {}
+    if values.dtype.kind in 'US':
+        return {'categories': np.unique(values).tolist()}
+    lo, hi = values.min(), values.max()
+    if values.dtype.kind == 'f' and not (np.isfinite(lo) and np.isfinite(hi)):
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return {}
+        lo, hi = values.min(), values.max()
+    return {'min': lo.item(), 'max': hi.item()}
+
+
+def _data_values(data):
+    """The values of data: data itself, unless it's made of data points (dicts or structured array rows)"""
+    if isinstance(data, np.ndarray):
+        if data.dtype.names:
+            return data['value'] if 'value' in data.dtype.names else data[data.dtype.names[0]]
+        return data
+    if data and isinstance(data[0], dict):
+        key = 'value' if 'value' in data[0] else next(iter(data[0]))
+        return [point[key] for point in data]
+    return data
+
+
+def filtered_data(data, filters, params=None):
+    """The data (of a data channel) with its values filtered (see ``oui.multi_time_vis.filters``).
+    The other fields of data points are kept.
+
+    >>> filtered_data([1, 2, 3], ['normalize'])
+    array([0. , 0.5, 1. ])
+    >>> filtered_data([{'time': 0, 'value': 10}, {'time': 1, 'value': None}, {'time': 2, 'value': 20}], 'normalize')
+    [{'time': 0, 'value': 0.0}, {'time': 1, 'value': None}, {'time': 2, 'value': 1.0}]
+    """
+    return _with_values(data, apply_filters(_data_values(data), filters, params))
+
+
+def _with_values(data, values):
+    """The data with its values replaced by (the float array) values. For lists of data points, the
+    non-finite values (that json can't carry) become None."""
+    if isinstance(data, np.ndarray) and data.dtype.names:
+        key = 'value' if 'value' in data.dtype.names else data.dtype.names[0]
+        dtype = [(name, float if name == key else data.dtype[name]) for name in data.dtype.names]
+        filtered = data.astype(dtype)
+        filtered[key] = values
+        return filtered
+    if len(data) and isinstance(data[0], dict):
+        key = 'value' if 'value' in data[0] else next(iter(data[0]))
+        values = np.where(np.isfinite(values), values, None).tolist()
+        return [{**point, key: value} for point, value in zip(data, values)]
+    return values
+
+
+def _data_for_transport(data, transport=DFLT_DATA_TRANSPORT):
+    """Numerical arrays as encoded (typed) arrays (with the 'base64' transport) or as lists (with None for
+    NaN), structured arrays as a dict of such columns ('base64') or as a list of data point dicts ('list'),
+    and arrays of strings as lists. Anything else is left as is.
+
+    >>> _data_for_transport(np.array([0.5, np.nan]))
+    [0.5, None]
+    >>> _data_for_transport(np.array([(0, 1.5)], dtype=[('time', int), ('value', float)]))
+    [{'time': 0, 'value': 1.5}]
+    >>> _data_for_transport(np.array([1, 2], dtype='int16'), 'base64')
+    {'dtype': 'int16', 'shape': [2], 'b64': 'AQACAA=='}
+    """
+    if not isinstance(data, np.ndarray):
+        return data
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown transport: {transport}. Should be one of {TRANSPORTS}")
+    if data.dtype.names:
+        columns = {name: _data_for_transport(data[name], transport) for name in data.dtype.names}
+        if transport == 'list':
+            return [dict(zip(columns, point)) for point in zip(*columns.values())]
+        return columns
+    if data.dtype.kind in 'USO':
+        return data.astype(str).tolist()
+    if transport == 'list':
+        if data.dtype.kind == 'f' and not np.isfinite(data).all():
+            return np.where(np.isfinite(data), data, None).tolist()  # (json has no NaN)
+        return data.tolist()
+    if data.dtype.name not in TRANSPORT_DTYPES or data.dtype.name == 'float16':
+        data = data.astype('float64')  # numbers are doubles in JS anyway
+    return encode_array(data)
+
+
+def _preprocess_channel(
+        channel, resolution=None, decimation=DFLT_DECIMATION, data_transport=DFLT_DATA_TRANSPORT
+):
     preprocessed = copy(channel)
-    if isinstance(preprocessed, list):
+    if isinstance(preprocessed, (list, np.ndarray)):
         preprocessed = {
             'chart_type': 'bargraph',
             'data': preprocessed,
             'type': 'data',
         }
     data = preprocessed.get('data', [])
-    if data:
-        if isinstance(data[0], str):
+    if len(data) and not is_encoded_array(data) and not isinstance(data, dict):
+        if preprocessed.get('filters'):  # filtered here, once, rather than by the browser at every render
+            values = apply_filters(
+                _data_values(data), preprocessed.pop('filters'), preprocessed.pop('filterParams', None)
+            )
+            # (the stats of the filtered values, computed before they're put back in the data points)
+            preprocessed['stats'] = data_stats(values)
+            data = _with_values(data, values)
+        stats = preprocessed.get('stats')
+        if stats is None:
+            stats = preprocessed['stats'] = data_stats(data)
+        if 'categories' in stats:
             preprocessed['chart_type'] = 'winners'
-            preprocessed['categories'] = list(set(data))
-        else:
-            preprocessed['bargraphMax'] = max(*data)
-    if 'wf' in preprocessed or 'url' in preprocessed:
+            preprocessed.setdefault('categories', stats['categories'])
+        elif 'max' in stats:
+            preprocessed.setdefault('bargraphMax', stats['max'])
+            if resolution and len(data) > resolution:
+                data, preprocessed['chunkSizeMcs'] = decimated_channel_data(
+                    data,
+                    _data_values(data),
+                    resolution,
+                    decimation,
+                    preprocessed.get('chunkSizeMcs', DFLT_CHK_SIZE_MCS),
+                )
+        preprocessed['data'] = _data_for_transport(data, data_transport)
+    if {'wf', 'url', 'peaks', 'spectrogram'} & set(preprocessed):
         preprocessed['type'] = 'audio'
         preprocessed['chart_type'] = 'peaks'
     return preprocessed
@@ -103,7 +346,8 @@ def _single_time_vis(channel, props) -> Javascript:
         channel['chartType'] = props['chart_type']
     ##########################################################################################
 
-    js_source = f'renderTimeChannel(element.get(0), {channel}, {props})'.replace('True', 'true').replace('None', 'null')
-    jsobj = Javascript(js_source)
+    with stage('serialize'):
+        js_source = render_call_source('renderTimeChannel', channel, props)
+    jsobj = BundledJavascript(js_source)
     jsobj._trace = {'channel': channel, 'props': props}
     return jsobj
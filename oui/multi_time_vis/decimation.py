@@ -0,0 +1,131 @@
+"""Decimation of data channels, so that what's shipped to the browser is bounded by the display width.
+
+The JS bargraph and heatmap renderers draw every data point (on a canvas at least 20000 pixels wide), and
+lay them out one ``chunkSizeMcs`` after the other. So we bucket the points by that (sequential) time, and
+keep representatives of each bucket, chosen to preserve the shape of the data:
+
+- ``'minmax'``: the min and the max of each bucket (in the order they occur), so spikes are never lost,
+- ``'lttb'``: the point of each bucket making the Largest Triangle with the point kept in the previous
+  bucket and the average of the next one (Largest-Triangle-Three-Buckets).
+
+Representatives are selected by index, so they keep all their fields (e.g. of structured arrays).
+The chunk size of the decimated channel is widened accordingly, so it spans the same time range.
+
+>>> import numpy as np
+>>> values = np.array([0, 5, 1, 1, -3, 2, 2, 2, 9, 0])
+>>> minmax_indices(values, n_buckets=2)
+array([1, 4, 8, 9])
+>>> values[lttb_indices(values, n_buckets=4)]
+array([ 0, -3,  9,  0])
+"""
+import numpy as np
+
+DFLT_CHK_SIZE_MCS = 975238  # same as DFLT_CHK_SIZE_MCS of processing.ts
+DFLT_DECIMATION = 'minmax'
+DECIMATIONS = ('minmax', 'lttb')
+
+
+def decimation_indices(values, resolution, method=DFLT_DECIMATION):
+    """The (sorted) indices of the (at most ``resolution``) values to keep.
+
+    :param values: A 1D array of numbers
+    :param resolution: The maximum number of values to keep (typically, the width of the display, in pixels)
+    :param method: 'minmax' (two per bucket) or 'lttb' (one per bucket)
+    """
+    if method == 'minmax':
+        return minmax_indices(values, max(resolution // 2, 1))
+    elif method == 'lttb':
+        return lttb_indices(values, max(resolution, 2))
+    else:
+        raise ValueError(f"Unknown decimation method: {method}. Should be one of {DECIMATIONS}")
+
+
+def bucket_bounds(n_values, n_buckets):
+    """The (start, stop) indices of n_buckets consecutive buckets covering n_values values.
+    Bucket sizes differ by at most one.
+
+    >>> bucket_bounds(10, 3)
+    (array([0, 3, 6]), array([ 3,  6, 10]))
+    """
+    edges = np.linspace(0, n_values, n_buckets + 1).astype(int)
+    return edges[:-1], edges[1:]
+
+
+def minmax_indices(values, n_buckets):
+    """The indices of the min and max of each of n_buckets buckets of values: Two per bucket, in order.
+    NaNs are ignored (unless a bucket has nothing else)."""
+    values = np.asarray(values)
+    if len(values) <= 2 * n_buckets:
+        return np.arange(len(values))
+    bucket_values, bucket_idx = _bucket_matrix(values, n_buckets)
+    is_nan = np.isnan(bucket_values) if bucket_values.dtype.kind == 'f' else False
+    lowest = np.where(is_nan, np.inf, bucket_values)
+    highest = np.where(is_nan, -np.inf, bucket_values)
+    rows = np.arange(n_buckets)
+    argmin = bucket_idx[rows, np.argmin(lowest, axis=1)]
+    argmax = bucket_idx[rows, np.argmax(highest, axis=1)]
+    return np.stack([np.minimum(argmin, argmax), np.maximum(argmin, argmax)], axis=1).ravel()
+
+
+def lttb_indices(values, n_buckets):
+    """The indices of the Largest-Triangle-Three-Buckets representatives of values: One per bucket,
+    the first and last buckets being represented by the first and last values.
+
+    Each bucket depends on the point kept in the previous one, so buckets are gone through in a python
+    loop, but the triangle areas of a bucket's points are computed at once.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= n_buckets:
+        return np.arange(n)
+    elif n_buckets <= 2:
+        return np.array([0, n - 1])
+    # the first and last buckets are the first and last points; the others share the rest
+    starts, stops = bucket_bounds(n - 2, n_buckets - 2)
+    starts, stops = starts + 1, stops + 1
+    means = np.add.reduceat(np.nan_to_num(values), starts) / (stops - starts)
+    indices = np.empty(n_buckets, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i, (start, stop) in enumerate(zip(starts, stops)):
+        if i + 1 < len(starts):
+            c_x, c_y = (starts[i + 1] + stops[i + 1] - 1) / 2, means[i + 1]
+        else:
+            c_x, c_y = n - 1, values[-1]
+        x = np.arange(start, stop)
+        areas = np.abs((a - c_x) * (values[start:stop] - values[a]) - (a - x) * (c_y - values[a]))
+        a = indices[i + 1] = start + np.argmax(np.nan_to_num(areas, nan=-1))
+    return indices
+
+
+def decimated_channel_data(data, values, resolution, method=DFLT_DECIMATION, chunk_size=DFLT_CHK_SIZE_MCS):
+    """Decimate the data of a channel (if it has more than ``resolution`` points).
+
+    :param data: The data: a list (of numbers or data points) or an array (possibly structured)
+    :param values: The (numerical) values of data (see ``base._data_values``). Nones are taken as NaNs.
+    :param resolution: The maximum number of points to keep
+    :param method: The decimation method (see ``decimation_indices``)
+    :param chunk_size: The time (in microseconds) each of the original points spans
+    :return: A ``(data, chunk_size)`` pair: the kept points, and the time each of them spans
+
+    >>> decimated_channel_data(list(range(10)), list(range(10)), resolution=4, chunk_size=100)
+    ([0, 4, 5, 9], 250.0)
+    """
+    n = len(data)
+    if n <= resolution:
+        return data, chunk_size
+    indices = decimation_indices(np.asarray(values, dtype=float), resolution, method)
+    if isinstance(data, np.ndarray):
+        data = data[indices]
+    else:
+        data = [data[i] for i in indices]
+    return data, chunk_size * n / len(indices)
+
+
+def _bucket_matrix(values, n_buckets):
+    """A (n_buckets, max_bucket_size) matrix of the values of each bucket (the last value of the bucket
+    being repeated to fill the row), and the matrix of the indices these values come from."""
+    starts, stops = bucket_bounds(len(values), n_buckets)
+    bucket_idx = starts[:, None] + np.arange((stops - starts).max())
+    bucket_idx = np.minimum(bucket_idx, stops[:, None] - 1)
+    return values[bucket_idx], bucket_idx
@@ -0,0 +1,131 @@
+"""Vectorized (numpy) versions of the filters of ``filterFuncs.ts``, to filter data channels before shipping them.
+
+In the browser, a channel's ``filters`` are applied (by ``resolveFilters``) to every data point, at every
+render. Here, the ``filters`` of a channel are applied once, to the array of its values, when it's preprocessed:
+the browser receives the filtered (typed) array, with no filters left to apply.
+
+A filter is a ``filt(params, values) -> values`` function, like the JS ones: ``params`` is the (shared)
+``filterParams`` dict of the channel, and ``values`` a float array, where NaN plays the part of null (and
+is left as is). Filters can be given by the name they have in ``FILTERS``.
+
+>>> apply_filters([2.0, 4.0, np.nan, 6.0], ['normalize'])
+array([0. , 0.5, nan, 1. ])
+>>> apply_filters([1.0, 2.0, 3.0, 5.0], ['range', 'power'], {'_low': 0.25, '_high': 0.75, '_pow': 2})
+array([0.  , 0.  , 0.25, 1.  ])
+"""
+import numpy as np
+
+
+def normalize(params, values):
+    """Values scaled to [0, 1] (all 1 if they're all equal)"""
+    lo, hi = _nan_min_max(values)
+    if lo == hi:
+        return np.where(np.isnan(values), np.nan, 1.0)
+    return (values - lo) / (hi - lo)
+
+
+def categorize_and_normalize(params, values):
+    """The (1-based) index of each value in ``params['categories']``, divided by the number of categories.
+    Values that aren't a category are 0, nulls (None or NaN) stay NaN."""
+    categories = params['categories']
+    index_of = {category: (i + 1) / len(categories) for i, category in enumerate(categories)}
+    values = np.asarray(values, dtype=object)
+    is_null = np.array([v is None or (isinstance(v, float) and np.isnan(v)) for v in values], dtype=bool)
+    out = np.array([index_of.get(v, 0.0) for v in values.tolist()], dtype=float)
+    out[is_null] = np.nan
+    return out
+
+
+def dynamic_normalize(params, values):
+    """Values scaled to [0, 1] by the min and max of all the values filtered with these params so far
+    (kept in ``params['_min']`` and ``params['_max']``)"""
+    lo, hi = _nan_min_max(values)
+    if params is None:
+        return (values - lo) / (hi - lo)
+    if '_max' not in params or params['_max'] < hi:
+        params['_max'] = hi
+    if '_min' not in params or params['_min'] > lo:
+        params['_min'] = lo
+    return (values - params['_min']) / (params['_max'] - params['_min'])
+
+
+def log(params, values):
+    """The (natural) log of the values"""
+    return np.log(values)
+
+
+def power(params, values):
+    """The values to the power ``params['_pow']`` (default 1)"""
+    params = {} if params is None else params
+    if not params.get('_pow'):
+        params['_pow'] = 1
+    return np.power(values, params['_pow'])
+
+
+def range_normalize(params, values):
+    """Values scaled to [0, 1] between the ``params['_low']`` and ``params['_high']`` fractions (default 0 and 1)
+    of their range: Values below (above) that are 0 (1)."""
+    params = {} if params is None else params
+    if not params.get('_low') or params['_low'] < 0:
+        params['_low'] = 0
+    if not params.get('_high') or params['_high'] > 1:
+        params['_high'] = 1
+    lo, hi = _nan_min_max(values)
+    low, high = params['_low'] * (hi - lo) + lo, params['_high'] * (hi - lo) + lo
+    out = (values - low) / (high - low)
+    out[values < low] = 0
+    out[values > high] = 1
+    return out
+
+
+# The filters, by the name channels can refer to them with (the JS ones are funcNameDPA)
+FILTERS = {
+    'normalize': normalize,
+    'categorize_and_normalize': categorize_and_normalize,
+    'dynamic_normalize': dynamic_normalize,
+    'log': log,
+    'power': power,
+    'range': range_normalize,
+}
+
+
+def apply_filters(values, filters, params=None):
+    """Apply filters (functions, or names of ``FILTERS``), in order, to values, like ``resolveFilters`` does.
+
+    :param values: The values to filter (a list or array)
+    :param filters: The filters to apply
+    :param params: The params (dict) the filters are given (and may update, like ``dynamic_normalize`` does)
+    :return: The filtered values, as a float array
+    """
+    if isinstance(filters, str) or callable(filters):
+        filters = [filters]
+    filters = [_resolve_filter(filt) for filt in filters]
+    if filters and filters[0] is not categorize_and_normalize:
+        values = _float_values(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for filt in filters:
+            values = filt(params, values)
+    return _float_values(values)
+
+
+def _resolve_filter(filt):
+    if callable(filt):
+        return filt
+    try:
+        return FILTERS[filt]
+    except KeyError:
+        raise ValueError(f"Unknown filter: {filt}. Should be a function or one of {list(FILTERS)}")
+
+
+def _float_values(values):
+    """values as a float array, with None (null) as NaN"""
+    values = np.asarray(values)
+    if values.dtype.kind == 'O':
+        values = np.array([np.nan if v is None else v for v in values.tolist()], dtype=float)
+    return values.astype(float, copy=False)
+
+
+def _nan_min_max(values):
+    if len(values) == 0 or np.isnan(values).all():
+        return np.nan, np.nan
+    return np.nanmin(values), np.nanmax(values)
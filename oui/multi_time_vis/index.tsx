@@ -2,7 +2,7 @@ import * as React from 'react';
 import { render } from 'react-dom';
 import * as _ from 'lodash';
 
-import TimeChannel from './TimeChannel';
+import TimeChannel, { DataPoint } from './TimeChannel';
 export { default as TimeChannel } from './TimeChannel';
 export * from './TimeChannel';
 
@@ -13,9 +13,18 @@ export * from './MultiTimeVis';
 export { default as TimeAxis } from './TimeAxis';
 export * from './TimeAxis';
 
-import { DFLT_CHK_SIZE_MCS } from './processing';
+import { DFLT_CHK_SIZE_MCS, SpectrogramImage } from './processing';
 export * from './processing';
 import { bytesToMcs, DFLT_SR, generateWAVHeader } from '../sound_utils';
+import {
+    decodeArray,
+    decodeArrayBuffer,
+    EncodedArray,
+    isEncodedArray,
+    maybeDecodeArray,
+    resolveArrayRefs,
+    TypedArray,
+} from '../transport';
 
 import './style.scss';
 
@@ -50,12 +59,103 @@ export function renderTimeChannel(
         />, element);
 }
 
+export interface LiveOptions {
+    liveId: string;
+    maxPoints?: number;
+    target: string;
+}
+
+/**
+ * Render a time channel that the kernel can append values to (see oui/multi_time_vis/live.py):
+ * A comm is opened with the kernel, whose messages carry the new values as binary buffers.
+ */
+export function renderLiveTimeChannel(
+    element: HTMLElement,
+    channel: any,
+    props: any,
+    live: LiveOptions,
+): void {
+    const liveChannel: LiveTimeChannel = new LiveTimeChannel(element, channel, props, live);
+    liveChannel.render();
+    liveChannel.connect();
+}
+
+class LiveTimeChannel {
+    private bt: number;
+    private field: string;
+    private renderScheduled: boolean = false;
+    private step: number;
+    private values: TypedArray;
+
+    constructor(
+        private element: HTMLElement,
+        private channel: any,
+        private props: any,
+        private live: LiveOptions,
+    ) {
+        this.field = channel.type === 'audio' ? 'wf' : 'data';
+        this.values = maybeDecodeArray(channel[this.field]) || new Float64Array(0);
+        this.bt = channel.bt || 0;
+        this.step = this.field === 'wf' ? 1000000 / (channel.sr || DFLT_SR) : channel.chunkSizeMcs || DFLT_CHK_SIZE_MCS;
+    }
+
+    public connect(): void {
+        const jupyter: any = (window as any).Jupyter;
+        if (!jupyter || !jupyter.notebook || !jupyter.notebook.kernel) {
+            console.warn('oui: no kernel to get the appends of this live channel from');
+            return;
+        }
+        const comm: any = jupyter.notebook.kernel.comm_manager.new_comm(this.live.target, { liveId: this.live.liveId });
+        comm.on_msg((msg: any) => this.onMessage(msg.content.data, msg.buffers));
+    }
+
+    public render(): void {
+        this.renderScheduled = false;
+        const channel: any = { ...this.channel, bt: this.bt };
+        if (this.field === 'wf') {
+            channel.wf = this.values;
+            channel.tt = this.bt + Math.floor(this.values.length * this.step);
+        } else {
+            channel.data = Array.prototype.slice.call(this.values);
+            delete channel.tt;
+        }
+        renderTimeChannel(this.element, channel, { ...this.props, bt: this.bt, tt: channel.tt });
+    }
+
+    private onMessage(msg: any, buffers: DataView[]): void {
+        const chunk: TypedArray = decodeArrayBuffer(buffers[0], msg.dtype);
+        if (msg.type === 'reset') {
+            this.values = chunk;
+        } else {
+            const values: TypedArray = new (this.values.constructor as any)(this.values.length + chunk.length);
+            values.set(this.values);
+            values.set(chunk, this.values.length);
+            this.values = values;
+        }
+        if (this.live.maxPoints && this.values.length > this.live.maxPoints) {
+            this.values = this.values.slice(this.values.length - this.live.maxPoints);
+        }
+        this.bt = msg.bt;
+        if (typeof msg.bargraphMax === 'number') {
+            this.channel.bargraphMax = msg.bargraphMax;
+        }
+        if (!this.renderScheduled) {  // appends coming faster than frames are rendered together
+            this.renderScheduled = true;
+            window.requestAnimationFrame(() => this.render());
+        }
+    }
+}
+
 export function renderMultiTimeVis(
     element: HTMLElement,
     channels: any[],
     props: any,
+    sources?: { [ref: string]: EncodedArray },
 ): void {
     console.log('multi time vis v0.2.0');
+    if (sources) {
+        channels = resolveArrayRefs(channels, sources);
+    }
     const preprocessedChannels: any[] = _.map(channels, preprocessChannel);
     const bt: number = props.bt || _.minBy(preprocessedChannels, 'bt').bt || 0;
     const tt: number = props.tt || _.maxBy(preprocessedChannels, 'tt').tt || 10000000;
@@ -80,7 +180,15 @@ function preprocessChannel(channel: any): any {
 }
 
 function preprocessAudioChannel(channel: any): any {
-    const outputChannel: any = _.cloneDeep(channel);
+    const wf: any = maybeDecodeArray(channel.wf);
+    const outputChannel: any = _.cloneDeep(_.omit(channel, ['wf', 'peaks', 'spectrogram']));
+    outputChannel.wf = wf;
+    if (channel.peaks) {
+        outputChannel.peaks = {
+            levels: _.map(channel.peaks.levels, maybeDecodeArray),
+            window: channel.peaks.window,
+        };
+    }
     const sr: number = outputChannel.sr || DFLT_SR;
     if (!outputChannel.bt) {
         outputChannel.bt = 0;
@@ -98,6 +206,13 @@ function preprocessAudioChannel(channel: any): any {
     } else if (outputChannel.buffer) {
         outputChannel.buffer = new Int16Array(outputChannel.buffer).buffer;
     }
+    if (channel.spectrogram) {
+        outputChannel.spectrogram = preprocessSpectrogram(channel.spectrogram);
+    }
+    if (outputChannel.peaks) {
+        outputChannel.peaks.levels = _.map(outputChannel.peaks.levels, (level: any) =>
+            Array.isArray(level) ? Int16Array.from(_.flatten(level)) : level);
+    }
     if (!outputChannel.tt && outputChannel.buffer) {
         const duration: number = bytesToMcs(outputChannel.buffer.byteLength, 16, sr);
         outputChannel.tt = outputChannel.bt + duration;
@@ -105,6 +220,46 @@ function preprocessAudioChannel(channel: any): any {
     return outputChannel;
 }
 
+function preprocessSpectrogram(spectrogram: any): SpectrogramImage {
+    const image: any = spectrogram.image;
+    if (Array.isArray(image)) {
+        return {
+            ...spectrogram,
+            image: Uint8Array.from(_.flatten(image)),
+            nBins: image.length ? image[0].length : 0,
+            nFrames: image.length,
+        };
+    }
+    return {
+        ...spectrogram,
+        image: decodeArray(image),
+        nBins: image.shape[1],
+        nFrames: image.shape[0],
+    };
+}
+
+/**
+ * The data of a data channel, as shipped by python: a list, an encoded (typed) array,
+ * or (for structured arrays) a dict of columns, which is made into a list of data points.
+ */
+function dataFromTransport(data: any): any {
+    if (!data || Array.isArray(data) || isEncodedArray(data)) {
+        return maybeDecodeArray(data);
+    }
+    const columns: { [fieldName: string]: any } = _.mapValues(data, maybeDecodeArray);
+    const fieldNames: string[] = _.keys(columns);
+    const nPoints: number = fieldNames.length ? columns[fieldNames[0]].length : 0;
+    const points: DataPoint[] = new Array(nPoints);
+    for (let i: number = 0; i < nPoints; i++) {
+        const point: any = {};
+        for (const fieldName of fieldNames) {
+            point[fieldName] = columns[fieldName][i];
+        }
+        points[i] = point;
+    }
+    return points;
+}
+
 function preprocessDataChannel(channel: any): any {
     let outputChannel: any = channel;
     if (Array.isArray(channel)) {
@@ -113,6 +268,7 @@ function preprocessDataChannel(channel: any): any {
             type: 'data',
         };
     }
+    outputChannel.data = dataFromTransport(outputChannel.data);
     if (!outputChannel.data || !outputChannel.data.length) {
         outputChannel.data = [];
         return outputChannel;
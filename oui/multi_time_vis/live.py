@@ -0,0 +1,139 @@
+"""Live time channels: a rendered channel that new samples (or data points) can be appended to.
+
+Instead of re-rendering the whole history of a live sensor (or audio stream) every few seconds,
+``single_time_vis(..., live=True)`` returns a ``LiveTimeChannel``: a (displayable) Javascript object whose
+``append(chunk)`` method ships only the new values to the displayed component(s), over a kernel comm,
+as raw binary buffers. With ``max_points``, only the last max_points values are retained, both here and
+in the browser, so memory stays bounded however long the stream is.
+
+Live channels are rendered by ``renderLiveTimeChannel``, which the JS bundle shipped in oui/js/index.js
+predates: ``single_time_vis`` refuses ``live=True`` until the bundle is rebuilt (see ``oui.BUNDLE_FEATURES``).
+Comms need a notebook kernel, and a frontend exposing it (the classic notebook's ``Jupyter`` global).
+Elsewhere, appends are only retained here (and pushed to the displays that open a comm later on).
+
+>>> live = LiveTimeChannel({'type': 'data', 'data': [1.0, 2.0]}, props={}, max_points=3)
+>>> live.append([3.0, 4.0])
+>>> live.values
+array([2., 3., 4.])
+>>> live.bt == DFLT_CHK_SIZE_MCS  # the first point was dropped, so the channel now starts one chunk later
+True
+"""
+import weakref
+from uuid import uuid4
+
+import numpy as np
+
+from oui import BundledJavascript, _notebook_shell
+from oui.instrumentation import stage
+from oui.multi_time_vis.decimation import DFLT_CHK_SIZE_MCS
+from oui.serialization import render_call_source
+from oui.transport import encode_array, decode_array, is_encoded_array
+
+LIVE_COMM_TARGET = 'oui_live_time_channel'
+DFLT_SR = 44100
+# Where the registration of the comm target is recorded (on the IPython shell, like the JS injection)
+_COMM_TARGET_ATTR = '_oui_live_comm_target_registered'
+_live_channels = weakref.WeakValueDictionary()  # the live channels (of this kernel) by their id
+
+
+class LiveTimeChannel(BundledJavascript):
+    """A time channel (displayable as such) whose ``append`` method pushes new values to its display(s).
+
+    :param channel: A preprocessed channel: a (numerical) data channel, or an audio channel with a 'wf'
+    :param props: The props of the TimeChannel component
+    :param max_points: The number of (most recent) values to retain. Default (None) is to retain them all.
+    """
+
+    def __init__(self, channel, props, max_points=None):
+        self.field = 'wf' if channel.get('type') == 'audio' else 'data'
+        values = channel.get(self.field, [])
+        values = decode_array(values) if is_encoded_array(values) else np.asarray(values)
+        if self.field == 'wf':
+            values = values.astype('int16', copy=False)
+            self.step = 1e6 / channel.get('sr', DFLT_SR)  # microseconds per sample
+        else:
+            if values.dtype.kind not in 'iufb' or values.ndim != 1:
+                raise TypeError("Only data channels of numbers (and audio channels) can be live")
+            values = values.astype('float64', copy=False)
+            self.step = channel.get('chunkSizeMcs', DFLT_CHK_SIZE_MCS)
+        self.max_points = max_points
+        self.bargraph_max = channel.get('bargraphMax')
+        self.bt = channel.get('bt', 0)
+        self._values = values
+        self._retain()
+        self.live_id = uuid4().hex
+        self.comms = []
+
+        channel = dict(channel, bt=self.bt, **{self.field: encode_array(self._values)})
+        channel.pop('peaks', None)  # the browser computes the charts of the growing waveform
+        channel.pop('spectrogram', None)
+        if self.field == 'wf':
+            channel['tt'] = self.tt
+        if 'chart_type' in props:  # (see the "horrible hack" of base._single_time_vis)
+            channel['chartType'] = props['chart_type']
+        live = {'liveId': self.live_id, 'target': LIVE_COMM_TARGET, 'maxPoints': max_points}
+        with stage('serialize'):
+            js_source = render_call_source('renderLiveTimeChannel', channel, props, live)
+        super().__init__(js_source)
+        self._trace = {'channel': channel, 'props': props}
+        _live_channels[self.live_id] = self
+        _register_comm_target()
+
+    @property
+    def values(self):
+        """The retained values"""
+        return self._values
+
+    @property
+    def tt(self):
+        return self.bt + int(len(self._values) * self.step)
+
+    def append(self, chunk):
+        """Append values to the channel, and push them to its displays
+
+        :param chunk: An iterable of numbers (int16 samples, for an audio channel)
+        """
+        chunk = np.asarray(chunk, dtype=self._values.dtype).ravel()
+        self._values = np.concatenate([self._values, chunk])
+        self._retain()
+        finite = chunk[np.isfinite(chunk)] if self.field == 'data' else ()
+        if len(finite):
+            chunk_max = finite.max().item()
+            if self.bargraph_max is None or chunk_max > self.bargraph_max:
+                self.bargraph_max = chunk_max  # so that the bars of the new values aren't cut
+        self._send('append', chunk)
+
+    def _retain(self):
+        if self.max_points is not None and len(self._values) > self.max_points:
+            n_dropped = len(self._values) - self.max_points
+            self._values = self._values[n_dropped:].copy()  # (a copy, so the dropped values are freed)
+            self.bt += int(n_dropped * self.step)
+
+    def _send(self, msg_type, values, comms=None):
+        msg = {'type': msg_type, 'dtype': values.dtype.name, 'bt': self.bt, 'bargraphMax': self.bargraph_max}
+        buffer = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<')).tobytes()
+        for comm in list(self.comms if comms is None else comms):
+            comm.send(msg, buffers=[buffer])
+
+    def _attach(self, comm):
+        """Push appends to comm (the comm of a new display) from now on, starting with all retained values"""
+        self.comms.append(comm)
+        comm.on_close(lambda msg: self.comms.remove(comm) if comm in self.comms else None)
+        self._send('reset', self._values, comms=[comm])
+
+
+def _register_comm_target():
+    """Have the kernel open a comm whenever a displayed live channel asks for one (once per kernel)"""
+    shell = _notebook_shell()
+    if shell is None or getattr(shell, _COMM_TARGET_ATTR, False):
+        return
+    shell.kernel.comm_manager.register_target(LIVE_COMM_TARGET, _open_live_comm)
+    setattr(shell, _COMM_TARGET_ATTR, True)
+
+
+def _open_live_comm(comm, open_msg):
+    live_channel = _live_channels.get(open_msg['content']['data'].get('liveId'))
+    if live_channel is None:  # e.g. a display of a live channel of a previous kernel
+        comm.close()
+    else:
+        live_channel._attach(comm)
@@ -16,6 +16,8 @@ const CANVAS_WIDTH: number = 20000;
 const BASE_BAR_HEIGHT: number = 4;
 export const CATEGORY_HEIGHT: number = 20;
 const MAX_INT_16: number = 32768;
+export const PEAKS_COLUMNS: number = 2000;
+const MAX_PEAKS_COLUMNS: number = 32000;
 const DEFAULT_COLOR: string = '#cc7799';
 const WINNERS_COLOR: string = '#8637ba';
 
@@ -296,6 +298,49 @@ export function drawWaveformFromPeaks(
     return canvas.toDataURL('image/png');
 }
 
+export interface PeakPyramid {
+    window: number;
+    // (min, max) pairs, interleaved, from the finest to the coarsest level
+    levels: Int16Array[];
+}
+
+/**
+ * Returns the coarsest level of the pyramid that still has at least targetColumns peaks
+ * (or the finest level, if none have that many).
+ */
+export function selectPeaksLevel(pyramid: PeakPyramid, targetColumns: number): Int16Array {
+    const levels: Int16Array[] = pyramid.levels;
+    for (let i: number = levels.length - 1; i >= 0; i--) {
+        if (levels[i].length / 2 >= targetColumns) {
+            return levels[i];
+        }
+    }
+    return levels[0];
+}
+
+export function drawWaveformFromPeakPyramid(
+    pyramid: PeakPyramid,
+    targetColumns: number,
+    params?: {
+        normalize?: boolean,
+    },
+): string {
+    if (!pyramid || !pyramid.levels.length) {
+        return;
+    }
+    const level: Int16Array = selectPeaksLevel(pyramid, Math.min(targetColumns, MAX_PEAKS_COLUMNS));
+    const peaks: [number, number][] = [];
+    let maxAbs: number = 0;
+    for (let i: number = 0; i < level.length; i += 2) {
+        const min: number = level[i] / MAX_INT_16;
+        const max: number = level[i + 1] / MAX_INT_16;
+        maxAbs = Math.max(maxAbs, -min, max);
+        peaks.push([min, max]);
+    }
+    const nFactor: number = params && params.normalize && maxAbs > 0 ? 1 / maxAbs : 1;
+    return drawWaveformFromPeaks(peaks, { nFactor });
+}
+
 export function drawWaveformFromConcatenatedPeaks(
     data: {bt: number, peaks: [number, number][]}[],
     from: number,
@@ -376,6 +421,47 @@ export function drawSpectrogram(data: any, useNewColors?: boolean): string {
     return canvas.toDataURL('image/png');
 }
 
+export interface SpectrogramImage {
+    // uint8 (dB) values, frame by frame, lowest frequency first
+    image: Uint8Array;
+    nBins: number;
+    nFrames: number;
+    windowSize?: number;
+    hopSize?: number;
+}
+
+/**
+ * Draws a spectrogram that was computed (and quantized to uint8) on the python side
+ */
+export function drawSpectrogramFromImage(spectrogram: SpectrogramImage, useNewColors?: boolean): string {
+    if (!spectrogram || !spectrogram.nFrames) {
+        return;
+    }
+    const { image, nBins, nFrames } = spectrogram;
+    const canvas = document.createElement('canvas');
+    const context = canvas.getContext('2d');
+    canvas.width = nFrames;
+    canvas.height = nBins;
+
+    const colors = useNewColors ? ['#0000FF', '#00FFFF', '#00FF00', '#FFFF00', '#FF0000'] :
+        ['#000000', '#0c0f94', '#ff0000', '#ffff00', '#ffffff'];
+    const color: any = chroma.scale(colors).domain([0, 255]).mode('rgb');
+    const colorTable: [number, number, number][] = [];
+    for (let value: number = 0; value < 256; value++) {
+        colorTable.push(color(value).rgb());
+    }
+
+    const canvasData = context.getImageData(0, 0, nFrames, nBins);
+    for (let frame: number = 0; frame < nFrames; frame++) {
+        for (let bin: number = 0; bin < nBins; bin++) {
+            const y: number = nBins - 1 - bin;
+            draw1x1Pixel(canvasData, (frame + y * nFrames) * 4, colorTable[image[frame * nBins + bin]]);
+        }
+    }
+    context.putImageData(canvasData, 0, 0);
+    return canvas.toDataURL('image/png');
+}
+
 function draw1x1Pixel(canvasData, index: number, rgb: [number, number, number]) {
     canvasData.data[index]  = Math.floor(rgb[0]);
     canvasData.data[index + 1]  = Math.floor(rgb[1]);
@@ -0,0 +1,321 @@
+"""A persistent cache of what's computed to render audio files (decoded waveforms, peak pyramids,
+spectrogram images), so that re-running a notebook (or a dashboard over a fixed corpus of files)
+doesn't decode and recompute everything again.
+
+Artifacts are keyed by a fingerprint of their file (its path, size and modification time, or a hash of
+its content) and by the parameters they were computed with. They're stored as (uncompressed) ``.npz``
+files in a directory whose total size is capped (the least recently used files are evicted first),
+with an in-process (also size capped, LRU) memory tier in front.
+
+>>> import tempfile
+>>> cache = RenderCache(tempfile.mkdtemp(), max_bytes=2 ** 20, memory_max_bytes=2 ** 10)
+>>> calls = []
+>>> def compute():
+...     calls.append(1)
+...     return [np.arange(3), np.array(44100)]
+>>> cache.get_or_compute('some_key', compute)
+[array([0, 1, 2]), array(44100)]
+>>> cache.get_or_compute('some_key', compute)  # from the memory tier
+[array([0, 1, 2]), array(44100)]
+>>> cache.memory.clear()
+>>> cache.get_or_compute('some_key', compute)  # from the disk
+[array([0, 1, 2]), array(44100)]
+>>> len(calls)
+1
+"""
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import PurePath
+
+import numpy as np
+
+# Bump this when what the artifacts are (or how they're computed) changes, so older ones aren't used
+RENDER_CACHE_VERSION = 1
+CACHE_DIR_ENV_VAR = 'OUI_CACHE_DIR'
+DFLT_CACHE_DIR = os.environ.get(
+    CACHE_DIR_ENV_VAR, os.path.join(os.path.expanduser('~'), '.cache', 'oui', 'renders')
+)
+DFLT_CACHE_MAX_BYTES = 2 ** 30
+DFLT_MEMORY_MAX_BYTES = 2 ** 28
+KEY_BYS = ('stat', 'content')
+_HASH_BLOCK_SIZE = 2 ** 20
+_ARRAY_KEY = 'array'  # the npz key of artifacts that are a single array (others are lists of arrays)
+
+
+def artifact_nbytes(artifact):
+    """The number of bytes of an artifact (an array, or a list of arrays)"""
+    if isinstance(artifact, np.ndarray):
+        return artifact.nbytes
+    return sum(arr.nbytes for arr in artifact)
+
+
+class MemoryStore(MutableMapping):
+    """An in-memory store of artifacts, whose total size is capped: when it's exceeded, the least recently
+    used artifacts are dropped.
+
+    >>> store = MemoryStore(max_bytes=16)
+    >>> store['a'], store['b'] = np.zeros(1), np.zeros(1)  # 8 bytes each
+    >>> store['a'] is not None  # 'a' is now more recently used than 'b'
+    True
+    >>> store['c'] = np.zeros(1)
+    >>> sorted(store)
+    ['a', 'c']
+    """
+
+    def __init__(self, max_bytes=DFLT_MEMORY_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._artifacts = OrderedDict()
+
+    def __getitem__(self, k):
+        artifact = self._artifacts[k]
+        self._artifacts.move_to_end(k)
+        return artifact
+
+    def __setitem__(self, k, artifact):
+        if k in self._artifacts:
+            del self[k]
+        nbytes = artifact_nbytes(artifact)
+        if nbytes > self.max_bytes:
+            return  # would evict everything, and still not fit
+        self._artifacts[k] = artifact
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            del self[next(iter(self._artifacts))]
+
+    def __delitem__(self, k):
+        self.nbytes -= artifact_nbytes(self._artifacts.pop(k))
+
+    def __reduce__(self):  # the artifacts stay in this process (e.g. when a cache is sent to workers)
+        return MemoryStore, (self.max_bytes,)
+
+    def __iter__(self):
+        return iter(self._artifacts)
+
+    def __len__(self):
+        return len(self._artifacts)
+
+
+class NpzStore(MutableMapping):
+    """A store of artifacts as ``.npz`` files of a directory, whose total size is capped: when it's
+    exceeded, the least recently used files (by modification time, which reads update) are deleted.
+    Files are written atomically, so several processes can share a directory.
+    """
+
+    def __init__(self, rootdir=DFLT_CACHE_DIR, max_bytes=DFLT_CACHE_MAX_BYTES):
+        self.rootdir = rootdir
+        self.max_bytes = max_bytes
+        os.makedirs(rootdir, exist_ok=True)
+
+    def _filepath(self, k):
+        return os.path.join(self.rootdir, k + '.npz')
+
+    def __getitem__(self, k):
+        filepath = self._filepath(k)
+        try:
+            with np.load(filepath) as npz:
+                if _ARRAY_KEY in npz.files:
+                    artifact = npz[_ARRAY_KEY]
+                else:
+                    artifact = [npz[f'item_{i}'] for i in range(len(npz.files))]
+        except (FileNotFoundError, ValueError, OSError) as err:  # missing, or corrupted (then ignored)
+            raise KeyError(k) from err
+        try:
+            os.utime(filepath)  # it's now the most recently used
+        except OSError:
+            pass
+        return artifact
+
+    def __setitem__(self, k, artifact):
+        if isinstance(artifact, np.ndarray):
+            arrays = {_ARRAY_KEY: artifact}
+        else:
+            arrays = {f'item_{i}': arr for i, arr in enumerate(artifact)}
+        fd, tmp_filepath = tempfile.mkstemp(dir=self.rootdir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                np.savez(fp, **arrays)
+            os.replace(tmp_filepath, self._filepath(k))
+        except BaseException:
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+            raise
+        self.evict()
+
+    def __delitem__(self, k):
+        try:
+            os.remove(self._filepath(k))
+        except FileNotFoundError:
+            raise KeyError(k)
+
+    def __iter__(self):
+        for filename in os.listdir(self.rootdir):
+            if filename.endswith('.npz'):
+                yield filename[: -len('.npz')]
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def clear(self):  # (without loading the artifacts, as MutableMapping.clear would)
+        for k in list(self):
+            try:
+                del self[k]
+            except KeyError:
+                pass
+
+    def evict(self):
+        """Delete the least recently used files, until the total size is within max_bytes"""
+        stats = []
+        for k in self:
+            try:
+                stats.append((os.stat(self._filepath(k)), k))
+            except FileNotFoundError:  # deleted by another process
+                pass
+        total = sum(stat.st_size for stat, _ in stats)
+        for stat, k in sorted(stats, key=lambda x: x[0].st_mtime_ns):
+            if total <= self.max_bytes:
+                break
+            try:
+                del self[k]
+            except KeyError:
+                pass
+            total -= stat.st_size
+
+
+class RenderCache:
+    """A cache of render artifacts: a memory tier (``MemoryStore``) in front of a disk one (``NpzStore``).
+
+    :param rootdir: The directory of the artifact files (default: the ``OUI_CACHE_DIR`` environment
+        variable, or ``~/.cache/oui/renders``)
+    :param max_bytes: The maximum total size of the artifact files
+    :param memory_max_bytes: The maximum total size of the artifacts kept in memory
+    :param key_by: How files are identified: 'stat' (path, size and modification time: cheap) or
+        'content' (a hash of the content: survives copies and moves, but reads the whole file)
+    """
+
+    def __init__(
+        self,
+        rootdir=DFLT_CACHE_DIR,
+        max_bytes=DFLT_CACHE_MAX_BYTES,
+        memory_max_bytes=DFLT_MEMORY_MAX_BYTES,
+        key_by='stat',
+    ):
+        if key_by not in KEY_BYS:
+            raise ValueError(f"key_by should be one of {KEY_BYS}. Was {key_by}")
+        self.memory = MemoryStore(memory_max_bytes)
+        self.disk = NpzStore(rootdir, max_bytes)
+        self.key_by = key_by
+
+    def get_or_compute(self, key, compute):
+        """The artifact stored under key, computed (with ``compute()``) and stored if there's none"""
+        try:
+            return self.memory[key]
+        except KeyError:
+            pass
+        try:
+            artifact = self.disk[key]
+        except KeyError:
+            artifact = compute()
+            self.disk[key] = artifact
+        self.memory[key] = artifact
+        return artifact
+
+    def artifacts_of(self, src):
+        """The ``SourceArtifacts`` of a file (None if src can't be fingerprinted: e.g. a non-seekable stream)"""
+        fingerprint = file_fingerprint(src, self.key_by)
+        return None if fingerprint is None else SourceArtifacts(self, fingerprint)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
+
+
+class SourceArtifacts:
+    """The artifacts of a (fingerprinted) source: ``artifacts(kind, compute, **params)`` is the artifact
+    of that kind, computed with those params (computing it with ``compute()`` if it's not in the cache)."""
+
+    def __init__(self, cache, fingerprint):
+        self.cache = cache
+        self.fingerprint = fingerprint
+
+    def __call__(self, kind, compute, **params):
+        return self.cache.get_or_compute(artifact_key(self.fingerprint, kind, **params), compute)
+
+
+def artifact_key(fingerprint, kind, **params):
+    """The key of an artifact of the given kind, computed with the given params, from a source
+
+    >>> artifact_key('abc', 'peaks', window=256) == artifact_key('abc', 'peaks', window=256)
+    True
+    >>> artifact_key('abc', 'peaks', window=256) == artifact_key('abc', 'peaks', window=512)
+    False
+    """
+    description = json.dumps([RENDER_CACHE_VERSION, fingerprint, kind, params], sort_keys=True, default=str)
+    return f'{kind}_' + hashlib.sha1(description.encode()).hexdigest()
+
+
+def file_fingerprint(src, key_by='stat'):
+    """A string identifying the content of a file.
+
+    :param src: A filepath (str or path), or a (seekable) file-like object, which is always hashed
+    :param key_by: 'stat' (the real path, size and modification time) or 'content' (a hash of the content)
+    :return: The fingerprint, or None if src is a stream that can't be read twice
+    """
+    if isinstance(src, (str, PurePath)):
+        if key_by == 'stat':
+            stat = os.stat(src)
+            return f'{os.path.realpath(src)}:{stat.st_size}:{stat.st_mtime_ns}'
+        with open(src, 'rb') as fp:
+            return _content_hash(fp)
+    if getattr(src, 'seekable', lambda: False)():
+        position = src.tell()
+        try:
+            return _content_hash(src)
+        finally:
+            src.seek(position)
+    return None
+
+
+def _content_hash(fp):
+    content_hash = hashlib.sha1()
+    for block in iter(lambda: fp.read(_HASH_BLOCK_SIZE), b''):
+        content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+def artifact(artifacts, kind, compute, **params):
+    """``artifacts(kind, compute, **params)``, or just ``compute()`` if there's no artifacts (no cache)"""
+    if artifacts is None:
+        return compute()
+    return artifacts(kind, compute, **params)
+
+
+_default_cache = None
+
+
+def default_render_cache():
+    """The cache used when ``cache=True`` is given to the rendering functions (made on first use)"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = RenderCache()
+    return _default_cache
+
+
+def set_default_render_cache(cache):
+    """Set the cache used when ``cache=True`` is given to the rendering functions"""
+    global _default_cache
+    _default_cache = cache
+
+
+def source_artifacts(src, cache):
+    """The artifacts of src in cache, where cache can be a ``RenderCache``, True (the default cache),
+    or None/False (no caching, in which case None is returned)"""
+    if cache is None or cache is False:
+        return None
+    if cache is True:
+        cache = default_render_cache()
+    return cache.artifacts_of(src)
@@ -0,0 +1,146 @@
+"""Server-side (python) computation of spectrograms.
+
+The browser can compute spectrograms itself (see ``sound_utils/fft-webworker.js``), but it needs the
+whole waveform to do so, which limits the duration of the audio we can display that way.
+Here, we compute the STFT with batched numpy FFTs over strided frames, pool the frames down to a
+maximum number of columns, and quantize the result to uint8 decibels: A compact image matrix
+whose size doesn't depend on the duration of the audio.
+
+>>> import numpy as np
+>>> wf = (10000 * np.sin(np.arange(44100) * 2 * np.pi * 2000 / 44100)).astype('int16')
+>>> image = wf_to_spectrogram(wf, window_size=512)
+>>> image.shape, image.dtype
+((86, 256), dtype('uint8'))
+>>> int(np.argmax(image.mean(axis=0)))  # the 2000Hz bin: 2000 / (44100 / 512)
+23
+"""
+import numpy as np
+
+from oui.transport import array_for_transport, DFLT_TRANSPORT
+
+DFLT_WINDOW_SIZE = 512  # same as DEFAULT_WINDOW_SIZE of processing.ts
+DFLT_MAX_SPECTROGRAM_FRAMES = 8192  # max number of columns of the spectrogram image
+DFLT_DB_RANGE = 80  # the dB range mapped to the 0-255 uint8 range (anything quieter is 0)
+DFLT_FFT_BATCH_FRAMES = 2048  # number of frames to FFT at once (bounds the memory used)
+_POWER_FLOOR = 1e-12  # to avoid log(0)
+
+
+def wf_to_spectrogram(
+    wf,
+    window_size=DFLT_WINDOW_SIZE,
+    hop_size=None,
+    max_frames=DFLT_MAX_SPECTROGRAM_FRAMES,
+    db_range=DFLT_DB_RANGE,
+):
+    """Compute a uint8 (n_frames, window_size // 2) spectrogram image of a waveform.
+
+    :param wf: Waveform. An iterable of numbers
+    :param window_size: The number of samples of each FFT frame
+    :param hop_size: The number of samples between the starts of consecutive frames (default window_size)
+    :param max_frames: If there are more frames than this, consecutive frames are averaged so there are not
+    :param db_range: The range (in dB, below the max) that is mapped to the 0-255 range of the output
+    :return: A uint8 array whose rows are frames and columns are frequency bins (lowest frequency first)
+    """
+    wf = np.asarray(wf)
+    return spectrogram_of_blocks(
+        _blocks(wf, window_size * DFLT_FFT_BATCH_FRAMES),
+        n_samples=len(wf),
+        window_size=window_size,
+        hop_size=hop_size,
+        max_frames=max_frames,
+        db_range=db_range,
+    )
+
+
+def spectrogram_of_blocks(
+    blocks,
+    n_samples,
+    window_size=DFLT_WINDOW_SIZE,
+    hop_size=None,
+    max_frames=DFLT_MAX_SPECTROGRAM_FRAMES,
+    db_range=DFLT_DB_RANGE,
+):
+    """Same as ``wf_to_spectrogram``, but for a waveform given as consecutive blocks of samples.
+
+    Only one block (plus a frame's worth of samples) is held in memory at a time.
+
+    :param blocks: An iterable of consecutive 1D arrays of samples
+    :param n_samples: The total number of samples of the blocks (needed to know how to pool the frames)
+    """
+    hop_size = hop_size or window_size
+    n_frames = n_frames_of(n_samples, window_size, hop_size)
+    n_columns = min(n_frames, max_frames)
+    n_bins = window_size // 2
+    sums = np.zeros((n_columns, n_bins))
+    counts = np.zeros(n_columns)
+    frame_idx = 0
+    for power in _frame_powers(blocks, window_size, hop_size):
+        columns = (np.arange(frame_idx, frame_idx + len(power)) * n_columns) // max(n_frames, 1)
+        # columns are non-decreasing, so we can sum the runs of frames falling in the same column at once
+        starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+        sums[columns[starts]] += np.add.reduceat(power, starts, axis=0)
+        counts[columns[starts]] += np.diff(np.r_[starts, len(power)])
+        frame_idx += len(power)
+    mean_power = sums / np.maximum(counts, 1)[:, None]
+    return quantize_db(mean_power, db_range)
+
+
+def quantize_db(power, db_range=DFLT_DB_RANGE):
+    """Map power values to uint8 decibels: the max to 255, and anything db_range below it (or less) to 0.
+
+    >>> quantize_db(np.array([1, 0.1, 1e-10]), db_range=20).tolist()
+    [255, 127, 0]
+    """
+    db = 10 * np.log10(np.maximum(power, _POWER_FLOOR))
+    if db.size == 0:
+        return db.astype('uint8')
+    normalized = (db - (db.max() - db_range)) / db_range
+    return np.floor(255 * np.clip(normalized, 0, 1)).astype('uint8')
+
+
+def spectrogram_spec(image, window_size=DFLT_WINDOW_SIZE, hop_size=None, transport=DFLT_TRANSPORT):
+    """The jsonizable form of a spectrogram image, as expected by the JS spectrogram renderer"""
+    return {
+        'image': array_for_transport(image, transport, dtype='uint8'),
+        'windowSize': window_size,
+        'hopSize': hop_size or window_size,
+    }
+
+
+def n_frames_of(n_samples, window_size=DFLT_WINDOW_SIZE, hop_size=None):
+    """The number of (complete) frames of n_samples samples
+
+    >>> n_frames_of(1024, 512), n_frames_of(1023, 512), n_frames_of(1024, 512, 256)
+    (2, 1, 3)
+    """
+    hop_size = hop_size or window_size
+    if n_samples < window_size:
+        return 0
+    return (n_samples - window_size) // hop_size + 1
+
+
+def _blocks(wf, block_size):
+    for i in range(0, max(len(wf), 1), block_size):
+        yield wf[i:i + block_size]
+
+
+def _frame_powers(blocks, window_size, hop_size):
+    """Yield the (n_frames, window_size // 2) power spectra of the frames of the samples of blocks"""
+    taper = np.hanning(window_size).astype('float32')
+    n_bins = window_size // 2
+    rest = np.zeros(0, dtype='float32')
+    skip = 0  # samples to skip before the next frame (when hop_size > window_size)
+    for block in blocks:
+        block = np.asarray(block, dtype='float32')
+        block, skip = block[skip:], max(0, skip - len(block))
+        buffer = np.concatenate([rest, block])
+        n_frames = n_frames_of(len(buffer), window_size, hop_size)
+        if n_frames == 0:
+            rest = buffer
+            continue
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, window_size)[::hop_size][:n_frames]
+        for i in range(0, n_frames, DFLT_FFT_BATCH_FRAMES):
+            spectra = np.fft.rfft(frames[i:i + DFLT_FFT_BATCH_FRAMES] * taper, axis=1)[:, :n_bins]
+            yield spectra.real ** 2 + spectra.imag ** 2
+        rest = buffer[n_frames * hop_size:]
+        skip = max(0, n_frames * hop_size - len(buffer))
@@ -0,0 +1,45 @@
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from oui.multi_time_vis.test import dpath
+
+
+def _status(url):
+    try:
+        with urlopen(url) as response:
+            return response.status
+    except HTTPError as error:
+        return error.code
+
+
+def test_windows_are_validated():
+    from oui.multi_time_vis.audio_server import AudioServer
+
+    server = AudioServer().start()
+    try:
+        window_url = server.window_url(str(dpath('baby_voice.wav')))
+        assert _status(f'{window_url}?bt=0&tt=100000') == 200
+        assert _status(f'{window_url}?bt=100000&tt=100000') == 400
+        assert _status(f'{window_url}?bt=200000&tt=100000') == 400
+        assert _status(f'{window_url}?bt=-100000&tt=100000') == 400
+        assert _status(f'{window_url}?bt=zero') == 400
+    finally:
+        server.stop()
+
+
+def test_artifacts_are_capped():
+    from oui.multi_time_vis.audio_server import AudioServer
+
+    server = AudioServer(max_artifact_bytes=25).start()
+    try:
+        urls = [server.register_artifact(bytes([i]) * 10) for i in range(3)]
+        assert len(server.artifacts) == 2 and server._artifact_bytes == 20
+        assert [_status(url) for url in urls] == [404, 200, 200]  # the oldest was forgotten
+        with urlopen(urls[2]) as response:
+            assert response.read() == bytes([2]) * 10
+        with pytest.raises(ValueError):
+            server.register_artifact(b'x' * 26)
+    finally:
+        server.stop()
@@ -1,3 +1,5 @@
+import pytest
+
 from oui.multi_time_vis.test import dpath
 
 
@@ -43,3 +45,262 @@ def test_jsobj_of_audio():
     if sr == DFLT_SR:
         jsobj_from_wf = jsobj_of_audio(wf)
         assert (audio_jsobj_are_equivalent(jsobj_from_wf, jsobj_from_posix_path))
+
+
+def test_wf_transports(rebuilt_bundle):
+    from oui.multi_time_vis import jsobj_of_audio
+    from oui.transport import decode_array
+    import soundfile as sf
+
+    wf, sr = sf.read(dpath('baby_voice.wav'), dtype='int16')
+
+    b64_channel = jsobj_of_audio((wf, sr), wf_transport='base64')._trace['channel']
+    list_channel = jsobj_of_audio((wf, sr))._trace['channel']
+    assert list_channel['wf'] == wf.tolist()  # (the default, until the bundle decodes base64)
+    assert decode_array(b64_channel['wf']).tolist() == list_channel['wf']
+    # the list version (the fallback) is the bulky one
+    assert len(str(b64_channel)) < len(str(list_channel))
+
+
+def test_peaks_charts_ship_a_peak_pyramid(rebuilt_bundle):
+    import numpy as np
+    from oui.multi_time_vis import wfsr_to_jsobj
+    from oui.multi_time_vis.audio import DFLT_PEAKS_WINDOW
+    from oui.transport import decode_array
+
+    wf = np.random.RandomState(0).randint(-30000, 30000, size=44100 * 60).astype('int16')
+    jsobj = wfsr_to_jsobj(wf, chart_type='peaks', enable_playback=False, wf_transport='base64',
+                          peaks_engine='python')
+    channel = jsobj._trace['channel']
+    assert 'wf' not in channel
+    levels = [decode_array(level) for level in channel['peaks']['levels']]
+    assert len(levels[0]) == int(np.ceil(len(wf) / DFLT_PEAKS_WINDOW))
+    assert levels[0][:, 0].min() == wf.min() and levels[-1][:, 1].max() == wf.max()
+
+    channel = wfsr_to_jsobj(wf, chart_type='peaks', peaks_engine='python')._trace['channel']
+    assert 'wf' in channel  # needed for playback
+
+
+def test_peaks_are_computed_in_the_browser_by_default():
+    import numpy as np
+    import pytest
+    from oui.multi_time_vis import wfsr_to_jsobj, file_to_jsobj
+
+    wf = np.random.RandomState(0).randint(-30000, 30000, size=44100).astype('int16')
+    for enable_playback in [True, False]:
+        channel = wfsr_to_jsobj(wf, chart_type='peaks', enable_playback=enable_playback)._trace['channel']
+        assert channel['wf'] == wf.tolist() and 'peaks' not in channel  # what the shipped bundle draws
+    channel = wfsr_to_jsobj(wf)._trace['channel']
+    assert 'wf' in channel and 'spectrogram' not in channel
+
+    # the charts computed in python need a bundle that draws them
+    with pytest.raises(RuntimeError, match='peak_pyramids'):
+        wfsr_to_jsobj(wf, chart_type='peaks', peaks_engine='python')
+    with pytest.raises(RuntimeError, match='spectrogram_images'):
+        wfsr_to_jsobj(wf, spectrogram_engine='python')
+    with pytest.raises(RuntimeError, match='spectrogram_images'):
+        file_to_jsobj(str(dpath('baby_voice.wav')), stream=True)
+    with pytest.raises(RuntimeError, match='peak_pyramids'):
+        file_to_jsobj(str(dpath('baby_voice.wav')), chart_type='peaks', serve=True)
+
+
+def test_python_spectrogram_engine(monkeypatch, rebuilt_bundle):
+    import numpy as np
+    from oui.multi_time_vis import wfsr_to_jsobj, audio
+    from oui.transport import decode_array
+
+    wf = np.random.RandomState(0).randint(-30000, 30000, size=44100 * 10).astype('int16')
+    jsobj = wfsr_to_jsobj(wf, spectrogram_engine='python', enable_playback=False, window_size=1024,
+                          wf_transport='base64')
+    assert jsobj._trace['props']['chart_type'] == 'spectrogram'
+    channel = jsobj._trace['channel']
+    assert 'wf' not in channel
+    image = decode_array(channel['spectrogram']['image'])
+    assert image.dtype == np.uint8 and image.shape == (len(wf) // 1024, 512)
+
+    # the python engine doesn't fall back to peaks for long waveforms
+    monkeypatch.setattr(audio, 'MAX_WF_LEN_FOR_SPECTROGRAMS', len(wf) // 2)
+    long_wf = wf
+    assert wfsr_to_jsobj(long_wf)._trace['props']['chart_type'] == 'peaks'
+    jsobj = wfsr_to_jsobj(long_wf, spectrogram_engine='python', enable_playback=False)
+    assert jsobj._trace['props']['chart_type'] == 'spectrogram'
+
+
+def test_streamed_file_to_jsobj(rebuilt_bundle):
+    import numpy as np
+    import soundfile as sf
+    from oui.multi_time_vis import file_to_jsobj, wfsr_to_jsobj
+
+    filepath = str(dpath('baby_voice.wav'))
+    wf, sr = sf.read(filepath, dtype='int16')
+    for chart_type in ['peaks', 'spectrogram']:
+        streamed = file_to_jsobj(filepath, chart_type=chart_type, stream=True, block_size=10000)._trace
+        in_memory = wfsr_to_jsobj((wf, sr), chart_type=chart_type, enable_playback=False,
+                                  spectrogram_engine='python', peaks_engine='python')._trace
+        assert streamed['props']['enable_playback'] is False
+        assert streamed['channel'] == in_memory['channel']
+
+
+def test_render_metrics(rebuilt_bundle):
+    import numpy as np
+    from oui.instrumentation import enable_instrumentation, add_metrics_hook, remove_metrics_hook
+    from oui.multi_time_vis import wfsr_to_jsobj
+
+    wf = np.random.RandomState(0).randint(-30000, 30000, size=44100 * 2).astype('int16')
+    assert 'metrics' not in wfsr_to_jsobj(wf, chart_type='peaks')._trace  # disabled by default
+
+    logged = []
+    enable_instrumentation()
+    add_metrics_hook(logged.append)
+    try:
+        jsobj = wfsr_to_jsobj(wf, chart_type='peaks', peaks_engine='python')
+    finally:
+        remove_metrics_hook(logged.append)
+        enable_instrumentation(False)
+    metrics = jsobj._trace['metrics']
+    assert logged == [metrics]  # one set of metrics per object, even though renders are nested
+    assert metrics['render'] == 'wfsr_to_jsobj'
+    assert set(metrics['stages']) == {'preprocess', 'cast', 'serialize'}
+    assert metrics['payload_bytes'] == len(jsobj.data.encode())
+    assert metrics['counts']['channels'][0]['wf'] == len(wf)
+    assert metrics['counts']['n_samples'] == len(wf)
+
+
+def test_render_cache(tmp_path, rebuilt_bundle):
+    from oui.multi_time_vis import file_to_jsobj
+    from oui.multi_time_vis.render_cache import RenderCache
+
+    filepath = str(dpath('baby_voice.wav'))
+    cache = RenderCache(str(tmp_path), memory_max_bytes=0)  # no memory tier: go to the disk every time
+    for kwargs in [dict(chart_type='peaks', peaks_engine='python'), dict(chart_type='spectrogram', stream=True)]:
+        uncached = file_to_jsobj(filepath, **kwargs)._trace
+        computed = file_to_jsobj(filepath, cache=cache, **kwargs)._trace
+        n_artifacts = len(cache.disk)
+        from_cache = file_to_jsobj(filepath, cache=cache, **kwargs)._trace
+        assert len(cache.disk) == n_artifacts  # nothing new was computed
+        assert uncached['channel'] == computed['channel'] == from_cache['channel']
+    assert len(cache.disk) == 3  # the waveform, its peaks, and the (streamed) spectrogram
+
+    cache.disk.max_bytes = 0
+    cache.disk.evict()
+    assert len(cache.disk) == 0
+
+
+def test_live_time_channel(rebuilt_bundle):
+    import numpy as np
+    from oui.multi_time_vis import single_time_vis
+    from oui.transport import decode_array
+
+    class RecordingComm:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, data, buffers):
+            self.sent.append((data, buffers))
+
+        def on_close(self, callback):
+            pass
+
+    wf = np.arange(10, dtype='int16')
+    live = single_time_vis({'wf': wf, 'sr': 10}, live=True, max_points=15)
+    assert decode_array(live._trace['channel']['wf']).tolist() == wf.tolist()
+
+    comm = RecordingComm()
+    live._attach(comm)  # what happens when a display opens its comm
+    live.append(np.arange(10, 20))
+    assert live.values.tolist() == list(range(5, 20))  # only the last max_points values are retained
+    assert live.bt == 500000  # five samples, at 10 samples per second, were dropped
+
+    (reset, (reset_buffer,)), (append, (append_buffer,)) = comm.sent
+    assert reset['type'] == 'reset' and np.frombuffer(reset_buffer, '<i2').tolist() == wf.tolist()
+    assert append['type'] == 'append' and np.frombuffer(append_buffer, '<i2').tolist() == list(range(10, 20))
+    assert append['bt'] == live.bt
+
+
+def test_live_channels_need_a_bundle_that_renders_them():
+    import numpy as np
+    import pytest
+    from oui.multi_time_vis import single_time_vis
+
+    with pytest.raises(RuntimeError, match='live_channels'):
+        single_time_vis({'wf': np.arange(10, dtype='int16'), 'sr': 10}, live=True)
+
+
+def test_served_file_to_jsobj(rebuilt_bundle):
+    import io
+    from urllib.request import urlopen, Request
+    import soundfile as sf
+    from oui.multi_time_vis import file_to_jsobj
+
+    filepath = str(dpath('baby_voice.wav'))
+    channel = file_to_jsobj(filepath, chart_type='peaks', serve=True)._trace['channel']
+    assert 'wf' not in channel and 'peaks' in channel  # the samples aren't inlined
+
+    with open(filepath, 'rb') as fp:
+        content = fp.read()
+    response = urlopen(Request(channel['url'], headers={'Range': 'bytes=100-199'}))
+    assert response.status == 206 and response.read() == content[100:200]
+    assert urlopen(channel['url']).read() == content
+
+    wf, sr = sf.read(filepath, dtype='int16')
+    window = urlopen(f"{channel['windowUrl']}?bt=500000&tt=1500000").read()
+    window_wf, window_sr = sf.read(io.BytesIO(window), dtype='int16')
+    assert window_sr == sr
+    assert window_wf.tolist() == wf[sr // 2: 3 * sr // 2].tolist()
+
+
+def test_js_bundle_is_injected_when_displayed(monkeypatch):
+    import numpy as np
+    import oui
+    from oui.multi_time_vis import wfsr_to_jsobj
+
+    class FakeShell:
+        kernel = object()
+
+    shell, displayed = FakeShell(), []
+    monkeypatch.setattr(oui, '_notebook_shell', lambda: shell)
+    monkeypatch.setattr(oui, 'display', displayed.append)
+    monkeypatch.setattr(oui, 'js_bundle_source', lambda: 'var bundle;')
+
+    jsobj = wfsr_to_jsobj(np.zeros(100, dtype='int16'), chart_type='peaks')
+    assert displayed == []  # not when it's made...
+    source = jsobj._repr_javascript_()
+    assert [obj.data for obj in displayed] == ['var bundle;']  # ... but when it's displayed
+    assert jsobj.data in source
+    jsobj._repr_javascript_()
+    assert len(displayed) == 1  # (once per kernel)
+
+
+def _batch_srcs(n):
+    """n (wf, sr) sources, the i-th being i + 1 tenths of a second long, with a bad source every 4"""
+    import numpy as np
+
+    for i in range(n):
+        yield 'no_such_file.wav' if i % 4 == 3 else (np.zeros(800 * (i + 1), dtype='int16'), 8000)
+
+
+def test_jsobjs_of_audio_keeps_the_order_of_sources():
+    from itertools import islice
+    from oui.multi_time_vis import jsobjs_of_audio
+    from oui.multi_time_vis.audio import RenderFailure
+
+    def durations(results):
+        return [
+            ('failure', r.index) if isinstance(r, RenderFailure) else r._trace['channel']['tt'] // 100000
+            for r in results
+        ]
+
+    expected = [('failure', i) if i % 4 == 3 else i + 1 for i in range(10)]
+    for n_workers, chunk_size in [(0, 1), (2, 1), (2, 3)]:
+        results = jsobjs_of_audio(_batch_srcs(10), n_workers=n_workers, chunk_size=chunk_size, chart_type='peaks')
+        assert durations(results) == expected
+
+    results = jsobjs_of_audio(_batch_srcs(10), n_workers=2, on_error='skip', chart_type='peaks')
+    assert durations(results) == [d for d in expected if isinstance(d, int)]
+
+    with pytest.raises(RuntimeError, match='no_such_file'):
+        list(jsobjs_of_audio(_batch_srcs(10), n_workers=2, on_error='raise', chart_type='peaks'))
+
+    # sources are consumed lazily, so an infinite iterable is fine
+    results = jsobjs_of_audio(_batch_srcs(10 ** 9), n_workers=2, chart_type='peaks')
+    assert durations(islice(results, 3)) == [1, 2, 3]
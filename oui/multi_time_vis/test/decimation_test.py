@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('n', [11, 100, 1001, 10007])
+@pytest.mark.parametrize('resolution', [3, 4, 7, 100])
+def test_lttb_keeps_endpoints(n, resolution):
+    from oui.multi_time_vis.decimation import decimation_indices
+
+    values = np.random.RandomState(n).randn(n)
+    indices = decimation_indices(values, resolution, 'lttb')
+    assert len(indices) == min(n, resolution)
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert (np.diff(indices) > 0).all()
+
+
+@pytest.mark.parametrize('n', [11, 100, 1001, 10007])
+@pytest.mark.parametrize('resolution', [3, 4, 7, 100])
+def test_minmax_keeps_extremes(n, resolution):
+    from oui.multi_time_vis.decimation import decimation_indices
+
+    values = np.random.RandomState(n).randn(n)
+    indices = decimation_indices(values, resolution, 'minmax')
+    assert len(indices) <= resolution
+    assert (np.diff(indices) > 0).all()
+    if n > resolution:
+        assert np.argmin(values) in indices and np.argmax(values) in indices
+
+
+def test_decimated_channel_data():
+    from oui.multi_time_vis.decimation import decimated_channel_data
+
+    n, resolution = 1000, 100
+    data = [{'time': i, 'value': float(v)} for i, v in enumerate(np.sin(np.arange(n) / 10))]
+    values = [d['value'] for d in data]
+    decimated, chunk_size = decimated_channel_data(data, values, resolution, 'lttb', chunk_size=100)
+    assert len(decimated) == resolution
+    assert decimated[0] == data[0] and decimated[-1] == data[-1]
+    assert chunk_size * len(decimated) == 100 * n  # the same time range is spanned
+
+    assert decimated_channel_data(data, values, resolution=n, chunk_size=100) == (data, 100)  # not decimated
+
+    values = [1.0, None, 3.0, 2.0, 5.0, None, 0.0] * 3  # nulls are ignored
+    decimated, _ = decimated_channel_data(values, values, resolution=4, method='minmax')
+    assert len(decimated) == 4 and None not in decimated
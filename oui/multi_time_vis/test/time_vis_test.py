@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def test_data_stats_ignore_nulls():
+    from oui.multi_time_vis.base import data_stats
+
+    assert data_stats([1.0, None, 3.0]) == {'min': 1.0, 'max': 3.0}
+    assert data_stats([None, 2, None, -1]) == {'min': -1, 'max': 2}
+    assert data_stats(np.array([1.0, None, 3.0], dtype=object)) == {'min': 1.0, 'max': 3.0}
+    assert data_stats([{'time': 0, 'value': None}, {'time': 1, 'value': 5.0}]) == {'min': 5.0, 'max': 5.0}
+    assert data_stats(np.array([np.nan, np.nan])) == {}
+
+
+def test_array_data_channels(rebuilt_bundle):
+    from oui.multi_time_vis import single_time_vis
+    from oui.transport import decode_array
+
+    values = np.array([0.5, np.nan, 2.0, -1.0])
+    channel = single_time_vis({'data': values})._trace['channel']
+    assert channel['data'] == [0.5, None, 2.0, -1.0]  # (lists by default, until the bundle decodes base64)
+    assert channel['stats'] == {'min': -1.0, 'max': 2.0} and channel['bargraphMax'] == 2.0
+
+    channel = single_time_vis({'data': values}, data_transport='base64')._trace['channel']
+    assert np.array_equal(decode_array(channel['data']), values, equal_nan=True)
+
+    points = np.array([(0, 10, 4.0), (10, 20, 8.0)], dtype=[('bt', int), ('tt', int), ('value', float)])
+    channel = single_time_vis({'data': points})._trace['channel']
+    assert channel['data'] == [{'bt': 0, 'tt': 10, 'value': 4.0}, {'bt': 10, 'tt': 20, 'value': 8.0}]
+    channel = single_time_vis({'data': points}, data_transport='base64')._trace['channel']
+    assert decode_array(channel['data']['value']).tolist() == [4.0, 8.0]
+
+    channel = single_time_vis({'data': np.array(['a', 'b', 'a'])})._trace['channel']
+    assert channel['data'] == ['a', 'b', 'a'] and channel['chart_type'] == 'winners'
+
+
+def test_stats_of_filtered_data_points():
+    from oui.multi_time_vis import single_time_vis
+
+    data = [{'time': 0, 'value': 10}, {'time': 1, 'value': -1}, {'time': 2, 'value': 20}, {'time': 3, 'value': 0}]
+    channel = single_time_vis({'data': data, 'filters': ['log']})._trace['channel']
+    assert [point['value'] for point in channel['data']] == [np.log(10), None, np.log(20), None]
+    assert [point['time'] for point in channel['data']] == [0, 1, 2, 3]
+    assert channel['stats'] == {'min': np.log(10), 'max': np.log(20)}
+
+    points = np.array([(0, 10.0), (1, -1.0)], dtype=[('time', int), ('value', float)])
+    channel = single_time_vis({'data': points, 'filters': ['log'], 'stats': {'min': -1, 'max': 10}})._trace['channel']
+    assert channel['data'] == [{'time': 0, 'value': np.log(10)}, {'time': 1, 'value': None}]
+    assert channel['stats'] == {'min': np.log(10), 'max': np.log(10)}  # (not the given, unfiltered, stats)
@@ -0,0 +1,138 @@
+"""Serialization of the payloads of the JS components (as JSON, which is also valid JS).
+
+The render functions used to write their payloads as python reprs (``f'...{channel}...'``), patched with
+``.replace('True', 'true').replace('None', 'null')``. That's two extra passes on big strings, and corrupts
+any string containing "True" or "None" (a title, a category...).
+Here, payloads are written as compact JSON: dicts are walked, their values written by the (C accelerated)
+json encoder, except for numpy arrays, which are written directly (integer vectors without going through
+python ints at all), and all the chunks are joined once, into the final source.
+
+>>> import numpy as np
+>>> to_json({'title': 'None of it is True', 'data': np.array([1, 2, 3]), 'max': np.int64(3)})
+'{"title":"None of it is True","data":[1,2,3],"max":3}'
+>>> render_call_source('renderTimeChannel', {'data': np.array([0.5, np.nan])}, {'enable_playback': True})
+'renderTimeChannel(element.get(0),{"data":[0.5,null]},{"enable_playback":true})'
+"""
+import json
+
+import numpy as np
+
+# The number of integers formatted at once by _int_vector_json (bounding its temporary arrays)
+INT_JSON_BLOCK_SIZE = 2 ** 18
+
+
+class JsPayloadEncoder(json.JSONEncoder):
+    """A (compact) json encoder that also encodes numpy arrays (as nested lists, with null for non-finite
+    floats), numpy scalars, sets, and anything with a ``to_payload`` method (as what it returns).
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('separators', (',', ':'))
+        super().__init__(**kwargs)
+
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return _jsonizable_array(obj)
+        elif isinstance(obj, np.generic):
+            return _jsonizable_array(np.asarray(obj))
+        elif isinstance(obj, (set, frozenset)):
+            return list(obj)
+        elif hasattr(obj, 'to_payload'):
+            return obj.to_payload()
+        return super().default(obj)
+
+
+_encoder = JsPayloadEncoder()
+
+
+def to_json(obj):
+    """The (compact) JSON string of obj (which can contain numpy arrays and scalars)"""
+    chunks = []
+    _write_json(obj, chunks)
+    return ''.join(chunks)
+
+
+def render_call_source(func_name, *args):
+    """The JS source calling ``func_name(element.get(0), *args)``, args being serialized as JSON.
+    (``element`` is what jupyter calls the output element the Javascript object is displayed in.)"""
+    chunks = [func_name, '(element.get(0)']
+    for arg in args:
+        chunks.append(',')
+        _write_json(arg, chunks)
+    chunks.append(')')
+    return ''.join(chunks)
+
+
+def _write_json(obj, chunks):
+    """Append the JSON chunks of obj to chunks.
+
+    Only dicts are walked here: the big arrays of payloads are dict values (channel data, columns of pts...),
+    and lists are left to the encoder (walking them in python would be slower than what it saves)."""
+    if isinstance(obj, dict):
+        chunks.append('{')
+        for i, (k, v) in enumerate(obj.items()):
+            if i:
+                chunks.append(',')
+            chunks.append(_encoder.encode(k if isinstance(k, str) else str(k)))
+            chunks.append(':')
+            _write_json(v, chunks)
+        chunks.append('}')
+    elif isinstance(obj, np.ndarray) and obj.ndim == 1 and obj.dtype.kind in 'iub':
+        chunks.append(_int_vector_json(obj))
+    elif hasattr(obj, 'to_payload'):
+        _write_json(obj.to_payload(), chunks)
+    else:
+        chunks.append(_encoder.encode(obj))
+
+
+def _jsonizable_array(arr):
+    if arr.dtype.kind == 'f' and not np.isfinite(arr).all():
+        arr = np.where(np.isfinite(arr), arr, None)  # json has no NaN nor Infinity
+    elif arr.dtype.kind == 'M':  # datetimes, as the usual (iso format) strings
+        arr = np.datetime_as_string(arr)
+    return arr.tolist()
+
+
+def _int_vector_json(arr):
+    """The JSON of a 1D integer (or bool) array, with all digits computed by numpy.
+
+    Each number is written in a fixed width row of bytes (sign, digits, comma), and a mask of what's
+    actually written (no leading zeros, sign only if negative) compresses the rows into the output.
+
+    >>> _int_vector_json(np.array([0, -5, 10, 123456789, -1]))
+    '[0,-5,10,123456789,-1]'
+    >>> _int_vector_json(np.array([True, False])), _int_vector_json(np.array([], dtype=int))
+    ('[true,false]', '[]')
+    """
+    if arr.dtype.kind == 'b':
+        return _encoder.encode(arr.tolist())
+    if len(arr) == 0:
+        return '[]'
+    if arr.dtype == np.uint64 and arr.max() > np.iinfo(np.int64).max:
+        return _encoder.encode(arr.tolist())
+    arr = arr.astype(np.int64, copy=False)
+    if arr.min() == np.iinfo(np.int64).min:  # has no int64 absolute value
+        return _encoder.encode(arr.tolist())
+    width = len(str(int(np.abs(arr).max())))
+    blocks = (
+        _int_block_json(arr[i : i + INT_JSON_BLOCK_SIZE], width)
+        for i in range(0, len(arr), INT_JSON_BLOCK_SIZE)
+    )
+    return '[' + ','.join(blocks) + ']'
+
+
+def _int_block_json(arr, width):
+    magnitude = np.abs(arr)
+    chars = np.empty((len(arr), width + 2), dtype=np.uint8)
+    written = np.empty((len(arr), width + 2), dtype=bool)
+    chars[:, 0], written[:, 0] = ord('-'), arr < 0
+    rest = magnitude
+    for j in range(width, 0, -1):
+        rest, digit = np.divmod(rest, 10)
+        chars[:, j] = digit + ord('0')
+    n_digits = np.ones(len(arr), dtype=np.int64)
+    for k in range(1, width):
+        n_digits += magnitude >= 10 ** k
+    written[:, 1:-1] = np.arange(width) >= (width - n_digits)[:, None]
+    chars[:, -1], written[:, -1] = ord(','), True
+    return chars[written][:-1].tobytes().decode('ascii')
@@ -7,8 +7,24 @@ from collections.abc import Mapping
 from math import sqrt, pi
 from pathlib import Path
 
+import numpy as np
 from i2.signatures import Sig
+from oui import BundledJavascript, bundle_has_feature, require_bundle_feature
 from oui.color_util import color_hex_from, add_alpha, dec_to_hex
+from oui.instrumentation import instrumented_render, stage
+from oui.serialization import render_call_source
+from oui.splatter.tsne import (
+    DFLT_REFINE_ITERATIONS,
+    EMBEDDING_KEY_OPTIONS,
+    embedding_cache,
+    embedding_key,
+    filled_init,
+    knn_affinities,
+    upper_csr,
+)
+from oui.splatter.density import density_payload
+from oui.splatter.reduction import fit_reduction, FvReduction, DFLT_REDUCTION
+from oui.transport import encode_array, validate_transport
 
 HTML('<script>var exports = {"__esModule": true};</script>')
 
@@ -20,7 +36,35 @@ dflts_filepath = pjoin(dflt_filename)
 dflts = json.load(open(dflts_filepath, 'r'))
 splatter_dflts = dict(dflts['options'], **dflts['tsneOptions'])
 
-_splatter_raw_sig = Sig.from_objs('pts', splatter_dflts.items())
+# How pts are shipped: 'list' (of dicts), which the shipped bundle (oui/js/index.js) reads, or 'base64'
+# (see ``ColumnarPts.to_payload``), which needs a bundle built from the current TS sources (with transport.ts).
+# The default should become 'base64' when that bundle is shipped.
+DFLT_PTS_TRANSPORT = 'list'
+DFLT_FV_DTYPE = 'float32'
+FV_DTYPES = ('float16', 'float32', 'float64')
+# How the browser engine gets the affinities of the pts: it computes them from the fvs ('dense', O(n ** 2)),
+# or gets the sparse (k nearest neighbors) ones computed here ('knn', O(n * k), see ``knn_affinities_payload``)
+AFFINITIES = ('dense', 'knn')
+DFLT_AFFINITIES = 'dense'
+
+_splatter_raw_sig = Sig.from_objs(
+    'pts',
+    [
+        *splatter_dflts.items(),
+        ('pts_transport', DFLT_PTS_TRANSPORT),
+        ('fv_dtype', DFLT_FV_DTYPE),
+        ('init', None),
+        ('affinities', DFLT_AFFINITIES),
+        ('scaler', None),
+    ],
+)
+
+ENGINES = ('browser', 'python')
+DFLT_ENGINE = 'browser'
+# How the (final) embedding is drawn: a node per pt, or the (per tag) density of the pts (see density.py)
+RENDERINGS = ('nodes', 'density')
+DFLT_RENDERING = 'nodes'
+DFLT_N_FRAMES = 60  # number of t-SNE iterations shipped (for the animation) when engine='python'
 
 
 # splatter_kwargs_dflts = {k: dflts[k] for k in dflts if k not in }
@@ -83,6 +127,146 @@ def process_pts(pts):
                 yield dict(tag=tag, fv=list(fv))
 
 
+class ColumnarPts:
+    """Pts in columnar form: A (n, d) float array of fvs, and an array of n integer tag codes.
+
+    Tag codes index ``tags`` (the unique tags, in the order they were first encountered),
+    and are -1 for untagged pts (those whose tag is missing or falsy, as splatter has always treated them).
+    Any other fields of the pts are kept in ``extras``, as a ``{field: list_of_n_values}`` dict
+    (with None for the pts that don't have that field).
+
+    >>> cpts = ColumnarPts([[1, 2], [3, 4], [5, 6]], tag_codes=[1, -1, 0], tags=['a', 'b'])
+    >>> len(cpts), cpts.fvs.dtype, cpts.tag_codes.tolist()
+    (3, dtype('float64'), [1, -1, 0])
+    >>> cpts.to_dicts()  # doctest: +NORMALIZE_WHITESPACE
+    [{'fv': [1.0, 2.0], 'tag': 'b'}, {'fv': [3.0, 4.0]}, {'fv': [5.0, 6.0], 'tag': 'a'}]
+    """
+
+    def __init__(self, fvs, tag_codes=None, tags=(), extras=None):
+        try:
+            self.fvs = np.asarray(fvs, dtype=float)
+        except ValueError as err:
+            raise ValueError(f"All fvs of pts must be numbers, and of the same size: {err}")
+        if tag_codes is None:
+            tag_codes = np.full(len(self.fvs), -1)
+        self.tag_codes = np.asarray(tag_codes, dtype=int)
+        self.tags = list(tags)
+        self.extras = dict(extras or {})
+
+    def __len__(self):
+        return len(self.fvs)
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    def __repr__(self):
+        return f"{type(self).__name__}(<{len(self)} pts>, tags={self.tags})"
+
+    def to_payload(self, include_fvs=True, fv_dtype=DFLT_FV_DTYPE):
+        """The compact (jsonizable) form of the pts the splatter JS decodes: fvs as a base64 encoded
+        (float32 by default) array, tags as an array of codes and a table of labels.
+
+        >>> from oui.transport import decode_array
+        >>> payload = ColumnarPts([[1, 2], [3, 4]], tag_codes=[0, -1], tags=['a']).to_payload()
+        >>> decode_array(payload['fvs'])
+        array([[1., 2.],
+               [3., 4.]], dtype=float32)
+        >>> decode_array(payload['tagCodes']).tolist(), payload['tags']
+        ([0, -1], ['a'])
+        """
+        if fv_dtype not in FV_DTYPES:
+            raise ValueError(f"fv_dtype should be one of {FV_DTYPES}, was {fv_dtype}")
+        code_dtype = 'int16' if len(self.tags) < 2 ** 15 else 'int32'
+        payload = {
+            'tagCodes': encode_array(self.tag_codes, dtype=code_dtype),
+            'tags': self.tags,
+            'extras': {k: v for k, v in self.extras.items() if k not in ('fv', 'tag')},
+        }
+        if include_fvs:
+            payload['fvs'] = encode_array(self.fvs, dtype=fv_dtype)
+        return payload
+
+    def to_dicts(self, include_fvs=True):
+        """The (classic) list-of-dicts form of the pts"""
+        fields = [(k, v) for k, v in self.extras.items() if k not in ('fv', 'tag')]
+        fvs = self.fvs.tolist() if include_fvs else [None] * len(self)
+        pts = []
+        for i, (fv, code) in enumerate(zip(fvs, self.tag_codes.tolist())):
+            pt = {'fv': fv} if include_fvs else {}
+            if code >= 0:
+                pt['tag'] = self.tags[code]
+            pt.update((k, v[i]) for k, v in fields if v[i] is not None)
+            pts.append(pt)
+        return pts
+
+
+def columnar_pts(pts):
+    """Get a ``ColumnarPts`` from some form of pts, without going through per-point dicts when possible.
+
+    Accepts the same forms as ``process_pts`` (a 2D array or list of fvs, an ``(X, y)`` pair,
+    a ``{tag: fvs}`` mapping, or a list of dicts), and ``ColumnarPts`` themselves.
+
+    >>> cpts = columnar_pts((np.array([[1, 2], [3, 4], [5, 6]]), np.array(['b', '', 'a'])))
+    >>> cpts.fvs.shape, cpts.tag_codes.tolist(), cpts.tags
+    ((3, 2), [0, -1, 1], ['b', 'a'])
+    >>> cpts = columnar_pts({'old': [[1, 2], [3, 4]], 'new': [[10, 20]]})
+    >>> cpts.tag_codes.tolist(), cpts.tags
+    ([0, 0, 1], ['old', 'new'])
+    >>> columnar_pts([{'fv': [1, 2], 'tag': 'x', 'bt': 0}, {'fv': [3, 4], 'bt': 1}]).extras
+    {'bt': [0, 1]}
+    """
+    if isinstance(pts, ColumnarPts):
+        return pts
+    if _is_sklearn_xy_pair(pts):
+        X, y = pts
+        return ColumnarPts(X, *tag_codes_and_table(y))
+    if isinstance(pts, Mapping):
+        tags = [tag for tag in pts if len(pts[tag]) > 0]
+        fvs = [np.asarray(pts[tag], dtype=float) for tag in tags]
+        codes, tags = tag_codes_and_table(tags)
+        tag_codes = np.repeat(codes, [len(x) for x in fvs])
+        return ColumnarPts(np.concatenate(fvs) if fvs else np.empty((0, 0)), tag_codes, tags)
+    if isinstance(pts, np.ndarray):
+        return ColumnarPts(pts)
+    pts = list(pts)
+    if pts and isinstance(pts[0], Mapping):
+        for pt in pts:
+            if 'fv' not in pt:
+                raise ValueError(f"An pt of pts didn't have an 'fv': {pt}")
+        tag_codes, tags = tag_codes_and_table([pt.get('tag') for pt in pts])
+        fields = ordered_uniks(k for pt in pts for k in pt if k not in ('fv', 'tag'))
+        extras = {k: [pt.get(k) for pt in pts] for k in fields}
+        return ColumnarPts([pt['fv'] for pt in pts], tag_codes, tags, extras)
+    return ColumnarPts(pts)
+
+
+def tag_codes_and_table(tags):
+    """Integer codes (-1 for falsy, i.e. untagged, tags) and the unique (truthy) tags, in encounter order.
+
+    >>> codes, table = tag_codes_and_table(np.array([3, 0, 1, 3, 1]))
+    >>> codes.tolist(), table
+    ([0, -1, 1, 0, 1], [3, 1])
+    >>> codes, table = tag_codes_and_table(['b', None, 'a', 'b'])  # (not sortable, so no np.unique)
+    >>> codes.tolist(), table
+    ([0, -1, 1, 0], ['b', 'a'])
+    """
+    arr = np.asarray(tags)
+    try:
+        uniks, first_idx, inverse = np.unique(arr, return_index=True, return_inverse=True)
+    except TypeError:  # mixed types (e.g. str and None), which np.unique can't sort
+        code_of = {}
+        inverse = np.array([code_of.setdefault(tag, len(code_of)) for tag in tags], dtype=int)
+        uniks, first_idx = np.empty(len(code_of), dtype=object), np.arange(len(code_of))
+        uniks[:] = list(code_of)
+    order = np.argsort(first_idx, kind='stable')
+    uniks = uniks[order]
+    rank = np.empty(len(order), dtype=int)
+    rank[order] = np.arange(len(order))
+    is_tagged = np.array([bool(tag) for tag in uniks], dtype=bool)
+    new_code = np.where(is_tagged, np.cumsum(is_tagged) - 1, -1)
+    return new_code[rank[inverse.ravel()]], uniks[is_tagged].tolist()
+
+
 _max_node_size_ratio = 0.20
 
 
@@ -97,6 +281,12 @@ def ordered_uniks(iterable):
     return [x for x in iterable if x not in found and found.add(x) is None]
 
 
+def _unik_tags(pts):
+    if isinstance(pts, ColumnarPts):
+        return pts.tags
+    return ordered_uniks(filter(None, (x.get('tag', None) for x in pts)))
+
+
 def process_viz_args(pts, nodeSize, figsize, fillColors, untaggedColor, alpha=1):
     n = len(pts)
     if isinstance(figsize, (int, float)):
@@ -108,7 +298,7 @@ def process_viz_args(pts, nodeSize, figsize, fillColors, untaggedColor, alpha=1)
         fillColors = dflt_fill_colors
     elif isinstance(fillColors, Mapping):
         color_for_tag = fillColors
-        unik_tags = ordered_uniks(filter(None, (x.get('tag', None) for x in pts)))
+        unik_tags = _unik_tags(pts)
         when_not_found_choose_from_here = iter(dflt_fill_colors)
         fillColors = [
             color_for_tag.get(tag, False) or next(when_not_found_choose_from_here)
@@ -150,24 +340,169 @@ def splatter(
     fillColors=None,
     untaggedColor='#444',
     alpha=1,
-    process_pts=process_pts,
+    process_pts=columnar_pts,
     process_viz_args=process_viz_args,
+    engine=DFLT_ENGINE,
+    n_frames=DFLT_N_FRAMES,
+    init=None,
+    cache=None,
+    refine_iterations=DFLT_REFINE_ITERATIONS,
+    reduce_dim=None,
+    reduction=DFLT_REDUCTION,
+    rendering=DFLT_RENDERING,
     **extra_splatter_kwargs,
 ):
-    pts = list(process_pts(pts))
-    pts, nodeSize, figsize, fillColors, untaggedColor = process_viz_args(
-        pts, nodeSize, figsize, fillColors, untaggedColor, alpha
-    )
-    height, width = figsize
-    return splatter_raw(
-        pts,
-        nodeSize=nodeSize,
-        height=height,
-        width=width,
-        fillColors=fillColors,
-        untaggedColor=untaggedColor,
-        **extra_splatter_kwargs,
-    )
+    """Splatter pts. See ``splatter_raw`` for the description of the ``extra_splatter_kwargs``.
+
+    :param engine: Where the t-SNE is computed. Either ``'browser'`` (the default), or ``'python'``,
+        which computes it here (with ``oui.splatter.tsne``, which scales to 100k+ points) and only ships
+        the (decimated) sequence of solutions to the browser, to be animated. The python engine needs a JS
+        bundle built from the current TS sources (see ``oui.BUNDLE_FEATURES``): with an older one, it raises
+        a ``RuntimeError``.
+    :param n_frames: The number of solutions shipped when engine is ``'python'``.
+        ``n_frames=1`` ships only the final one.
+    :param init: The initial (n_pts, dim) solution of the t-SNE, e.g. a previous embedding of (most of) the
+        same pts (see ``jsobj._trace['embedding']``), or ``'xy'``: the ``'x'`` and ``'y'`` fields of the pts.
+        Rows of NaNs (new pts) are placed near their nearest neighbors. If not given (the default), the
+        t-SNE starts from a random solution. A warm started t-SNE only runs ``refine_iterations``
+        (with no early exaggeration). Like the python engine, the browser engine needs a rebuilt JS bundle
+        to start from init: with the shipped one, it raises a ``RuntimeError``.
+    :param cache: Where the (final) embeddings of the python engine are kept, by a hash of the (scaled) fvs
+        and of the t-SNE options (``dim``, ``epsilon``, ``perplexity``): None (the default: no cache), True
+        (an in-process LRU cache, see ``oui.splatter.tsne.default_embedding_cache``), or a mapping.
+        When the embedding of pts is in the cache, it's shipped as is, whatever the engine (so with the
+        ``'browser'`` one, the embedding computed in python is shown): restyling pts doesn't redo the t-SNE.
+        (Unless the JS bundle can't draw it: then the browser engine ignores the cache.)
+    :param refine_iterations: The number of iterations of a warm started t-SNE
+        (unless ``maxIterations`` is given)
+    :param reduce_dim: If given (and smaller than the dimension of the fvs), the fvs are reduced to that
+        dimension before they're splattered (shipped, or given to the python t-SNE). It can also be a fitted
+        ``oui.splatter.reduction.FvReduction``, to reduce the fvs with (see ``reduced_pts``).
+        The reduction (and the variance it retains) is in ``jsobj._trace['reduction']``.
+        The reduction scales the fvs itself (it z-scores them, then projects them), so it can't be given
+        along with a ``scaler`` (a ``ValueError`` is raised): scale the fvs beforehand instead.
+    :param reduction: How fvs are reduced: ``'pca'`` (randomized SVD) or ``'random_projection'``
+        (see ``oui.splatter.reduction``)
+    :param rendering: ``'nodes'`` (the default): a node is drawn per pt, or ``'density'``: the final
+        embedding (computed here, so with the python engine) is aggregated in a per-tag 2D histogram of the
+        size of the figure, which is drawn instead, with only the pts of the sparsest cells drawn as nodes
+        (see ``oui.splatter.density``). For (very) large numbers of pts. Drawing densities needs a JS bundle
+        built from the current TS sources (see ``oui.BUNDLE_FEATURES``): with an older one, ``'density'``
+        raises a ``RuntimeError``.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine should be one of {ENGINES}, was {engine}")
+    if rendering not in RENDERINGS:
+        raise ValueError(f"rendering should be one of {RENDERINGS}, was {rendering}")
+    if rendering == 'density':
+        engine = 'python'  # (the embedding is aggregated here)
+    if reduce_dim is not None and extra_splatter_kwargs.get('scaler') is not None:
+        raise ValueError("reduce_dim and scaler can't both be given: the reduction z-scores the fvs itself")
+    with instrumented_render('splatter'):
+        with stage('preprocess'):
+            pts = process_pts(pts)
+            if not isinstance(pts, ColumnarPts):
+                pts = list(pts)
+            pts, nodeSize, figsize, fillColors, untaggedColor = process_viz_args(
+                pts, nodeSize, figsize, fillColors, untaggedColor, alpha
+            )
+        height, width = figsize
+        fv_reduction = None
+        if reduce_dim is not None:
+            with stage('reduce'):
+                pts, fv_reduction = reduced_pts(pts, reduce_dim, reduction)
+            if fv_reduction is not None:  # the reduced fvs are already (z-scored, then) projected
+                extra_splatter_kwargs['scaler'] = identity_scaler(fv_reduction.n_components)
+        cache = embedding_cache(cache)
+        if isinstance(init, str):
+            if init != 'xy':
+                raise ValueError(f"init should be an array, 'xy', or None, was {init!r}")
+            init = init_from_pts(pts, extra_splatter_kwargs.get('dim', splatter_dflts['dim']))
+            if init is None:
+                raise ValueError("init='xy' needs a 2D t-SNE (dim=2) of pts with 'x' and 'y' fields")
+        if init is not None:
+            extra_splatter_kwargs.setdefault('maxIterations', refine_iterations)
+        if cache is not None and engine == 'browser' and bundle_has_feature('tsne_frames'):
+            pts = columnar_pts(pts)
+            fvs = scaled_fvs(pts.fvs, extra_splatter_kwargs.get('scaler'))
+            if _embedding_key(fvs, extra_splatter_kwargs) in cache:
+                engine = 'python'  # (which ships the cached embedding)
+        if engine == 'python':
+            jsobj = splatter_with_python_tsne(
+                pts,
+                n_frames=n_frames,
+                init=init,
+                cache=cache,
+                rendering=rendering,
+                nodeSize=nodeSize,
+                height=height,
+                width=width,
+                fillColors=fillColors,
+                untaggedColor=untaggedColor,
+                **extra_splatter_kwargs,
+            )
+        else:
+            jsobj = splatter_raw(
+                pts,
+                nodeSize=nodeSize,
+                height=height,
+                width=width,
+                fillColors=fillColors,
+                untaggedColor=untaggedColor,
+                init=init,
+                **extra_splatter_kwargs,
+            )
+        if fv_reduction is not None:
+            jsobj._trace['reduction'] = fv_reduction.info()
+    return jsobj
+
+
+def reduced_pts(pts, n_components, method=DFLT_REDUCTION):
+    """The pts with their fvs reduced to n_components dimensions (see ``oui.splatter.reduction``),
+    and the ``FvReduction`` that did it (None if the fvs already had at most n_components dimensions).
+
+    The fvs of pts are all in memory here. For fvs that don't fit in memory, fit the reduction on blocks of
+    them (``fit_reduction`` takes an iterable of blocks), and give it as n_components (it's then only used
+    to transform the fvs), or splatter the fvs it reduces block by block (``FvReduction.transform_blocks``).
+
+    >>> pts, fv_reduction = reduced_pts(np.random.RandomState(0).randn(100, 8), 3)
+    >>> pts.fvs.shape, fv_reduction.method
+    ((100, 3), 'pca')
+    >>> reduced_pts(np.random.RandomState(1).randn(10, 8), fv_reduction)[0].fvs.shape
+    (10, 3)
+    """
+    pts = columnar_pts(pts)
+    if isinstance(n_components, FvReduction):
+        fv_reduction = n_components
+    elif pts.fvs.ndim != 2 or pts.fvs.shape[1] <= n_components:
+        return pts, None
+    else:
+        fv_reduction = fit_reduction(pts.fvs, n_components, method)
+    reduced = ColumnarPts(fv_reduction.transform(pts.fvs), pts.tag_codes, pts.tags, pts.extras)
+    return reduced, fv_reduction
+
+
+def identity_scaler(n_features):
+    """A scaler (in the form ``getTransformedFVs`` of the browser engine takes) that leaves fvs as they are"""
+    return {'mean_': [0.0] * n_features, 'scale_': [1.0] * n_features}
+
+
+def init_from_pts(pts, dim=2):
+    """The (n_pts, 2) initial solution made of the ``'x'`` and ``'y'`` fields of pts (NaN where missing),
+    or None if they don't have any (or dim isn't 2).
+
+    >>> init_from_pts([{'fv': [1], 'x': 0.5, 'y': 1}, {'fv': [2]}]).tolist()
+    [[0.5, 1.0], [nan, nan]]
+    """
+    if dim != 2:
+        return None
+    if isinstance(pts, ColumnarPts):
+        x, y = pts.extras.get('x'), pts.extras.get('y')
+    else:
+        x, y = [pt.get('x') for pt in pts], [pt.get('y') for pt in pts]
+    if x is None or y is None or all(v is None for v in x):
+        return None
+    return np.array([[np.nan if xx is None else xx, np.nan if yy is None else yy] for xx, yy in zip(x, y)])
 
 
 # TODO: Forward JS errors to python and handle on python side (raising informative error for e.g.)
@@ -208,11 +543,164 @@ def splatter_raw(*args, **kwargs):
     :param epsilon: TSNE parameter. See https://distill.pub/2016/misread-tsne/
     :param perplexity: TSNE parameter. See https://distill.pub/2016/misread-tsne/
     :param spread: TSNE parameter. See https://distill.pub/2016/misread-tsne/
+    :param pts_transport: How the pts are shipped to JS. Either ``'list'`` (the default): a list of dicts,
+        or ``'base64'``: the fvs as a base64 encoded typed array and the tags as codes and labels
+        (see ``ColumnarPts.to_payload``), much more compact, but needing a rebuilt JS bundle
+        (see ``DFLT_PTS_TRANSPORT``).
+    :param fv_dtype: The dtype of the fvs, when shipped as base64: ``'float32'`` (the default),
+        ``'float16'`` (smaller, less precise) or ``'float64'``.
+    :param init: The initial (n_pts, dim) solution of the t-SNE (random if not given). Rows of NaNs are
+        placed near their nearest neighbors (see ``oui.splatter.tsne.filled_init``). Needs a JS bundle built
+        from the current TS sources (see ``oui.BUNDLE_FEATURES``): an older one would ignore it.
+    :param affinities: ``'dense'`` (the default): the browser computes the affinities of all pairs of pts
+        from their fvs (O(n_pts ** 2) time and memory), or ``'knn'``: only the affinities of the
+        ``3 * perplexity`` nearest neighbors of each pt are computed (here, vectorized) and shipped,
+        instead of the fvs (see ``knn_affinities_payload``). Then the browser's memory is O(n_pts * k), and
+        (for ``dim=2``) its repulsive forces are computed with a quadtree (Barnes-Hut): O(n_pts * log(n_pts))
+        per iteration, instead of O(n_pts ** 2). The payload is O(n_pts * k) too, which is more than the fvs
+        when they have fewer than about ``4 * perplexity`` dimensions. ``'knn'`` needs a JS bundle built from
+        the current TS sources (see ``oui.BUNDLE_FEATURES``).
     :return:
     """
     kwargs = _splatter_raw_sig.extract_kwargs(*args, **kwargs)
+    pts = kwargs.pop('pts')
+    transport_kwargs = {k: kwargs.pop(k) for k in ('pts_transport', 'fv_dtype') if k in kwargs}
+    init = kwargs.pop('init', None)
+    affinities = kwargs.pop('affinities', DFLT_AFFINITIES)
+    if affinities not in AFFINITIES:
+        raise ValueError(f"affinities should be one of {AFFINITIES}, was {affinities}")
+    if affinities == 'knn':
+        require_bundle_feature('sparse_affinities', "affinities='knn'")
+        pts = columnar_pts(pts)
+        with stage('affinities'):
+            fvs = scaled_fvs(pts.fvs, kwargs.get('scaler'))
+            kwargs['affinities'] = knn_affinities_payload(
+                fvs, kwargs.get('perplexity', splatter_dflts['perplexity'])
+            )
+    if init is not None:
+        require_bundle_feature('tsne_init', 'init (with the browser engine)')
+        pts = columnar_pts(pts)
+        init = filled_init(scaled_fvs(pts.fvs, kwargs.get('scaler')), init)
+        if init is not None:  # (the browser engine doesn't run early exaggeration on an init)
+            kwargs['init'] = encode_array(init, dtype='float64')
     assert_jsonizable(kwargs)
-    return _splatter(pts=kwargs.pop('pts'), options=kwargs)
+    return _splatter(pts=pts, options=kwargs, **transport_kwargs)
+
+
+def splatter_with_python_tsne(
+    pts, n_frames=DFLT_N_FRAMES, init=None, cache=None, rendering=DFLT_RENDERING, **kwargs
+):
+    """Same as ``splatter_raw``, but the t-SNE is computed in python, and only ``n_frames`` of its
+    solutions (evenly spaced, the last one included) are shipped (instead of the fvs) to the browser.
+
+    If the embedding of the pts (with these t-SNE options) is in cache, only that one is shipped.
+    Otherwise, the final embedding is put in the cache.
+    With ``rendering='density'``, only the density of the final embedding is shipped (see ``density_payload``).
+    """
+    from oui.splatter.tsne import tsne_frames, decimated_frames
+
+    if rendering == 'density':
+        require_bundle_feature('density', "rendering='density'")
+    else:
+        require_bundle_feature('tsne_frames', "engine='python'")
+    kwargs = _splatter_raw_sig.extract_kwargs(pts, **kwargs)
+    transport_kwargs = {k: kwargs.pop(k) for k in ('pts_transport', 'fv_dtype') if k in kwargs}
+    kwargs.pop('init', None)
+    kwargs.pop('affinities', None)  # (the affinities are those of tsne_frames)
+    pts = columnar_pts(kwargs.pop('pts'))
+    assert_columnar_pts_are_valid(pts)
+    tsne_kwargs = {k: kwargs[k] for k in ('dim', 'epsilon', 'perplexity', 'spread') if k in kwargs}
+    fvs = scaled_fvs(pts.fvs, kwargs.get('scaler'))
+    key = _embedding_key(fvs, tsne_kwargs) if cache is not None else None
+    embedding = cache.get(key) if cache is not None else None
+    with stage('tsne'):
+        if embedding is not None:
+            frames = [embedding]
+        else:
+            n_iter = kwargs.get('maxIterations', splatter_dflts['maxIterations'])
+            if init is not None:
+                tsne_kwargs.update(init=init, early_exaggeration_iters=0)
+            if rendering == 'density':
+                n_frames = 1
+            frames = list(decimated_frames(tsne_frames(fvs, n_iter=n_iter, **tsne_kwargs), n_iter, n_frames))
+            embedding = frames[-1]
+            if cache is not None:
+                cache[key] = embedding
+    if rendering == 'density':
+        with stage('density'):
+            height = kwargs.get('height', splatter_dflts['height'])
+            width = kwargs.get('width', splatter_dflts['width'])
+            kwargs['density'] = density_payload(embedding, pts.tag_codes, len(pts.tags), height, width)
+    else:
+        # only the first two dimensions are displayed
+        kwargs['frames'] = [encode_array(frame[:, :2], dtype='float32') for frame in frames]
+    jsobj = _splatter(pts, options=kwargs, **transport_kwargs)
+    jsobj._trace['embedding'] = embedding
+    return jsobj
+
+
+def knn_affinities_payload(fvs, perplexity=splatter_dflts['perplexity']):
+    """The (sparse) k nearest neighbors affinities of the fvs (see ``oui.splatter.tsne.knn_affinities``),
+    in the form the browser engine takes them: the upper triangle of the (symmetric) matrix, in CSR form.
+
+    >>> payload = knn_affinities_payload(np.array([[0.], [1.], [3.], [7.]]), perplexity=1)
+    >>> payload['n'], payload['rowPtr']['dtype'], payload['cols']['dtype'], payload['values']['dtype']
+    (4, 'int32', 'uint16', 'float32')
+    """
+    n = len(fvs)
+    perplexity = min(perplexity, max(n - 1, 1))
+    row_ptr, cols, values = upper_csr(*knn_affinities(fvs, perplexity), n=n)
+    return {
+        'n': n,
+        'rowPtr': encode_array(row_ptr, dtype='int32'),
+        'cols': encode_array(cols, dtype='uint16' if n <= 2 ** 16 else 'int32'),
+        'values': encode_array(values, dtype='float32'),
+    }
+
+
+def _embedding_key(fvs, tsne_options):
+    """The key of the embedding of fvs in the embedding cache (the options default to splatter's).
+    The fvs should be the scaled ones (see ``scaled_fvs``): those the t-SNE is computed on."""
+    return embedding_key(fvs, **dict({k: splatter_dflts[k] for k in EMBEDDING_KEY_OPTIONS}, **tsne_options))
+
+
+def z_scored(fvs):
+    """Normalize the columns of fvs the way the browser engine does (constant columns become 0).
+
+    >>> z_scored(np.array([[1., 5.], [3., 5.]])).tolist()
+    [[-0.7071067811865475, 0.0], [0.7071067811865475, 0.0]]
+    """
+    std = fvs.std(axis=0, ddof=1) if len(fvs) > 1 else np.zeros(fvs.shape[1])
+    return np.divide(fvs - fvs.mean(axis=0), std, out=np.zeros_like(fvs), where=std > 0)
+
+
+def scaled_fvs(fvs, scaler=None):
+    """The fvs, normalized as the browser engine does: with the scaler (a ``{'mean_': ..., 'scale_': ...}``
+    dict) if given, z-scored otherwise.
+
+    >>> scaled_fvs(np.array([[1., 5.], [3., 5.]]), {'mean_': [1, 0], 'scale_': [2, 0]}).tolist()
+    [[0.0, 0.0], [1.0, 0.0]]
+    """
+    if scaler is None:
+        return z_scored(fvs)
+    mean, scale = np.asarray(scaler['mean_'], dtype=float), np.asarray(scaler['scale_'], dtype=float)
+    return np.divide(fvs - mean, scale, out=np.zeros_like(fvs), where=scale != 0)
+
+
+def assert_columnar_pts_are_valid(pts: ColumnarPts):
+    """The ``ColumnarPts`` version of ``assert_pts_are_valid``: Just a few shape checks."""
+    if pts.fvs.ndim != 2 or len(pts) == 0:
+        raise ValueError(
+            f"pts must be a non-empty (n_pts, n_features) array of fvs. Shape was {pts.fvs.shape}"
+        )
+    if pts.tag_codes.shape != (len(pts),):
+        raise ValueError(f"There should be one tag code per pt. Shape was {pts.tag_codes.shape}")
+    if len(pts.tag_codes) and pts.tag_codes.max() >= len(pts.tags):
+        raise ValueError(f"Some tag codes are not in the range of the {len(pts.tags)} tags")
+    for field, values in pts.extras.items():
+        if len(values) != len(pts):
+            raise ValueError(f"There should be one {field} value per pt. There were {len(values)}")
+    return True
 
 
 def assert_pts_are_valid(pts):
@@ -240,11 +728,30 @@ def assert_pts_are_valid(pts):
 
 
 # TODO: Forward JS errors to python and handle on python side (raising informative error for e.g.)
-def _splatter(pts, options):
-    assert_pts_are_valid(pts)
+def _splatter(pts, options, pts_transport=DFLT_PTS_TRANSPORT, fv_dtype=DFLT_FV_DTYPE):
     if not options:
         options = {}
-    return Javascript(f'splatter(element.get(0), {str(pts)}, {str(options)})')
+    validate_transport(pts_transport, 'pts_transport')
+    with instrumented_render('_splatter') as render:
+        with stage('preprocess'):
+            pts = columnar_pts(pts)
+            assert_columnar_pts_are_valid(pts)
+        # if the solutions (or the affinities) are given, fvs aren't needed
+        include_fvs = 'frames' not in options and 'affinities' not in options
+        with stage('cast'):
+            if 'density' in options:  # no pts are drawn (only their density): only the tags are needed
+                data = {'tags': pts.tags}
+            elif pts_transport == 'base64':
+                data = pts.to_payload(include_fvs, fv_dtype)
+            else:
+                data = pts.to_dicts(include_fvs)
+        with stage('serialize'):
+            js_source = render_call_source('splatter', data, options)
+        jsobj = BundledJavascript(js_source)
+        jsobj._trace = {'pts': pts, 'options': options}
+        counts = {'n_pts': len(pts), 'n_features': pts.fvs.shape[1], 'n_tags': len(pts.tags)}
+        render.set_result(jsobj, counts=counts)
+    return jsobj
 
 
 # Just to note that we can do this with position only args too.
@@ -0,0 +1,113 @@
+"""Density rendering of (very) large splatters.
+
+Beyond some tens of thousands of points, drawing a node per point is slow, and the nodes overlap so much
+that the picture is saturated anyway. So the final 2D embedding is aggregated here, into a per-tag 2D
+histogram with ``bin_size`` pixel cells, which the browser paints (as an image: each cell is given the
+colors of its tags, mixed by their counts, with an opacity growing with the (log) count of the cell).
+The points of the sparsest cells (the "outliers") are kept as nodes, so isolated points are still seen.
+What's shipped (and drawn) is bounded by the size of the figure, not by the number of points.
+
+>>> embedding = np.array([[0., 0.], [0., 0.], [0.1, 0.], [1., 1.]])
+>>> payload = density_payload(embedding, tag_codes=np.array([0, 1, 0, -1]), n_tags=2, height=100, width=100,
+...                           bin_size=10, outlier_max_count=1)
+>>> dense_grid(payload['grid'])[:, 1, 1].tolist()  # the counts of the tags (and untagged) of that cell
+[2, 1, 0]
+>>> decode_array(payload['outliers']['xy']).tolist(), decode_array(payload['outliers']['tagCodes']).tolist()
+([[90.0, 90.0]], [-1])
+"""
+import numpy as np
+
+from oui.transport import encode_array, decode_array
+
+DFLT_BIN_SIZE = 2  # the size (in pixels) of the cells of the grid
+DFLT_OUTLIER_MAX_COUNT = 1  # the points of the cells with at most this many points are shipped as nodes
+DFLT_MAX_OUTLIERS = 5000
+MARGIN = 10  # the margin of the figure (same as the margin of the splatter's index.ts)
+
+
+def pixel_positions(embedding, height, width, margin=MARGIN):
+    """The (x, y) pixel positions of the points of a 2D embedding, scaled as the splatter's ``draw`` does:
+    x in a centered ``height`` wide square, y over the whole height (minus the margins).
+
+    >>> pixel_positions(np.array([[0., 0.], [2., 1.]]), height=100, width=200).tolist()
+    [[60.0, 10.0], [140.0, 90.0]]
+    """
+    embedding = np.asarray(embedding, dtype='float64')[:, :2]
+    lo, hi = embedding.min(axis=0), embedding.max(axis=0)
+    unit = np.divide(embedding - lo, hi - lo, out=np.full_like(embedding, 0.5), where=hi > lo)
+    x_lo, x_hi = width / 2 - height / 2 + margin, width / 2 + height / 2 - margin
+    return np.stack([x_lo + unit[:, 0] * (x_hi - x_lo), margin + unit[:, 1] * (height - 2 * margin)], axis=1)
+
+
+def density_grid(xy, tag_codes, n_tags, height, width, bin_size=DFLT_BIN_SIZE):
+    """The (n_tags + 1, n_rows, n_cols) counts of the points (at pixel positions xy) in every cell,
+    per tag (the last layer being that of the untagged points), and the (flat) cell of every point."""
+    n_rows, n_cols = int(np.ceil(height / bin_size)), int(np.ceil(width / bin_size))
+    rows = np.clip((xy[:, 1] // bin_size).astype(int), 0, n_rows - 1)
+    cols = np.clip((xy[:, 0] // bin_size).astype(int), 0, n_cols - 1)
+    cells = rows * n_cols + cols
+    layers = np.where(tag_codes >= 0, tag_codes, n_tags)
+    counts = np.bincount(layers * (n_rows * n_cols) + cells, minlength=(n_tags + 1) * n_rows * n_cols)
+    return counts.reshape(n_tags + 1, n_rows, n_cols), cells
+
+
+def sparse_grid(counts):
+    """The sparse form of a grid of counts: its shape, and the flat index and counts of its non-zero cells.
+    (Most cells are empty, and most of the others only have some of the tags.)"""
+    index = np.flatnonzero(counts)
+    values = counts.ravel()[index]
+    return {
+        'shape': list(counts.shape),
+        'index': encode_array(index, dtype='uint32'),
+        'counts': encode_array(values, dtype='uint16' if values.max(initial=0) < 2 ** 16 else 'uint32'),
+    }
+
+
+def dense_grid(grid):
+    """The (dense) array of counts of a sparse grid"""
+    counts = np.zeros(int(np.prod(grid['shape'])), dtype='int64')
+    counts[decode_array(grid['index'])] = decode_array(grid['counts'])
+    return counts.reshape(grid['shape'])
+
+
+def density_payload(
+    embedding,
+    tag_codes,
+    n_tags,
+    height,
+    width,
+    bin_size=DFLT_BIN_SIZE,
+    outlier_max_count=DFLT_OUTLIER_MAX_COUNT,
+    max_outliers=DFLT_MAX_OUTLIERS,
+):
+    """What the browser needs to paint the density of a 2D embedding (in the ``density`` splatter option).
+
+    :param embedding: The (n, 2) embedding of the points
+    :param tag_codes: The (n,) tag codes of the points (-1 for untagged points)
+    :param n_tags: The number of tags
+    :param height: The height of the figure, in pixels
+    :param width: The width of the figure, in pixels
+    :param bin_size: The size of the cells of the grid, in pixels
+    :param outlier_max_count: The points of the cells with at most this many points are shipped as points
+    :param max_outliers: The maximum number of such points (those of the sparsest cells are kept)
+    :return: A dict with the ``grid`` of counts (of shape (n_tags + 1, n_rows, n_cols), in sparse form:
+        the flat ``index`` and the ``counts`` of its non-zero cells), the ``binSize``, and the ``outliers``:
+        their (pixel) ``xy`` positions and ``tagCodes``
+    """
+    tag_codes = np.asarray(tag_codes)
+    xy = pixel_positions(embedding, height, width)
+    counts, cells = density_grid(xy, tag_codes, n_tags, height, width, bin_size)
+    cell_totals = counts.sum(axis=0).ravel()
+    point_totals = cell_totals[cells]
+    outliers = np.flatnonzero(point_totals <= outlier_max_count)
+    if len(outliers) > max_outliers:
+        outliers = outliers[np.argsort(point_totals[outliers], kind='stable')[:max_outliers]]
+        outliers.sort()
+    return {
+        'grid': sparse_grid(counts),
+        'binSize': bin_size,
+        'outliers': {
+            'xy': encode_array(xy[outliers], dtype='float32'),
+            'tagCodes': encode_array(tag_codes[outliers], dtype='int16' if n_tags < 2 ** 15 else 'int32'),
+        },
+    }
@@ -1,6 +1,7 @@
 import * as d3 from 'd3';
 import * as _ from 'lodash';
 import tSNE from './tsne';
+import { decodeArray, EncodedArray, TypedArray } from '../transport';
 
 // interface SplatterNode {
 //     bt: number;
@@ -13,6 +14,79 @@ import tSNE from './tsne';
 
 const margin: number = 10;
 
+// The compact form of the pts made by the python side (see ColumnarPts.to_payload)
+export interface ColumnarPts {
+    fvs?: EncodedArray;
+    tagCodes: EncodedArray;
+    tags: any[];
+    extras?: { [field: string]: any[] };
+}
+
+// The (per tag) density of the pts, aggregated by the python side (see density_payload): the counts of a
+// (nTags + 1, nRows, nCols) grid (in sparse form), and the pts of the sparsest cells (at pixel positions)
+export interface Density {
+    grid: { shape: number[], index: EncodedArray, counts: EncodedArray };
+    binSize: number;
+    outliers: { xy: EncodedArray, tagCodes: EncodedArray };
+}
+
+// The sparse (k nearest neighbors) affinities computed by the python side (see knn_affinities_payload):
+// the upper triangle of the symmetric P matrix, in CSR form
+export interface SparseAffinities {
+    n: number;
+    rowPtr: EncodedArray;
+    cols: EncodedArray;
+    values: EncodedArray;
+}
+
+export function nodesFromColumns(data: ColumnarPts): any[] {
+    const tagCodes: TypedArray = decodeArray(data.tagCodes);
+    const fvs: any = data.fvs ? decodeArray(data.fvs) : null;
+    const fvSize: number = data.fvs ? data.fvs.shape[1] : 0;
+    const extras = data.extras || {};
+    const fields: string[] = Object.keys(extras);
+    const nodes = [];
+    for (let i = 0; i < tagCodes.length; i++) {
+        const node: any = {};
+        if (fvs) {
+            node.fv = fvs.subarray(i * fvSize, (i + 1) * fvSize);
+        }
+        if (tagCodes[i] >= 0) {
+            node.tag = data.tags[tagCodes[i]];
+        }
+        for (const field of fields) {
+            if (extras[field][i] !== null) {
+                node[field] = extras[field][i];
+            }
+        }
+        nodes.push(node);
+    }
+    return nodes;
+}
+
+// Plays precomputed (python engine) t-SNE solutions, with the step/getSolution interface of tSNE
+class FramePlayer {
+    frames: TypedArray[];
+    iter = -1;
+
+    constructor(frames: EncodedArray[]) {
+        this.frames = frames.map(decodeArray);
+    }
+
+    step() {
+        this.iter = Math.min(this.iter + 1, this.frames.length - 1);
+    }
+
+    getSolution() {
+        const frame = this.frames[Math.max(this.iter, 0)];
+        const solution = [];
+        for (let i = 0; i < frame.length; i += 2) {
+            solution.push([frame[i], frame[i + 1]]);
+        }
+        return solution;
+    }
+}
+
 export class Splatter {
     defaultOptions;
     defaultTsneOptions;
@@ -122,12 +196,38 @@ export class Splatter {
     }
 
     initTSNE() {
-        const fvs = this.getTransformedFVs(this.nodes, 'z-score', 'global');
+        // a warm start (see the init argument of the python splatter): no early exaggeration to undo it
+        const init = this.options.init ? this.initialSolution(this.options.init) : undefined;
 
-        this.tsne = new tSNE(this.tsneOptions);
+        this.tsne = new tSNE(init ? { ...this.tsneOptions, exaggerationIters: 0 } : this.tsneOptions);
         this.iter = 0;
 
-        this.tsne.initDataRaw(fvs);
+        const affinities: SparseAffinities = this.options.affinities;
+        if (affinities) {  // computed by the python side (there are no fvs then)
+            this.tsne.initDataSparse(affinities.n, decodeArray(affinities.rowPtr), decodeArray(affinities.cols),
+                decodeArray(affinities.values), init);
+        } else {
+            this.tsne.initDataRaw(this.getTransformedFVs(this.nodes, 'z-score', 'global'), init);
+        }
+        if (window.requestAnimationFrame) {
+            window.requestAnimationFrame(this.draw);
+        }
+    }
+
+    initialSolution(init: EncodedArray): Float64Array[] {
+        const values: TypedArray = decodeArray(init);
+        const dim: number = init.shape[1];
+        const solution = [];
+        for (let i = 0; i < values.length; i += dim) {
+            solution.push(Float64Array.from(values.subarray(i, i + dim)));
+        }
+        return solution;
+    }
+
+    initFramePlayer() {
+        this.tsne = new FramePlayer(this.options.frames);
+        this.iter = 0;
+        this.options.maxIterations = this.options.frames.length - 1;
         if (window.requestAnimationFrame) {
             window.requestAnimationFrame(this.draw);
         }
@@ -163,7 +263,7 @@ export class Splatter {
 
     renderNetwork(element, data) {
         this.initializeValues();
-        this.nodes = data;
+        this.nodes = Array.isArray(data) ? data : nodesFromColumns(data);
         const { gnodes, node } = this.initializeDom(element);
         this.gnodeSelection = gnodes;
         this.nodeSelection = node;
@@ -365,6 +465,10 @@ export class Splatter {
             .attr('transform', 'scale(' + (1 / Math.pow(0.25 /* * zoomBehavior.scale()*/, 0.5)) + ')');
 
         this.update = updateVis;
+        if (this.options.frames) {
+            this.initFramePlayer();
+            return;
+        }
         if (this.nodes.length < 60) {
             this.tsneOptions.epsilon = Math.max(this.nodes.length / 5, 5);
             this.tsneOptions.perplexity = Math.min(20, this.nodes.length - 1);
@@ -375,6 +479,72 @@ export class Splatter {
         this.initTSNE();
     }
 
+    // paints the density of the pts (the colors of the tags of a cell mixed by their counts, with an opacity
+    // growing with its log count), then draws the outliers as nodes: the cost depends on the size of the
+    // figure, not on the number of pts
+    renderDensity(element: HTMLElement, data): void {
+        const density: Density = this.options.density;
+        const { width, height, nodeSize } = this.options;
+        const [nLayers, nRows, nCols] = density.grid.shape;
+        const cellSize: number = nRows * nCols;
+        const index: TypedArray = decodeArray(density.grid.index);
+        const counts: TypedArray = decodeArray(density.grid.counts);
+        // the tag of layer i is data.tags[i] (so its color is fillColors[i]); the last layer is the untagged pts
+        const layerColors = _.range(nLayers).map((i) => d3.rgb(i < nLayers - 1 ?
+            this.options.fillColors[i % this.options.fillColors.length] : this.options.untaggedColor));
+        const totals = new Float64Array(cellSize);
+        const rgbSums = new Float64Array(3 * cellSize);
+        for (let k = 0; k < index.length; k++) {
+            const layer = Math.floor(index[k] / cellSize);
+            const cell = index[k] % cellSize;
+            const color = layerColors[layer];
+            totals[cell] += counts[k];
+            rgbSums[3 * cell] += counts[k] * color.r;
+            rgbSums[3 * cell + 1] += counts[k] * color.g;
+            rgbSums[3 * cell + 2] += counts[k] * color.b;
+        }
+        const maxLogTotal: number = Math.log1p(_.max(totals) || 1);
+
+        const canvas: HTMLCanvasElement = document.createElement('canvas');
+        canvas.width = width;
+        canvas.height = height;
+        const context: CanvasRenderingContext2D = canvas.getContext('2d');
+        const image: ImageData = context.createImageData(width, height);
+        for (let y = 0; y < height; y++) {
+            const row = Math.min(Math.floor(y / density.binSize), nRows - 1);
+            for (let x = 0; x < width; x++) {
+                const cell = row * nCols + Math.min(Math.floor(x / density.binSize), nCols - 1);
+                const total = totals[cell];
+                if (total > 0) {
+                    const pixel = 4 * (y * width + x);
+                    image.data[pixel] = rgbSums[3 * cell] / total;
+                    image.data[pixel + 1] = rgbSums[3 * cell + 1] / total;
+                    image.data[pixel + 2] = rgbSums[3 * cell + 2] / total;
+                    image.data[pixel + 3] = 255 * Math.max(0.15, Math.log1p(total) / maxLogTotal);
+                }
+            }
+        }
+        context.putImageData(image, 0, 0);
+
+        const xy: TypedArray = decodeArray(density.outliers.xy);
+        const tagCodes: TypedArray = decodeArray(density.outliers.tagCodes);
+        for (let i = 0; i < tagCodes.length; i++) {
+            context.fillStyle = tagCodes[i] >= 0 ? layerColors[tagCodes[i]].toString() : this.options.untaggedColor;
+            context.beginPath();
+            context.arc(xy[2 * i], xy[2 * i + 1], nodeSize, 0, 2 * Math.PI);
+            context.fill();
+        }
+
+        if (this.svg) {  // (see loadInSvg)
+            this.svg.append('image')
+                .attr('width', width)
+                .attr('height', height)
+                .attr('href', canvas.toDataURL('image/png'));
+        } else {
+            element.appendChild(canvas);
+        }
+    }
+
     load(renderElement, data, userOptions): void {
         const defaultsUrl = 'https://otosense-dev-ui.s3.amazonaws.com/static/js/splatter_defaults.json';
         fetch(defaultsUrl)
@@ -383,7 +553,11 @@ export class Splatter {
             this.options = { ...defaults.options, ...(userOptions || {}) };
             const userTsneOptions = userOptions && userOptions.tsne ? userOptions.tsne : {};
             this.tsneOptions = { ...defaults.tsneOptions, ...(userTsneOptions || {}) };
-            this.renderNetwork(renderElement, data);
+            if (this.options.density) {
+                this.renderDensity(renderElement, data);
+            } else {
+                this.renderNetwork(renderElement, data);
+            }
         });
     }
 
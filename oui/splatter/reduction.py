@@ -0,0 +1,201 @@
+"""Reduction of the dimension of fvs, before they're splattered.
+
+The t-SNE engines compute distances over every dimension of the fvs (and the browser one gets them all),
+so reducing (say, 2048-dimensional) fvs to 50 dimensions cuts both the payload and the distance computations
+by that much, for little loss of the (neighborhood) structure t-SNE cares about. Two methods:
+
+- ``'pca'``: the first principal components, by a randomized SVD (or, for fvs given as blocks,
+  by accumulating their covariance, so they needn't fit in memory),
+- ``'random_projection'``: a sparse random projection (a Johnson-Lindenstrauss transform): no fitting,
+  so a single pass over the fvs.
+
+A reduction is fitted on fvs that are z-scored (as the engines do), and keeps track of the variance retained.
+
+>>> rng = np.random.RandomState(0)
+>>> X = rng.randn(1000, 5) @ rng.randn(5, 100) + 0.01 * rng.randn(1000, 100)  # (close to) 5 dimensional
+>>> reduction = fit_reduction(X, n_components=10)
+>>> reduction.transform(X).shape, round(reduction.variance_retained, 3)
+((1000, 10), 1.0)
+"""
+import numpy as np
+
+REDUCTIONS = ('pca', 'random_projection')
+DFLT_REDUCTION = 'pca'
+DFLT_N_COMPONENTS = 50
+DFLT_N_OVERSAMPLES = 10  # the extra dimensions of the random subspace of the randomized SVD
+DFLT_N_POWER_ITER = 4  # the power iterations of the randomized SVD (to sharpen the spectrum)
+DFLT_SEED = 0  # (a fixed seed, so that the same fvs are reduced to the same fvs)
+DFLT_TRANSFORM_BLOCK_SIZE = 10000  # the rows transformed at once (so no z-scored copy of all the fvs is made)
+
+
+class FvReduction:
+    """A (fitted) linear reduction of fvs: ``transform(X) = ((X - mean) / scale) @ components``.
+
+    :param mean: The mean of the fvs the reduction was fitted on
+    :param scale: The std of those fvs (the columns of null std are mapped to 0, as in ``z_scored``)
+    :param components: The (n_features, n_components) projection matrix
+    :param variance_retained: The fraction of the (z-scored) variance of the fvs that the reduced fvs have
+    :param method: The method of the reduction (one of ``REDUCTIONS``)
+    """
+
+    def __init__(self, mean, scale, components, variance_retained, method):
+        self.mean = mean
+        self.scale = scale
+        self.components = components
+        self.variance_retained = variance_retained
+        self.method = method
+
+    @property
+    def n_components(self):
+        return self.components.shape[1]
+
+    def transform(self, X, block_size=DFLT_TRANSFORM_BLOCK_SIZE):
+        """The reduced fvs of X (transformed block_size rows at a time)"""
+        X = np.asarray(X)
+        if len(X) <= block_size:
+            return _z(X, self.mean, self.scale) @ self.components
+        reduced = np.empty((len(X), self.n_components))
+        for start in range(0, len(X), block_size):
+            block = X[start:start + block_size]
+            reduced[start:start + len(block)] = _z(block, self.mean, self.scale) @ self.components
+        return reduced
+
+    def transform_blocks(self, blocks):
+        """Generate the reduced fvs of the (row) blocks of fvs"""
+        for block in blocks:
+            yield self.transform(block)
+
+    def info(self):
+        """A (jsonizable) description of the reduction"""
+        return {
+            'method': self.method,
+            'n_components': self.n_components,
+            'variance_retained': self.variance_retained,
+        }
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(method={self.method!r}, n_components={self.n_components}, "
+            f"variance_retained={self.variance_retained:.3f})"
+        )
+
+
+def fit_reduction(fvs, n_components=DFLT_N_COMPONENTS, method=DFLT_REDUCTION, random_state=DFLT_SEED):
+    """Fit a reduction of fvs to n_components dimensions.
+
+    :param fvs: An (n, d) array of fvs, or an iterable of (row) blocks of them (for fvs that don't fit in
+        memory). An iterable of blocks is iterated over twice (so it can't be an iterator):
+        once to get the column statistics, once to accumulate the covariance (for PCA) or the variance
+        of the projections (for random projections).
+    :param n_components: The dimension of the reduced fvs
+    :param method: 'pca' or 'random_projection'
+    :param random_state: The seed of the random matrices
+    :return: A ``FvReduction``
+    """
+    if method not in REDUCTIONS:
+        raise ValueError(f"method should be one of {REDUCTIONS}, was {method}")
+    rng = np.random.RandomState(random_state)
+    if isinstance(fvs, np.ndarray):
+        blocks = None
+        X = np.asarray(fvs, dtype='float64')
+        mean, scale = X.mean(axis=0), X.std(axis=0, ddof=1) if len(X) > 1 else np.zeros(X.shape[1])
+        n_features = X.shape[1]
+    else:
+        if iter(fvs) is fvs:
+            raise TypeError("The blocks of fvs are iterated over twice, so they can't be an iterator")
+        blocks = fvs
+        _, mean, scale = _column_stats(blocks)
+        n_features = len(mean)
+    n_components = min(n_components, n_features)
+
+    if method == 'pca':
+        if blocks is None:
+            components, variance_retained = _randomized_pca(_z(X, mean, scale), n_components, rng)
+        else:
+            components, variance_retained = _streamed_pca(blocks, mean, scale, n_components)
+    else:
+        components = sparse_random_projection_matrix(n_features, n_components, rng)
+        reduction = FvReduction(mean, scale, components, None, method)
+        if blocks is None:
+            reduced_variance = reduction.transform(X).var(axis=0, ddof=1).sum()
+        else:
+            reduced_variance = (_column_stats(reduction.transform_blocks(blocks))[2] ** 2).sum()
+        variance_retained = reduced_variance / max(np.count_nonzero(scale > 0), 1)
+    return FvReduction(mean, scale, components, float(variance_retained), method)
+
+
+def sparse_random_projection_matrix(n_features, n_components, random_state=DFLT_SEED, density=None):
+    """A (n_features, n_components) sparse random projection matrix (Li et al.'s "very sparse" one):
+    Entries are 0 with probability 1 - density, and +/- 1 / sqrt(density * n_components) otherwise, so that
+    squared norms are preserved in expectation. The default density is ``1 / sqrt(n_features)``.
+
+    >>> M = sparse_random_projection_matrix(400, 20)
+    >>> M.shape, round(float((M != 0).mean()), 2)
+    ((400, 20), 0.05)
+    """
+    rng = random_state if isinstance(random_state, np.random.RandomState) \
+        else np.random.RandomState(random_state)
+    density = density or 1 / np.sqrt(n_features)
+    is_nonzero = rng.rand(n_features, n_components) < density
+    signs = np.where(rng.rand(n_features, n_components) < 0.5, -1.0, 1.0)
+    return is_nonzero * signs / np.sqrt(density * n_components)
+
+
+def _randomized_pca(Z, n_components, rng):
+    """The principal axes (as columns) of Z (centered), and the fraction of the variance they retain,
+    by a randomized SVD (Halko et al.): Z is projected on a random subspace a bit bigger than n_components,
+    sharpened by power iterations, and the SVD is computed in that (small) subspace."""
+    n_random = min(n_components + DFLT_N_OVERSAMPLES, min(Z.shape))
+    Q = Z @ rng.randn(Z.shape[1], n_random)
+    for _ in range(DFLT_N_POWER_ITER):
+        Q, _ = np.linalg.qr(Q)
+        Q, _ = np.linalg.qr(Z.T @ Q)
+        Q = Z @ Q
+    Q, _ = np.linalg.qr(Q)
+    _, s, Vt = np.linalg.svd(Q.T @ Z, full_matrices=False)
+    total_variance = np.einsum('ij,ij->', Z, Z)
+    variance_retained = (s[:n_components] ** 2).sum() / total_variance if total_variance > 0 else 1.0
+    return Vt[:n_components].T, variance_retained
+
+
+def _streamed_pca(blocks, mean, scale, n_components):
+    """The principal axes of the (z-scored) blocks, and the fraction of the variance they retain,
+    from their covariance matrix, accumulated block by block (memory is O(d ** 2), not O(n * d))."""
+    n_features = len(mean)
+    cov = np.zeros((n_features, n_features))
+    for block in blocks:
+        Z = _z(block, mean, scale)
+        cov += Z.T @ Z
+    eigenvalues, eigenvectors = np.linalg.eigh(cov)  # (in ascending order)
+    order = np.argsort(eigenvalues)[::-1][:n_components]
+    total_variance = np.trace(cov)
+    variance_retained = eigenvalues[order].sum() / total_variance if total_variance > 0 else 1.0
+    return eigenvectors[:, order], variance_retained
+
+
+def _column_stats(blocks):
+    """The number of rows, and the mean and std of the columns, of the blocks (in one pass, with Chan et al.'s
+    parallel update of the means and sums of squared deviations, which is numerically stable)"""
+    n, mean, m2 = 0, None, None
+    for block in blocks:
+        block = np.asarray(block, dtype='float64')
+        if len(block) == 0:
+            continue
+        block_n, block_mean = len(block), block.mean(axis=0)
+        block_m2 = ((block - block_mean) ** 2).sum(axis=0)
+        if mean is None:
+            n, mean, m2 = block_n, block_mean, block_m2
+        else:
+            delta = block_mean - mean
+            total = n + block_n
+            mean = mean + delta * block_n / total
+            m2 = m2 + block_m2 + delta ** 2 * n * block_n / total
+            n = total
+    if mean is None:
+        raise ValueError("There were no fvs in the blocks")
+    return n, mean, np.sqrt(m2 / (n - 1)) if n > 1 else np.zeros_like(mean)
+
+
+def _z(X, mean, scale):
+    X = np.asarray(X, dtype='float64')
+    return np.divide(X - mean, scale, out=np.zeros_like(X), where=scale > 0)
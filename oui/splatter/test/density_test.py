@@ -0,0 +1,74 @@
+import numpy as np
+
+
+def test_density_grid_counts_every_point():
+    from oui.splatter.density import density_grid, pixel_positions
+
+    rng = np.random.RandomState(0)
+    embedding = rng.randn(5000, 2)
+    tag_codes = rng.randint(-1, 3, size=5000)
+    xy = pixel_positions(embedding, height=200, width=300)
+    assert xy[:, 0].min() >= 0 and xy[:, 0].max() <= 300 and xy[:, 1].min() >= 0 and xy[:, 1].max() <= 200
+
+    counts, cells = density_grid(xy, tag_codes, n_tags=3, height=200, width=300, bin_size=4)
+    assert counts.shape == (4, 50, 75)
+    assert counts.sum() == 5000
+    # per tag (the untagged ones in the last layer)
+    assert counts.sum(axis=(1, 2)).tolist() == [np.sum(tag_codes == t) for t in (0, 1, 2, -1)]
+    # every point is in the cell of its pixel position
+    rows, cols = np.divmod(cells, 75)
+    assert (rows == (xy[:, 1] // 4).astype(int)).all() and (cols == (xy[:, 0] // 4).astype(int)).all()
+
+
+def test_sparse_grid_round_trip():
+    from oui.splatter.density import sparse_grid, dense_grid
+
+    counts = np.zeros((3, 10, 20), dtype=int)
+    counts[0, 1, 2], counts[2, 9, 19], counts[1, 5, 5] = 7, 1, 70000
+    grid = sparse_grid(counts)
+    assert np.array_equal(dense_grid(grid), counts)
+    assert grid['counts']['dtype'] == 'uint32'  # (counts that don't fit in uint16)
+    assert sparse_grid(np.minimum(counts, 10))['counts']['dtype'] == 'uint16'
+    assert dense_grid(sparse_grid(np.zeros((2, 3, 4), dtype=int))).sum() == 0
+
+
+def test_density_payload_outliers():
+    from oui.splatter.density import density_payload, dense_grid
+    from oui.transport import decode_array
+
+    rng = np.random.RandomState(0)
+    dense = 0.01 * rng.randn(1000, 2)  # all in a few cells
+    isolated = np.array([[5.0, 5.0], [-5.0, 5.0], [5.0, -5.0]])
+    embedding = np.vstack([dense, isolated])
+    tag_codes = np.r_[np.zeros(1000, dtype=int), [1, 1, -1]]
+    payload = density_payload(embedding, tag_codes, n_tags=2, height=100, width=100, bin_size=2)
+    assert dense_grid(payload['grid']).sum() == 1003
+    assert decode_array(payload['outliers']['tagCodes']).tolist() == [1, 1, -1]
+    assert decode_array(payload['outliers']['xy']).shape == (3, 2)
+
+    # the outliers of the sparsest cells are kept first
+    payload = density_payload(embedding, tag_codes, n_tags=2, height=100, width=100, bin_size=2,
+                              outlier_max_count=10 ** 6, max_outliers=3)
+    assert decode_array(payload['outliers']['tagCodes']).tolist() == [1, 1, -1]
+
+
+def test_density_rendering(rebuilt_bundle):
+    from oui.splatter import splatter
+    from oui.splatter.density import dense_grid
+
+    X = np.random.RandomState(0).randn(300, 4)
+    tags = np.array(['a', 'b', 'c'])[np.arange(300) % 3]
+    jsobj = splatter((X, tags), rendering='density', maxIterations=30, figsize=(100, 100))
+    options = jsobj._trace['options']
+    assert 'frames' not in options and dense_grid(options['density']['grid']).shape[0] == 4  # (3 tags + untagged)
+    assert dense_grid(options['density']['grid']).sum() == 300
+    assert '"fv' not in jsobj.data  # (neither the fvs, nor the pts, are shipped)
+
+
+def test_density_rendering_needs_a_bundle_that_draws_it():
+    import pytest
+    from oui.splatter import splatter
+
+    X = np.random.RandomState(0).randn(30, 4)
+    with pytest.raises(RuntimeError, match='density'):
+        splatter(X, rendering='density', maxIterations=30)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+
+def _low_rank_fvs(n=2000, rank=5, n_features=60, seed=0):
+    rng = np.random.RandomState(seed)
+    return rng.randn(n, rank) @ rng.randn(rank, n_features) + 0.01 * rng.randn(n, n_features)
+
+
+def _row_blocks(X, block_size):
+    return [X[start:start + block_size] for start in range(0, len(X), block_size)]
+
+
+def test_pca_of_blocks_is_that_of_the_array():
+    from oui.splatter.reduction import fit_reduction
+
+    X = _low_rank_fvs()
+    reduction = fit_reduction(X, n_components=5)
+    streamed = fit_reduction(_row_blocks(X, 300), n_components=5)
+    assert np.allclose(streamed.mean, reduction.mean) and np.allclose(streamed.scale, reduction.scale)
+    assert reduction.variance_retained > 0.99 and abs(streamed.variance_retained - reduction.variance_retained) < 1e-6
+    # the same subspace (the components may differ by sign, or rotation within it)
+    P, P_streamed = reduction.components, streamed.components
+    assert np.allclose(P @ P.T, P_streamed @ P_streamed.T, atol=1e-6)
+
+    with pytest.raises(TypeError):
+        fit_reduction(iter(_row_blocks(X, 300)), n_components=5)  # (blocks are iterated over twice)
+
+
+def test_random_projection():
+    from oui.splatter.reduction import fit_reduction
+
+    X = np.random.RandomState(0).randn(1000, 400)
+    reduction = fit_reduction(X, n_components=100, method='random_projection')
+    assert reduction.transform(X).shape == (1000, 100)
+    assert 0.7 < reduction.variance_retained < 1.3  # (squared norms are preserved, in expectation)
+    streamed = fit_reduction(_row_blocks(X, 128), n_components=100, method='random_projection')
+    assert np.array_equal(streamed.components, reduction.components)  # (same seed)
+    assert abs(streamed.variance_retained - reduction.variance_retained) < 1e-6
+
+
+def test_transform_by_blocks():
+    from oui.splatter.reduction import fit_reduction
+
+    X = _low_rank_fvs(n=1000)
+    reduction = fit_reduction(X, n_components=5)
+    whole = reduction.transform(X, block_size=len(X))
+    assert np.allclose(reduction.transform(X, block_size=333), whole)
+    assert np.allclose(np.vstack(list(reduction.transform_blocks(_row_blocks(X, 100)))), whole)
+
+
+def test_reduced_pts():
+    from oui.splatter import reduced_pts, splatter
+    from oui.splatter.reduction import fit_reduction
+
+    X = _low_rank_fvs(n=300)
+    pts, reduction = reduced_pts((X, np.arange(300) % 3), 5)
+    assert pts.fvs.shape == (300, 5) and reduction.n_components == 5
+    assert pts.tags and len(pts.tag_codes) == 300  # (the other fields are kept)
+    assert reduced_pts(X, 100)[1] is None  # (nothing to reduce)
+
+    # a reduction fitted (e.g. on blocks of fvs) beforehand
+    fitted = fit_reduction(_row_blocks(X, 50), n_components=4)
+    pts, reduction = reduced_pts(X, fitted)
+    assert reduction is fitted and np.allclose(pts.fvs, fitted.transform(X))
+
+    jsobj = splatter(X, reduce_dim=fitted)
+    assert jsobj._trace['reduction'] == fitted.info() and jsobj._trace['pts'].fvs.shape == (300, 4)
+
+    with pytest.raises(ValueError):  # (the reduction scales the fvs itself)
+        splatter(X, reduce_dim=fitted, scaler={'mean_': [0.0] * 60, 'scale_': [2.0] * 60})
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+
+def _pts(n=60, n_features=4, seed=0):
+    rng = np.random.RandomState(seed)
+    return [{'fv': fv.tolist(), 'x': float(i % 7), 'y': float(i // 7)} for i, fv in enumerate(rng.randn(n, n_features))]
+
+
+def test_xy_fields_are_only_used_when_asked(rebuilt_bundle):
+    from oui.splatter import splatter
+    from oui.transport import decode_array
+
+    pts = _pts()
+    options = splatter(pts)._trace['options']
+    assert 'init' not in options and 'maxIterations' not in options  # (no warm start by default)
+
+    options = splatter(pts, init='xy', refine_iterations=30)._trace['options']
+    init = decode_array(options['init'])
+    assert init.shape == (len(pts), 2) and options['maxIterations'] == 30
+    assert init[:, 0].tolist() == [pt['x'] for pt in pts]
+
+    with pytest.raises(ValueError):
+        splatter([{'fv': pt['fv']} for pt in pts], init='xy')  # (no x nor y fields)
+    with pytest.raises(ValueError):
+        splatter(pts, init='random')
+
+
+def test_init_needs_a_bundle_that_starts_from_it():
+    from oui.splatter import splatter
+
+    pts = _pts()
+    with pytest.raises(RuntimeError, match='tsne_init'):
+        splatter(pts, init='xy')  # (which the shipped bundle would ignore, while running fewer iterations)
+    with pytest.raises(RuntimeError, match='tsne_init'):
+        splatter(pts, init=np.zeros((len(pts), 2)))
+
+
+def test_knn_affinities_are_shipped_instead_of_the_fvs(rebuilt_bundle):
+    from oui import set_bundle_features
+    from oui.splatter import splatter
+
+    pts = _pts()
+    jsobj = splatter(pts, affinities='knn', perplexity=10)
+    affinities = jsobj._trace['options']['affinities']
+    assert affinities and '"fv' not in jsobj.data
+
+    set_bundle_features(())  # what the shipped (older) bundle amounts to
+    with pytest.raises(RuntimeError, match='sparse_affinities'):
+        splatter(pts, affinities='knn', perplexity=10)
+
+
+def test_embedding_cache(rebuilt_bundle):
+    from oui.splatter import splatter
+    from oui.splatter.tsne import default_embedding_cache
+
+    pts, tsne_options = _pts(), dict(engine='python', n_frames=1, maxIterations=30, perplexity=10)
+    n_cached = len(list(default_embedding_cache()))
+    splatter(pts, **tsne_options)
+    assert len(list(default_embedding_cache())) == n_cached  # (no cache by default)
+
+    cache = {}
+    embedding = splatter(pts, cache=cache, **tsne_options)._trace['embedding']
+    assert len(cache) == 1
+    # what's cached is shipped, even to the browser engine (the fvs aren't, and no t-SNE is done)
+    jsobj = splatter(pts, cache=cache, engine='browser', perplexity=10)
+    assert np.array_equal(jsobj._trace['embedding'], embedding) and '"fv' not in jsobj.data
+
+    # the same fvs, scaled differently, are another t-SNE
+    scaler = {'mean_': [0.0] * 4, 'scale_': [1.0, 1.0, 1.0, 100.0]}
+    splatter(pts, cache=cache, scaler=scaler, **tsne_options)
+    assert len(cache) == 2
+    splatter(pts, cache=cache, scaler=scaler, **tsne_options)
+    assert len(cache) == 2
+
+
+def test_python_engine_needs_a_bundle_that_draws_its_frames(rebuilt_bundle):
+    from oui import set_bundle_features
+    from oui.splatter import splatter
+
+    pts, cache = _pts(), {}
+    splatter(pts, cache=cache, engine='python', n_frames=1, maxIterations=30, perplexity=10)
+
+    set_bundle_features(())  # what the shipped (older) bundle amounts to
+    with pytest.raises(RuntimeError, match='tsne_frames'):
+        splatter(pts, engine='python', n_frames=1, maxIterations=30)
+    # and the browser engine ignores the (cached) embedding it can't draw: it ships the fvs
+    jsobj = splatter(pts, cache=cache, perplexity=10)
+    assert 'embedding' not in jsobj._trace and '"fv' in jsobj.data
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+def _clusters(n_per_cluster=60, n_clusters=3, dim=10, seed=0):
+    rng = np.random.RandomState(seed)
+    X = np.vstack([20 * i + rng.randn(n_per_cluster, dim) for i in range(n_clusters)])
+    return X, np.repeat(np.arange(n_clusters), n_per_cluster)
+
+
+def test_knn_affinities():
+    from oui.splatter.tsne import knn_affinities
+
+    X, _ = _clusters()
+    rows, cols, values = knn_affinities(X, perplexity=10)
+    assert np.isclose(values.sum(), 1) and (values > 0).all()
+    P = dict(zip(zip(rows.tolist(), cols.tolist()), values.tolist()))
+    assert all(np.isclose(P[j, i], p) for (i, j), p in P.items())  # symmetric
+    assert not (rows == cols).any()
+    # with k = 3 * perplexity neighbors, neighbors are all in the same cluster
+    assert (rows // 60 == cols // 60).all()
+
+
+def test_grid_repulsive_forces_are_close_to_the_exact_ones():
+    from oui.splatter.tsne import grid_repulsive_forces, exact_repulsive_forces
+
+    rng = np.random.RandomState(0)
+    for Y in [rng.randn(500, 2), np.vstack([rng.randn(250, 2), 30 + 5 * rng.randn(250, 2)])]:
+        exact = exact_repulsive_forces(Y)
+        approx = grid_repulsive_forces(Y)
+        assert np.linalg.norm(approx - exact) < 0.1 * np.linalg.norm(exact)
+
+
+def test_tsne_embedding():
+    from oui.splatter.tsne import tsne_embedding
+
+    X, labels = _clusters()
+    Y = tsne_embedding(X, perplexity=10, random_state=1)
+    assert Y.shape == (len(X), 2) and np.isfinite(Y).all()
+    assert np.array_equal(Y, tsne_embedding(X, perplexity=10, random_state=1))  # deterministic, given the seed
+    assert tsne_embedding(X, dim=3, perplexity=10, n_iter=20, random_state=1).shape == (len(X), 3)
+
+    # well separated clusters stay separated: every point is closer to its own cluster's center
+    centers = np.stack([Y[labels == label].mean(axis=0) for label in range(3)])
+    nearest_center = np.linalg.norm(Y[:, None] - centers[None], axis=2).argmin(axis=1)
+    assert (nearest_center == labels).all()
+
+
+def test_splatter_python_engine(rebuilt_bundle):
+    from oui.splatter import splatter
+    from oui.transport import decode_array
+
+    X, labels = _clusters(n_per_cluster=30)
+    jsobj = splatter((X, labels.astype(str)), engine='python', n_frames=5, maxIterations=50, perplexity=10,
+                     cache=None)
+    frames = [decode_array(frame) for frame in jsobj._trace['options']['frames']]
+    assert len(frames) == 5 and all(frame.shape == (len(X), 2) for frame in frames)
+    assert np.allclose(frames[-1], jsobj._trace['embedding'])
+    assert '"fv' not in jsobj.data  # only the frames (and the tags) are shipped, not the fvs
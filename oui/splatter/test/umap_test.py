@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+umap = pytest.importorskip('umap')
+pytest.importorskip('umap.plot')
+
+
+def _data(n=200, n_features=5, seed=0):
+    return np.random.RandomState(seed).randn(n, n_features)
+
+
+def _no_fit(self, *args, **kwargs):
+    """Stands for ``umap.UMAP.fit`` where a model should be loaded, not fitted"""
+    raise AssertionError("The model should have been loaded from the cache, not fitted")
+
+
+def test_umap_splatter(tmp_path, monkeypatch):
+    from oui.splatter.umap import UmapSplatter
+
+    X = _data()
+    us = UmapSplatter(cache_dir=str(tmp_path), n_neighbors=10, random_state=0).fit(X)
+    assert us.embedding_.shape == (len(X), 2)
+    (filename,) = os.listdir(tmp_path)
+    assert filename.endswith('.pkl')
+
+    # fitting the same data, with the same params, loads the fitted model
+    monkeypatch.setattr(umap.UMAP, 'fit', _no_fit)
+    loaded = UmapSplatter(cache_dir=str(tmp_path), n_neighbors=10, random_state=0).fit(X.copy())
+    assert np.array_equal(loaded.embedding_, us.embedding_)
+
+    # new samples are projected (out-of-sample), not refitted
+    X_new = _data(n=10, seed=1)
+    assert loaded.transform(X_new).shape == (10, 2)
+    assert loaded.embedding_with(X_new).shape == (len(X) + 10, 2)
+    monkeypatch.undo()
+
+    # a corrupted file is refitted (and overwritten)
+    filepath = os.path.join(tmp_path, filename)
+    with open(filepath, 'wb') as fp:
+        fp.write(b'not a pickle')
+    refitted = UmapSplatter(cache_dir=str(tmp_path), n_neighbors=10, random_state=0).fit(X)
+    assert refitted.embedding_.shape == (len(X), 2)
+    monkeypatch.setattr(umap.UMAP, 'fit', _no_fit)
+    UmapSplatter(cache_dir=str(tmp_path), n_neighbors=10, random_state=0).fit(X)
+
+
+def test_unfitted_umap_splatter():
+    from oui.splatter.umap import UmapSplatter
+
+    with pytest.raises(RuntimeError):
+        UmapSplatter(cache_dir=None).transform(_data(n=3))
@@ -188,12 +188,133 @@ function d2p(D, perplexity, tol) {
 // helper function
 function sign(x) { return x > 0 ? 1 : x < 0 ? -1 : 0; }
 
+// the depth beyond which quadtree nodes aren't split (their points, e.g. duplicates, are all in one leaf)
+const MAX_QUADTREE_DEPTH = 32;
+
+// moves the indices idx[start..stop) for which isLeft is true before the others, and returns where they stop
+function partition(idx, start, stop, isLeft) {
+    let i = start;
+    let j = stop - 1;
+    while (i <= j) {
+        if (isLeft(idx[i])) {
+            i++;
+        } else {
+            const t = idx[i];
+            idx[i] = idx[j];
+            idx[j] = t;
+            j--;
+        }
+    }
+    return i;
+}
+
+// the quadtree node of the (2D) points idx[start..stop) of Y, in the square of center (x, y) and half width
+// half: it has the number of its points (mass) and their center of mass, and its (non-empty) children,
+// or, for leaves, its points
+function quadTreeNode(Y, idx, start, stop, x, y, half, depth) {
+    const n = stop - start;
+    let comX = 0.0;
+    let comY = 0.0;
+    for (let k = start; k < stop; k++) {
+        comX += Y[idx[k]][0];
+        comY += Y[idx[k]][1];
+    }
+    const node = { x, y, half, mass: n, comX: comX / n, comY: comY / n, children: null, pts: null };
+    if (n === 1 || depth >= MAX_QUADTREE_DEPTH) {
+        node.pts = idx.subarray(start, stop);
+        return node;
+    }
+    // the quadrants: below y (left, then right of x), then above y (left, then right of x)
+    const mid = partition(idx, start, stop, (i) => Y[i][1] < y);
+    const bounds = [start, partition(idx, start, mid, (i) => Y[i][0] < x), mid,
+                    partition(idx, mid, stop, (i) => Y[i][0] < x), stop];
+    const h = half / 2;
+    const centers = [[x - h, y - h], [x + h, y - h], [x - h, y + h], [x + h, y + h]];
+    node.children = [];
+    for (let c = 0; c < 4; c++) {
+        if (bounds[c + 1] > bounds[c]) {
+            node.children.push(quadTreeNode(Y, idx, bounds[c], bounds[c + 1], centers[c][0], centers[c][1], h,
+                                            depth + 1));
+        }
+    }
+    return node;
+}
+
+// the quadtree of the (2D) points of Y (see quadTreeNode)
+function quadTree(Y) {
+    const N = Y.length;
+    let minX = Infinity;
+    let minY = Infinity;
+    let maxX = -Infinity;
+    let maxY = -Infinity;
+    for (let i = 0; i < N; i++) {
+        minX = Math.min(minX, Y[i][0]);
+        maxX = Math.max(maxX, Y[i][0]);
+        minY = Math.min(minY, Y[i][1]);
+        maxY = Math.max(maxY, Y[i][1]);
+    }
+    const idx = new Int32Array(N);
+    for (let i = 0; i < N; i++) { idx[i] = i; }
+    const half = Math.max(maxX - minX, maxY - minY) / 2 + 1e-9;
+    return quadTreeNode(Y, idx, 0, N, (minX + maxX) / 2, (minY + maxY) / 2, half, 0);
+}
+
+// the (unnormalized) repulsive force on the point i of Y, sum_j w_ij^2 (y_i - y_j) with w_ij = 1 / (1 + |y_i - y_j|^2),
+// put in force, and its sum_j w_ij (returned). The nodes of the tree (see quadTree) seen from y_i under an angle
+// (width / distance) smaller than theta are taken as a single point, of their mass, at their center of mass
+// (Barnes-Hut), so it's O(log N), not O(N)
+function repulsionBarnesHut(tree, Y, i, theta, force) {
+    const xi = Y[i][0];
+    const yi = Y[i][1];
+    let fx = 0.0;
+    let fy = 0.0;
+    let wsum = 0.0;
+    const stack = [tree];
+    while (stack.length) {
+        const node = stack.pop();
+        if (node.pts) {  // a leaf: its points, exactly
+            for (let k = 0; k < node.pts.length; k++) {
+                const j = node.pts[k];
+                if (j === i) { continue; }
+                const dxj = xi - Y[j][0];
+                const dyj = yi - Y[j][1];
+                const w = 1.0 / (1.0 + dxj * dxj + dyj * dyj);
+                wsum += w;
+                fx += w * w * dxj;
+                fy += w * w * dyj;
+            }
+            continue;
+        }
+        const dx = xi - node.comX;
+        const dy = yi - node.comY;
+        const d2 = dx * dx + dy * dy;
+        // (a node containing y_i is always opened, so i never repulses itself)
+        const contains = Math.abs(xi - node.x) <= node.half && Math.abs(yi - node.y) <= node.half;
+        if (contains || 4 * node.half * node.half >= theta * theta * d2) {
+            for (const child of node.children) { stack.push(child); }
+        } else {
+            const w = 1.0 / (1.0 + d2);
+            const mw2 = node.mass * w * w;
+            wsum += node.mass * w;
+            fx += mw2 * dx;
+            fy += mw2 * dy;
+        }
+    }
+    force[0] = fx;
+    force[1] = fy;
+    return wsum;
+}
+
 export default function tSNE(opt) {
     // var opt = opt || {};
     this.perplexity = getOpt(opt, 'perplexity', 10); // effective number of nearest neighbors
     this.dim = getOpt(opt, 'dim', 2); // by default 2-D tSNE
     this.epsilon = getOpt(opt, 'epsilon', 50); // learning rate
     this.std = getOpt(opt, 'spread', 1e-4);
+    // the number of (first) iterations whose attractive forces are exaggerated (none for a warm start)
+    this.exaggerationIters = getOpt(opt, 'exaggerationIters', 100);
+    // the accuracy of the (Barnes-Hut) repulsive forces of 2D sparse t-SNEs: 0 is exact, more is faster
+    this.theta = getOpt(opt, 'theta', 0.5);
     this.iter = 0;
 }
 
@@ -201,7 +322,8 @@ tSNE.prototype = {
 
     // this function takes a set of high-dimensional points
     // and creates matrix P from them using gaussian kernel
-    initDataRaw(X) {
+    // Y0, if given, is the initial solution (a list of N arrays of size dim)
+    initDataRaw(X, Y0?) {
         const N = X.length;
         const D = X[0].length;
         assert(N > 0, ' X is empty? You must have some data!');
@@ -209,7 +331,7 @@ tSNE.prototype = {
         const dists = xtod(X); // convert X to distances using gaussian kernel
         this.P = d2p(dists, this.perplexity, 1e-4); // attach to object
         this.N = N; // back up the size of the dataset
-        this.initSolution(); // refresh this
+        this.initSolution(Y0); // refresh this
     },
 
     // this function takes a given distance matrix and creates
@@ -232,10 +354,24 @@ tSNE.prototype = {
         this.initSolution(); // refresh this
     },
 
-    // (re)initializes the solution to random
-    initSolution() {
-        // generate random solution to t-SNE
-        this.Y = randn2d(this.N, this.dim, undefined, this.std); // the solution
+    // this function takes the (sparse) affinities computed by the python side (see knn_affinities_payload):
+    // the upper triangle of the symmetric P matrix of N points, in CSR form (the entries of row i being
+    // at rowPtr[i]..rowPtr[i + 1]). No N x N matrix is ever made then.
+    initDataSparse(N, rowPtr, cols, values, Y0?) {
+        assert(N > 0, ' P is empty? You must have some data!');
+        this.sparseP = { rowPtr, cols, values };
+        this.N = N;
+        this.initSolution(Y0);
+    },
+
+    // (re)initializes the solution to Y0 (a warm start), or to random
+    initSolution(Y0?) {
+        if (Y0) {
+            this.Y = Y0.map((row) => Array.from(row)); // (copied, since it's updated in place)
+        } else {
+            // generate random solution to t-SNE
+            this.Y = randn2d(this.N, this.dim, undefined, this.std); // the solution
+        }
         // step gains to accelerate progress in unchanging directions
         this.gains = randn2d(this.N, this.dim, 1.0, this.std);
         this.ystep = randn2d(this.N, this.dim, 0.0, this.std); // momentum accumulator
@@ -252,7 +388,7 @@ tSNE.prototype = {
         this.iter += 1;
         const N = this.N;
 
-        const cg = this.costGrad(this.Y); // evaluate gradient
+        const cg = this.sparseP ? this.costGradSparse(this.Y) : this.costGrad(this.Y); // evaluate gradient
         const cost = cg.cost;
         const grad = cg.grad;
 
@@ -300,7 +436,7 @@ tSNE.prototype = {
         const dim = this.dim; // dim of output space
         const P = this.P;
 
-        const pmul = this.iter < 100 ? 4 : 1; // trick that helps with local optima
+        const pmul = this.iter < this.exaggerationIters ? 4 : 1; // trick that helps with local optima
 
         // compute current Q distribution, unnormalized first
         const Qu = zeros(N * N);
@@ -340,4 +476,78 @@ tSNE.prototype = {
 
         return {cost, grad};
     },
+
+    // same as costGrad, for sparse (upper triangle) P: the attractive forces are only computed on the
+    // non-zero entries of P, and the repulsive ones on the fly (so memory is O(N), not O(N^2)): with a
+    // quadtree in 2D (Barnes-Hut, so O(N log N) time), exactly otherwise (O(N^2) time)
+    costGradSparse(Y) {
+        const N = this.N;
+        const dim = this.dim;
+        const { rowPtr, cols, values } = this.sparseP;
+        const pmul = this.iter < this.exaggerationIters ? 4 : 1;
+
+        const attr = [];
+        const rep = [];
+        for (let i = 0; i < N; i++) {
+            attr.push(zeros(dim));
+            rep.push(zeros(dim));
+        }
+        const diff = zeros(dim);
+
+        // repulsive forces (unnormalized), and the normalization of Q
+        let qsum = 0.0;
+        if (dim === 2) {
+            const tree = quadTree(Y);
+            for (let i = 0; i < N; i++) {
+                qsum += repulsionBarnesHut(tree, Y, i, this.theta, rep[i]);
+            }
+        } else {
+            for (let i = 0; i < N; i++) {
+                for (let j = i + 1; j < N; j++) {
+                    let dsum = 0.0;
+                    for (let d = 0; d < dim; d++) {
+                        diff[d] = Y[i][d] - Y[j][d];
+                        dsum += diff[d] * diff[d];
+                    }
+                    const qu = 1.0 / (1.0 + dsum);
+                    qsum += 2 * qu;
+                    const qu2 = qu * qu;
+                    for (let d = 0; d < dim; d++) {
+                        rep[i][d] += qu2 * diff[d];
+                        rep[j][d] -= qu2 * diff[d];
+                    }
+                }
+            }
+        }
+
+        // attractive forces (P is symmetric: every entry (i, j) of the upper triangle acts on i and j)
+        let cost = 0.0;
+        for (let i = 0; i < N; i++) {
+            for (let k = rowPtr[i]; k < rowPtr[i + 1]; k++) {
+                const j = cols[k];
+                const p = values[k];
+                let dsum = 0.0;
+                for (let d = 0; d < dim; d++) {
+                    diff[d] = Y[i][d] - Y[j][d];
+                    dsum += diff[d] * diff[d];
+                }
+                const qu = 1.0 / (1.0 + dsum);
+                cost += - 2 * p * Math.log(Math.max(qu / qsum, 1e-100));
+                for (let d = 0; d < dim; d++) {
+                    attr[i][d] += p * qu * diff[d];
+                    attr[j][d] -= p * qu * diff[d];
+                }
+            }
+        }
+
+        const grad = [];
+        for (let i = 0; i < N; i++) {
+            const gsum = new Array(dim);
+            for (let d = 0; d < dim; d++) {
+                gsum[d] = 4 * (pmul * attr[i][d] - rep[i][d] / qsum);
+            }
+            grad.push(gsum);
+        }
+        return {cost, grad};
+    },
 };
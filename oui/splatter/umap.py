@@ -9,7 +9,22 @@ pip install bokeh
 pip install pandas
 pip install holoviews
 pip install colorcet
+
+To plot a dataset that grows a little every day (without refitting on the days the base data didn't change),
+fit a ``UmapSplatter`` once (it keeps its fitted model on disk, keyed by the data and the UMAP params),
+and project the new samples with it:
+
+    us = UmapSplatter(n_neighbors=15).fit(X)  # loaded from disk if X was already fitted (with these params)
+    us.plot(labels=y)
+    new_embedding = us.transform(X_new)  # out-of-sample: no refit
 """
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import numpy as np
 
 # from oui.util import ModuleNotFoundIgnore
 # with ModuleNotFoundIgnore():
@@ -25,6 +40,8 @@ except Exception as err:
           f"you might want to consider doing a ``pip install numba==0.50.1``")
     raise
 
+DFLT_UMAP_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'oui', 'umap_models')
+
 
 # from numba.core.typing import cffi_utils
 # import pandas as pd
@@ -36,5 +53,88 @@ def plot_umap_of_xy(X, y=None, return_projection=False, **umap_plot_points_kwarg
     if not return_projection:
         return t
     else:
-        projection = model.transform(X)
-        return t, projection
+        return t, model.embedding_  # (the fit's own embedding of X: no need to transform X again)
+
+
+class UmapSplatter:
+    """A UMAP model that's fitted once, and reused: to plot, and to project new samples (out-of-sample).
+
+    :param cache_dir: The directory where fitted models are kept, by a hash of the data they were fitted on
+        and of the UMAP params (default: ``~/.cache/oui/umap_models``). None not to keep them.
+    :param umap_kwargs: The params of the ``umap.UMAP`` model
+    """
+
+    def __init__(self, cache_dir=DFLT_UMAP_CACHE_DIR, **umap_kwargs):
+        self.cache_dir = cache_dir
+        self.umap_kwargs = umap_kwargs
+        self.model = None
+
+    def fit(self, X):
+        """Fit the model on X (or load the model fitted on X, with the same params, from the cache).
+        Returns the UmapSplatter itself."""
+        X = np.asarray(X)
+        filepath = self._model_filepath(X)
+        if filepath is not None and os.path.isfile(filepath):
+            try:
+                with open(filepath, 'rb') as fp:
+                    self.model = pickle.load(fp)
+                return self
+            except Exception:  # a corrupted (or incompatible) file: refit (and overwrite it)
+                pass
+        self.model = umap.UMAP(**self.umap_kwargs).fit(X)
+        if filepath is not None:
+            _write_atomically(filepath, pickle.dumps(self.model))
+        return self
+
+    @property
+    def embedding_(self):
+        """The embedding of the data the model was fitted on"""
+        self._assert_fitted()
+        return self.model.embedding_
+
+    def transform(self, X_new):
+        """The embedding of new samples, projected with the fitted model (which isn't refitted)"""
+        self._assert_fitted()
+        return self.model.transform(np.asarray(X_new))
+
+    def embedding_with(self, X_new):
+        """The embedding of the fitted data, followed by the (projected) embedding of new samples"""
+        return np.vstack([self.embedding_, self.transform(X_new)])
+
+    def plot(self, labels=None, **umap_plot_points_kwargs):
+        """Plot the embedding of the fitted data (see ``umap.plot.points``)"""
+        self._assert_fitted()
+        return umap.plot.points(self.model, labels=labels, **umap_plot_points_kwargs)
+
+    def _assert_fitted(self):
+        if self.model is None:
+            raise RuntimeError("The UmapSplatter wasn't fitted: Call its fit method first")
+
+    def _model_filepath(self, X):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, umap_model_key(X, **self.umap_kwargs) + '.pkl')
+
+
+def umap_model_key(X, **umap_kwargs):
+    """A hash of the data (X), the params, and the umap version, of a fitted model"""
+    X = np.ascontiguousarray(X)
+    key = hashlib.sha1(X.tobytes())
+    description = [X.shape, X.dtype.str, umap_kwargs, getattr(umap, '__version__', None)]
+    key.update(json.dumps(description, sort_keys=True, default=repr).encode())
+    return key.hexdigest()
+
+
+def _write_atomically(filepath, content):
+    """Write content to filepath through a temporary file, so that readers never see a partial file"""
+    dirpath = os.path.dirname(filepath)
+    os.makedirs(dirpath, exist_ok=True)
+    fd, tmp_filepath = tempfile.mkstemp(dir=dirpath, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(content)
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+        raise
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+def test_batch_conversions_agree_with_the_single_color_ones():
+    from oui.color_util import colors_to_hex, color_hex_from, color_names, color_dec_to_hex
+
+    specs = list(color_names[:50]) + ['#3af', '#09bd', '#00ff1080', '#123456']
+    expected = [color_hex_from(spec).lower() for spec in specs]  # (some named hex codes are uppercase)
+    expected = [h if len(h) == 9 else h + 'ff' for h in expected]
+    assert colors_to_hex(specs).tolist() == expected
+
+    rgbs = np.random.RandomState(0).randint(0, 256, size=(100, 3))
+    assert colors_to_hex(rgbs, include_alpha=False).tolist() == [color_dec_to_hex(rgb) for rgb in rgbs.tolist()]
+
+
+def test_rgba_to_hex_of_every_byte_value():
+    from oui.color_util import rgba_to_hex
+
+    values = np.arange(256)
+    rgba = np.stack([values, values[::-1], np.roll(values, 7), np.roll(values, 100)], axis=1)
+    expected = ['#' + ''.join('%02x' % v for v in row) for row in rgba.tolist()]
+    assert rgba_to_hex(rgba).tolist() == expected
+    assert rgba_to_hex(rgba.astype('>u2')).tolist() == expected  # (whatever the byte order of the input)
+    assert rgba_to_hex(rgba, include_alpha=False).tolist() == [h[:7] for h in expected]
+
+
+def test_empty_batches():
+    from oui.color_util import colors_to_rgba, rgba_to_hex, colors_to_hex
+
+    assert colors_to_rgba([]).shape == (0, 4)
+    assert colors_to_rgba(np.empty((0, 3))).shape == (0, 4)
+    assert rgba_to_hex(np.empty((0, 4), dtype='uint8')).tolist() == []
+    assert colors_to_hex([]).tolist() == []
+
+
+def test_colors_to_rgba():
+    import pytest
+    from oui.color_util import colors_to_rgba, pack_rgba
+
+    rgba = colors_to_rgba(['red', 'red', '#0000ff'], alpha=128)
+    assert rgba.tolist() == [[255, 0, 0, 128], [255, 0, 0, 128], [0, 0, 255, 128]]
+    assert [hex(x) for x in pack_rgba(rgba)] == ['0xff000080', '0xff000080', '0xff80']
+    with pytest.raises(ValueError):
+        colors_to_rgba([[0, 0, 256]])
+    with pytest.raises(ValueError):
+        colors_to_rgba([[0, 0.5, 1.5]])
+
+
+def test_scores_to_rgba():
+    from oui.color_util import scores_to_rgba
+
+    rgba = scores_to_rgba([-5, 0, 5, 10, 20], colors=['black', 'white'], vmin=0, vmax=10)
+    assert rgba[:, 0].tolist() == [0, 0, 128, 255, 255]  # clipped outside of [vmin, vmax]
+    assert (rgba[:, 3] == 255).all()
+    assert scores_to_rgba([3, 3]).tolist() == scores_to_rgba([0, 0]).tolist()  # (constant scores)
+
+
+def test_scores_to_rgba_of_nans_and_empty_scores():
+    from oui.color_util import scores_to_rgba
+
+    rgba = scores_to_rgba([0, np.nan, 10], colors=['black', 'white'])
+    assert rgba.tolist() == [[0, 0, 0, 255], [0, 0, 0, 0], [255, 255, 255, 255]]  # NaNs are transparent
+    assert scores_to_rgba([np.nan, np.nan]).tolist() == [[0, 0, 0, 0]] * 2
+    for scores in ([], np.array([])):
+        rgba = scores_to_rgba(scores)
+        assert rgba.shape == (0, 4) and rgba.dtype == np.uint8
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+
+
+def test_strings_are_not_corrupted():
+    from oui.serialization import to_json
+
+    payload = {'title': 'None of it is True', 'categories': ['True', 'False', 'None', 'NaN'], "it's": '"quoted"'}
+    assert json.loads(to_json(payload)) == payload
+
+
+def test_bool_none_and_nan_round_trips():
+    from oui.serialization import to_json
+
+    payload = {
+        'flags': [True, False],
+        'nothing': None,
+        'np_flags': np.array([True, False]),
+        'np_bool': np.bool_(True),
+        'floats': np.array([0.5, np.nan, np.inf, -np.inf]),
+        'nested': {'x': np.float32(1.5), 'y': np.int16(-3), 'z': None},
+    }
+    assert json.loads(to_json(payload)) == {
+        'flags': [True, False],
+        'nothing': None,
+        'np_flags': [True, False],
+        'np_bool': True,
+        'floats': [0.5, None, None, None],  # (json has no NaN nor Infinity)
+        'nested': {'x': 1.5, 'y': -3, 'z': None},
+    }
+
+
+def test_int_vector_round_trips():
+    from oui.serialization import to_json, INT_JSON_BLOCK_SIZE
+
+    rng = np.random.RandomState(0)
+    vectors = [
+        np.array([], dtype=int),
+        np.array([0]),
+        np.array([-1, 0, 1, 9, 10, 99, 100, -100]),
+        rng.randint(-32768, 32768, size=1000).astype('int16'),
+        rng.randint(0, 256, size=1000).astype('uint8'),
+        np.array([np.iinfo(np.int64).min, np.iinfo(np.int64).max]),
+        np.array([np.iinfo(np.uint64).max], dtype='uint64'),
+        rng.randint(-10 ** 6, 10 ** 6, size=INT_JSON_BLOCK_SIZE + 10),  # (more than one block)
+    ]
+    for vector in vectors:
+        assert json.loads(to_json({'v': vector}))['v'] == vector.tolist()
+
+
+def test_render_call_source():
+    from oui.serialization import render_call_source
+
+    source = render_call_source('f', {'a': np.arange(3), 'b': 'True'}, [None, True], 'x')
+    assert source.startswith('f(element.get(0),') and source.endswith(')')
+    args = json.loads('[' + source[len('f(element.get(0),'):-1] + ']')
+    assert args == [{'a': [0, 1, 2], 'b': 'True'}, [None, True], 'x']
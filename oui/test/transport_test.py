@@ -0,0 +1,58 @@
+import numpy as np
+
+
+def test_share_encoded_arrays_dedups_equal_arrays():
+    from oui.transport import encode_array, decode_array, share_encoded_arrays
+
+    wf = np.arange(100, dtype='int16')
+    channels = [
+        {'wf': encode_array(wf), 'chart_type': 'peaks'},
+        {'wf': encode_array(wf.copy()), 'chart_type': 'spectrogram'},  # equal, but not the same spec
+        {'wf': encode_array(wf[::-1]), 'chart_type': 'peaks'},
+        {'data': [{'wf': encode_array(wf)}, {'wf': encode_array(wf[::-1])}], 'values': [1, 2]},
+    ]
+    shared, sources = share_encoded_arrays(channels)
+    assert len(sources) == 2
+    assert shared[0]['wf'] == shared[1]['wf'] == shared[3]['data'][0]['wf'] != shared[2]['wf']
+    assert shared[2]['wf'] == shared[3]['data'][1]['wf']
+    assert shared[3]['values'] == [1, 2]
+    assert decode_array(sources[shared[2]['wf']['ref']]).tolist() == wf[::-1].tolist()
+    assert 'ref' not in channels[0]['wf']  # (channels aren't modified)
+
+    # arrays with the same bytes but different dtypes or shapes aren't the same source
+    specs = [encode_array(np.zeros(shape, dtype)) for shape, dtype in [(4, 'int16'), (2, 'int32'), ((2, 2), 'int16')]]
+    _, sources = share_encoded_arrays(specs)
+    assert len(sources) == 3
+
+
+def test_time_vis_ships_shared_sources_once():
+    from oui.multi_time_vis import time_vis
+    from oui.transport import encode_array
+
+    wf = encode_array((np.sin(np.arange(20000) / 10) * 1000).astype('int16'))
+    channels = [{'wf': dict(wf), 'sr': 1000, 'chart_type': chart_type} for chart_type in ('peaks', 'spectrogram')]
+    source = time_vis(channels).data
+    assert source.count(wf['b64']) == 1
+    assert source.endswith('}})')  # the sources table is the last argument
+
+    # without arrays, there's no table (so bundles that don't take one render the call as before)
+    source = time_vis([{'data': [1, 2, 3]}]).data
+    assert source.startswith('renderMultiTimeVis(element.get(0),[') and source.endswith('],{})')
+
+
+def test_base64_needs_a_bundle_that_decodes_it(rebuilt_bundle):
+    import pytest
+    from oui import set_bundle_features
+    from oui.multi_time_vis import single_time_vis, wfsr_to_jsobj
+
+    values = np.array([0.5, 2.0, -1.0])
+    assert single_time_vis({'data': values}, data_transport='base64')._trace['channel']['data']['b64']
+
+    set_bundle_features(())  # what the shipped (older) bundle amounts to
+    with pytest.raises(RuntimeError, match='typed_arrays'):
+        single_time_vis({'data': values}, data_transport='base64')
+    with pytest.raises(RuntimeError, match='typed_arrays'):
+        wfsr_to_jsobj(np.zeros(1000, dtype='int16'), wf_transport='base64')
+    assert single_time_vis({'data': values})._trace['channel']['data'] == [0.5, 2.0, -1.0]
+    with pytest.raises(ValueError):
+        single_time_vis({'data': values}, data_transport='msgpack')
@@ -0,0 +1,160 @@
+"""Compact transport of numerical arrays from python to the javascript components.
+
+Instead of writing arrays into the JS source as (huge) python list reprs, we ship their raw
+bytes, base64 encoded, along with the dtype and shape needed to rebuild them.
+The JS side (see ``transport.ts``) decodes such specs into typed arrays (``Int16Array``, etc.).
+
+>>> spec = encode_array([1, -2, 3], dtype='int16')
+>>> spec
+{'dtype': 'int16', 'shape': [3], 'b64': 'AQD+/wMA'}
+>>> decode_array(spec)
+array([ 1, -2,  3], dtype=int16)
+"""
+import base64
+import hashlib
+
+import numpy as np
+
+from oui import require_bundle_feature
+
+DFLT_TRANSPORT = 'base64'
+TRANSPORTS = ('base64', 'list')
+
+# The dtypes that the JS side knows how to rebuild as typed arrays (all little-endian)
+TRANSPORT_DTYPES = (
+    'int8',
+    'uint8',
+    'int16',
+    'uint16',
+    'int32',
+    'uint32',
+    'float16',  # decoded as a Float32Array by the JS side
+    'float32',
+    'float64',
+)
+
+
+def is_encoded_array(obj):
+    """Tells if obj is an array spec, as made by ``encode_array``.
+
+    >>> is_encoded_array(encode_array([1, 2], dtype='int16'))
+    True
+    >>> is_encoded_array({'dtype': 'int16'})
+    False
+    """
+    return isinstance(obj, dict) and 'b64' in obj and 'dtype' in obj
+
+
+def encode_array(arr, dtype=None):
+    """Make a jsonizable ``{dtype, shape, b64}`` spec of an array.
+
+    :param arr: An array, or anything ``numpy.asarray`` can make an array of
+    :param dtype: The dtype to cast the array to before encoding (defaults to the array's own)
+    :return: A dict with the dtype name, the shape, and the base64 encoded (little-endian) bytes
+    """
+    arr = np.asarray(arr, dtype=dtype)
+    dtype_name = arr.dtype.name
+    if dtype_name not in TRANSPORT_DTYPES:
+        raise TypeError(
+            f"Can't encode arrays of dtype {dtype_name}. Should be one of {TRANSPORT_DTYPES}"
+        )
+    buffer = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<'))
+    return {
+        'dtype': dtype_name,
+        'shape': list(arr.shape),
+        'b64': base64.b64encode(buffer.data).decode('ascii'),
+    }
+
+
+def decode_array(spec):
+    """Rebuild the array encoded in spec (the inverse of ``encode_array``)"""
+    dtype = np.dtype(spec['dtype']).newbyteorder('<')
+    arr = np.frombuffer(base64.b64decode(spec['b64']), dtype=dtype)
+    return arr.reshape(spec['shape']).astype(dtype.newbyteorder('='), copy=False)
+
+
+def validate_transport(transport, name='transport'):
+    """Check that transport is one of ``TRANSPORTS``, and that the JS bundle decodes it (see
+    ``oui.require_bundle_feature``). name is the name of the argument transport was given as.
+
+    >>> validate_transport('list', 'wf_transport')
+    >>> validate_transport('json')
+    Traceback (most recent call last):
+      ...
+    ValueError: Unknown transport: json. Should be one of ('base64', 'list')
+    """
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown transport: {transport}. Should be one of {TRANSPORTS}")
+    if transport == 'base64':
+        require_bundle_feature('typed_arrays', f"{name}='base64'")
+
+
+def array_for_transport(arr, transport=DFLT_TRANSPORT, dtype=None):
+    """Prepare an array to be shipped to JS, either as a base64 spec or as a (nested) list.
+
+    >>> array_for_transport([1, 2], transport='list', dtype='int16')
+    [1, 2]
+    >>> array_for_transport([1, 2], dtype='int16')['b64']
+    'AQACAA=='
+    """
+    if transport == 'base64':
+        return encode_array(arr, dtype=dtype)
+    elif transport == 'list':
+        return np.asarray(arr, dtype=dtype).tolist()
+    else:
+        raise ValueError(f"Unknown transport: {transport}. Should be one of {TRANSPORTS}")
+
+
+def array_ref(spec):
+    """The content address of an array spec: the same for any spec of the same array.
+
+    >>> array_ref(encode_array([1, 2], dtype='int16')) == array_ref(encode_array([1, 2], dtype='int16'))
+    True
+    """
+    content = f"{spec['dtype']}{spec['shape']}{spec['b64']}".encode()
+    return hashlib.sha1(content).hexdigest()
+
+
+def is_array_ref(obj):
+    return isinstance(obj, dict) and len(obj) == 1 and 'ref' in obj
+
+
+def share_encoded_arrays(obj, sources=None):
+    """Move the array specs of obj to a (content-addressed) table of sources, leaving ``{'ref': ...}``
+    references in their place, so that identical arrays are shipped (and decoded, see ``transport.ts``)
+    only once.
+
+    Dicts, and lists of dicts (like the levels of a peak pyramid), are searched for array specs.
+    Other lists (e.g. of numbers) are left as they are: only arrays shipped with the 'base64' transport
+    (which needs a rebuilt JS bundle, see ``validate_transport``) are shared, not those shipped as lists.
+
+    :param obj: The object (typically, a list of channels) to share the arrays of. It's not modified.
+    :param sources: The ``{ref: spec}`` table to add the sources to (a new one by default)
+    :return: The ``(obj, sources)`` pair: obj with references instead of specs, and the table
+
+    >>> wf = encode_array([1, 2, 3], dtype='int16')
+    >>> channels = [{'wf': wf, 'chart_type': 'peaks'}, {'wf': dict(wf), 'chart_type': 'spectrogram'}]
+    >>> channels, sources = share_encoded_arrays(channels)
+    >>> channels[0]['wf'] == channels[1]['wf'] == {'ref': array_ref(wf)}
+    True
+    >>> list(sources.values()) == [wf]
+    True
+    """
+    if sources is None:
+        sources = {}
+    refs_of_specs = {}  # so that specs seen more than once (the same dict) are hashed once
+
+    def share(x):
+        if is_encoded_array(x):
+            ref = refs_of_specs.get(id(x))
+            if ref is None:
+                ref = refs_of_specs[id(x)] = array_ref(x)
+                sources.setdefault(ref, x)
+            return {'ref': ref}
+        elif isinstance(x, dict):
+            return {k: share(v) for k, v in x.items()}
+        elif isinstance(x, (list, tuple)) and x and isinstance(x[0], dict):
+            return [share(item) for item in x]
+        return x
+
+    return share(obj), sources
@@ -0,0 +1,121 @@
+/*
+ * Decoding of the array specs made by the python side (see oui/transport.py):
+ * { dtype: 'int16', shape: [n, ...], b64: '...' } where b64 holds the little-endian raw bytes.
+ */
+import * as _ from 'lodash';
+
+export interface EncodedArray {
+    dtype: string;
+    shape: number[];
+    b64: string;
+}
+
+export type TypedArray = Int8Array | Uint8Array | Int16Array | Uint16Array | Int32Array |
+    Uint32Array | Float32Array | Float64Array;
+
+const TYPED_ARRAY_FOR_DTYPE: { [dtype: string]: any } = {
+    float32: Float32Array,
+    float64: Float64Array,
+    int16: Int16Array,
+    int32: Int32Array,
+    int8: Int8Array,
+    uint16: Uint16Array,
+    uint32: Uint32Array,
+    uint8: Uint8Array,
+};
+
+export function isEncodedArray(obj: any): boolean {
+    return !!obj && typeof obj === 'object' && typeof obj.b64 === 'string' && typeof obj.dtype === 'string';
+}
+
+export function base64ToArrayBuffer(b64: string): ArrayBuffer {
+    const binary: string = window.atob(b64);
+    const bytes: Uint8Array = new Uint8Array(binary.length);
+    for (let i: number = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return bytes.buffer;
+}
+
+/**
+ * There's no (widely supported) Float16Array, so float16 arrays are decoded into Float32Arrays
+ */
+export function float16ToFloat32(halves: Uint16Array): Float32Array {
+    const floats: Float32Array = new Float32Array(halves.length);
+    for (let i: number = 0; i < halves.length; i++) {
+        const h: number = halves[i];
+        const sign: number = h & 0x8000 ? -1 : 1;
+        const exponent: number = (h >> 10) & 0x1f;
+        const fraction: number = h & 0x3ff;
+        if (exponent === 0) {  // subnormal (or zero)
+            floats[i] = sign * Math.pow(2, -14) * (fraction / 1024);
+        } else if (exponent === 0x1f) {
+            floats[i] = fraction ? NaN : sign * Infinity;
+        } else {
+            floats[i] = sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
+        }
+    }
+    return floats;
+}
+
+// Specs are decoded once: the channels sharing a source (see resolveArrayRefs) share its typed array
+const decodedArrays: WeakMap<EncodedArray, TypedArray> = new WeakMap();
+
+export function decodeArray(spec: EncodedArray): TypedArray {
+    let decoded: TypedArray = decodedArrays.get(spec);
+    if (!decoded) {
+        decoded = decodeArrayBuffer(base64ToArrayBuffer(spec.b64), spec.dtype);
+        decodedArrays.set(spec, decoded);
+    }
+    return decoded;
+}
+
+/**
+ * The typed array of (little-endian) raw bytes, e.g. the binary buffers of comm messages (DataViews)
+ */
+export function decodeArrayBuffer(buffer: ArrayBuffer | DataView, dtype: string): TypedArray {
+    if (ArrayBuffer.isView(buffer)) {  // (a copy, since typed arrays need aligned offsets)
+        buffer = buffer.buffer.slice(buffer.byteOffset, buffer.byteOffset + buffer.byteLength);
+    }
+    if (dtype === 'float16') {
+        return float16ToFloat32(new Uint16Array(buffer));
+    }
+    const ArrayType: any = TYPED_ARRAY_FOR_DTYPE[dtype];
+    if (!ArrayType) {
+        throw new Error(`Unsupported dtype: ${dtype}`);
+    }
+    return new ArrayType(buffer);
+}
+
+/**
+ * Returns obj decoded if it's an encoded array spec, and obj as is otherwise (e.g. a plain list)
+ */
+export function maybeDecodeArray(obj: any): any {
+    return isEncodedArray(obj) ? decodeArray(obj) : obj;
+}
+
+export interface ArrayRef {
+    ref: string;
+}
+
+export function isArrayRef(obj: any): boolean {
+    return !!obj && typeof obj === 'object' && typeof obj.ref === 'string' && _.size(obj) === 1;
+}
+
+/**
+ * Returns obj with its {ref} references replaced by the (same) specs of the sources table
+ * (see share_encoded_arrays in oui/transport.py). Only dicts and lists of dicts are searched.
+ */
+export function resolveArrayRefs(obj: any, sources: { [ref: string]: EncodedArray }): any {
+    if (isArrayRef(obj)) {
+        if (!(obj.ref in sources)) {
+            throw new Error(`Unknown array source: ${obj.ref}`);
+        }
+        return sources[obj.ref];
+    } else if (Array.isArray(obj)) {
+        return obj.length && _.isPlainObject(obj[0]) ? _.map(obj, (item: any) => resolveArrayRefs(item, sources)) : obj;
+    } else if (_.isPlainObject(obj)) {
+        return _.mapValues(obj, (value: any) => resolveArrayRefs(value, sources));
+    }
+    return obj;
+}